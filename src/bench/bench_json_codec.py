@@ -0,0 +1,77 @@
+'''
+utils.json_codec 벤치마크
+- 한글 텍스트가 들어간 서프 형태의 레코드(레코드당 organic 결과 n_results개)를 디코딩/인코딩
+- jsonl 파일 읽기 : jsonlines(설치되어 있으면) vs JsonlFileHandler
+실행 : (src 폴더에서) python -m bench.bench_json_codec --n 2000 --n-results 40
+'''
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from utils import json_codec
+from utils.file import JsonlFileHandler
+
+WORDS = ["트렌드", "키워드", "서제스트", "검색", "결과", "뉴스", "블로그", "영상", "리뷰", "추천", "가격", "후기", "날씨", "일정"]
+
+def make_records(n : int, n_results : int, seed : int = 0) -> list:
+    rng = random.Random(seed)
+    def text(k):
+        return " ".join(rng.choice(WORDS) for _ in range(k))
+    records = []
+    for i in range(n):
+        records.append({"search_parameters": {"q": text(2), "hl": "ko", "gl": "kr"},
+                        "features": [{"type": "organic",
+                                      "rank": rank,
+                                      "title": text(8),
+                                      "url": f"https://blog.naver.com/{rng.randint(0, 10**8)}",
+                                      "description": text(60),
+                                      "date": "2024-11-12"} for rank in range(n_results)],
+                        "collected_time": "2024-11-12 00:00:00"})
+    return records
+
+def timeit(func, repeat : int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--n-results", type=int, default=40)
+    args = parser.parse_args()
+
+    records = make_records(args.n, args.n_results)
+    lines = [json.dumps(record, ensure_ascii=False).encode("utf-8") for record in records]
+    print(f"backend : {json_codec.BACKEND}, 레코드 {len(records)}개, 평균 {sum(map(len, lines)) / len(lines) / 1024:.1f}KB")
+
+    print(f"decode (bytes) : json {timeit(lambda: [json.loads(line.decode('utf-8')) for line in lines]):.2f}s"
+          f" -> json_codec {timeit(lambda: [json_codec.loads(line) for line in lines]):.2f}s")
+    print(f"encode         : json {timeit(lambda: [json.dumps(record, ensure_ascii=False).encode('utf-8') for record in records]):.2f}s"
+          f" -> json_codec {timeit(lambda: [json_codec.dumps(record) for record in records]):.2f}s")
+    assert [json_codec.loads(json_codec.dumps(record)) for record in records[:10]] == records[:10]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "serp.jsonl")
+        with open(path, "wb") as f:
+            f.write(b"\n".join(lines) + b"\n")
+        size = os.path.getsize(path) / 1024 / 1024
+        codec_time = timeit(lambda: sum(1 for _ in JsonlFileHandler(path).read_generator()))
+        try:
+            import jsonlines
+        except ImportError:
+            print(f"read {size:.0f}MB jsonl : JsonlFileHandler {codec_time:.2f}s (jsonlines 미설치)")
+        else:
+            def read_jsonlines():
+                with jsonlines.open(path) as reader:
+                    return sum(1 for _ in reader)
+            print(f"read {size:.0f}MB jsonl : jsonlines {timeit(read_jsonlines):.2f}s -> JsonlFileHandler {codec_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
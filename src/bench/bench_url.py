@@ -0,0 +1,72 @@
+'''
+serp.url의 tldextract 캐시 벤치마크
+- 하루치 서프 url과 비슷하게 hosts개 호스트에서 zipf 분포로 뽑은 n개 url
+- url마다 서프 처리에서 쓰는 URL 속성/메서드를 모두 호출
+- 변경 전 URL(속성마다 url 전체로 tldextract)과 결과가 같은지 확인
+실행 : (src 폴더에서) python -m bench.bench_url --n 300000 --hosts 8000
+'''
+import time
+import random
+import argparse
+
+from serp import url as url_module
+from serp.url import URL
+
+class UncachedURL(URL):
+    '''
+    변경 전 URL : subdomain, domain, top_level_domain 마다 url 전체로 추출 (같은 suffix list 사용)
+    '''
+    __slots__ = ()
+
+    def _extract(self):
+        return url_module._tld_extractor(self.url)
+
+SUFFIXES = ["com", "co.kr", "kr", "net", "org", "or.kr", "go.kr", "jp", "co.jp", "io", "wiki", "blogspot.com"]
+POPULAR_HOSTS = ["blog.naver.com", "m.blog.naver.com", "www.youtube.com", "m.youtube.com", "namu.wiki", "ko.wikipedia.org",
+                 "ko.m.wikipedia.org", "www.instagram.com", "twitter.com", "www.facebook.com", "www.tiktok.com",
+                 "play.google.com", "news.naver.com", "n.news.naver.com", "tistory.com", "brunch.co.kr"]
+
+def make_urls(n : int, hosts : int, seed : int = 0) -> list:
+    rng = random.Random(seed)
+    host_list = list(POPULAR_HOSTS)
+    while len(host_list) < hosts:
+        name = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 12)))
+        sub = rng.choice(["", "www.", "m.", "blog.", "news."])
+        host_list.append(f"{sub}{name}.{rng.choice(SUFFIXES)}")
+    weights = [1 / (rank + 1) for rank in range(len(host_list))] # zipf : 자주 나오는 호스트가 대부분
+    urls = []
+    for host in rng.choices(host_list, weights=weights, k=n):
+        path = "/".join(str(rng.randint(0, 99999)) for _ in range(rng.randint(1, 3)))
+        urls.append(f"https://{host}/{path}{rng.choice(['', '', '.pdf', '?q=1'])}")
+    return urls
+
+def run(url_class, urls : list) -> list:
+    result = []
+    for u in urls:
+        url = url_class(u)
+        result.append((url.is_namu_wiki(), url.is_youtube_url(), url.is_sns_url(),
+                       url.subdomain, url.domain, url.top_level_domain,
+                       url.is_google_play_url(), url.is_pdf_url()))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=300000)
+    parser.add_argument("--hosts", type=int, default=8000)
+    args = parser.parse_args()
+
+    urls = make_urls(args.n, args.hosts)
+    url_module._tld_extractor("warm.up.com") # suffix list 로딩 시간 제외
+
+    start = time.perf_counter()
+    expected = run(UncachedURL, urls)
+    print(f"uncached : {time.perf_counter() - start:.2f}s")
+
+    url_module._extract_host.cache_clear()
+    start = time.perf_counter()
+    result = run(URL, urls)
+    print(f"cached   : {time.perf_counter() - start:.2f}s ({url_module._extract_host.cache_info()})")
+    assert result == expected, "캐시 사용 결과가 다릅니다."
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,24 @@
 # 1. 키워드 리스트 받은 뒤 서프 수집 카프카에게 요청
 # 2. 서프 모두 수집되었는지 확인
-from typing import List, Union
+from typing import List, Union, Iterator, Tuple
 import time
-from datetime import datetime
-import requests, json
+from datetime import datetime, timedelta
+import requests
 from http import HTTPStatus
 from dataclasses import dataclass, field, asdict
 from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
 
 from validator.serp_validator import SerpValidator
-from utils.kafka import request_collect_serp_to_kafka
+from utils.kafka import SerpDownloadProducer
 from utils.function import current_function_name
+from utils.file import JsonlWriter
+from utils import json_codec
 from utils.db import QueryDatabaseKo, QueryDatabaseJa, QueryDatabaseEn
-from utils.file import JsonlFileHandler
 from lang import Ko, Ja, En
 
-from typing import TYPE_CHECKING
-if TYPE_CHECKING:
-    import pandas as pd
+import pandas as pd
 
 @dataclass
 class SerpApiParams:
@@ -33,11 +34,20 @@ class SerpApiParams:
 class SerpCollector:
     SERP_API_URL = "http://google-serp-api.ascentlab.io/serpapi/search"
     SERP_HEADERS = {"Content-Type": "application/json; charset=UTF-8"}
+    WATERMARK_MARGIN = timedelta(minutes=30) # 서프 수집 완료 확인 시 watermark 여유 시간
+    SERP_DATA_TIMEOUT = 30 # hash, json으로 서프 조회할 때 timeout (초)
 
     def __init__(self,
-                 lang:str):
+                 lang:str,
+                 max_workers:int=16): # hash, json으로 서프 조회할 때 동시 요청 개수
         self.db = self.set_database(lang)
         self.hl, self.gl, self.serp_location = self.set_lang_info(lang)
+        self.max_workers = max_workers
+        # 서프 조회 요청은 하나의 session(keep-alive 커넥션 풀)을 재사용
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
     def set_lang_info(self, lang):
         if lang == 'ko':
@@ -66,43 +76,71 @@ class SerpCollector:
         키워드 리스트 받은 뒤 서프 수집 카프카에게 요청
         '''
         try:
-            for keyword in keywords:
-                request_collect_serp_to_kafka(keyword)
+            failed_keywords = SerpDownloadProducer.get_instance().send_keywords(keywords) # 하나의 producer로 모아서 전송
         except Exception as e:
             print(f"[{datetime.now()}] error from {current_function_name()} : {e}")
         else:
-            print(f"[{datetime.now()}] 서프 수집을 위한 카프카 요청 완료 : {len(keywords)}개 키워드")
+            print(f"[{datetime.now()}] 서프 수집을 위한 카프카 요청 완료 : {len(keywords)}개 키워드 (실패 : {len(failed_keywords)}개)")
             
     def check_all_keywords_collected(self, 
                                      keywords : List[str],
                                      return_result : bool = False,
-                                     collected_time : str = None # yyyy-mm-dd hh:mm:ss # 특정 날짜 이후의 서프만 확인
+                                     collected_time : str = None, # yyyy-mm-dd hh:mm:ss # 특정 날짜 이후의 서프만 확인
+                                     min_wait_time : float = 5, # 최소 확인 간격 (초)
+                                     max_wait_time : float = 60, # 최대 확인 간격 (초)
+                                     resend_wait_time : float = 60*7 # 남은 키워드 카프카 재요청 간격 (초)
                                      ) -> Union["pd.DataFrame", bool]:
         '''
         서프 모두 수집되었는지 확인 (serp_history 테이블에서 조회하여 확인)
+        - 아직 수집되지 않은 키워드만 다시 조회 (이미 수집된 키워드는 다시 조회하지 않음)
+        - 두 번째 조회부터는 직전 조회 시점(watermark) 이후에 수집된 서프만 조회
+          (max_wait_time 간격까지 늘어나면 서버 시간 차이 등으로 놓친 서프가 없도록 watermark 없이 조회)
+        - 새로 수집된 키워드가 있으면 min_wait_time 간격으로, 없으면 max_wait_time까지 간격을 늘려가며 확인
         '''
         print(f"[{datetime.now()}] 서프 수집 완료 확인 시작")
         keywords = [k.lower() for k in keywords] # 대소문자 구분 안함 (디비에는 구분 안해 놓음)
-        if collected_time == None:
-            serp_hash_json_df = self.db.get_hash_json_by_keywords(keywords) # serp_history 테이블에서 조회
-        else:
-            serp_hash_json_df = self.db.get_hash_json_over_collected_time(keywords, collected_time)
+        pending_keywords = set(keywords)
+        collected = []
+        watermark = collected_time
+        wait_time = min_wait_time
+        last_send_time = time.time()
+        while True:
+            query_time = datetime.now()
+            use_watermark = wait_time < max_wait_time
+            serp_hash_json_df = self.get_hash_json(list(pending_keywords), watermark if use_watermark else collected_time)
+            collected_keywords = set(serp_hash_json_df['keyword']) & pending_keywords
+            if len(collected_keywords) > 0:
+                collected.append(serp_hash_json_df[serp_hash_json_df['keyword'].isin(collected_keywords)])
+                pending_keywords -= collected_keywords
+                wait_time = min_wait_time # 새로 수집된 서프가 있으면 짧게 다시 확인
+            else:
+                wait_time = min(wait_time * 2, max_wait_time)
+            if len(pending_keywords) == 0:
+                break
+            print(f"[{datetime.now()}] {len(keywords) - len(pending_keywords)}/{len(set(keywords))}개 수집 완료")
+            # 이후 조회는 이번 조회 시점 이후에 수집된 서프만 (수집 시간과 저장 시간 차이를 고려해 WATERMARK_MARGIN 만큼 여유)
+            new_watermark = (query_time - SerpCollector.WATERMARK_MARGIN).strftime("%Y-%m-%d %H:%M:%S")
+            watermark = new_watermark if collected_time == None else max(collected_time, new_watermark)
+            if len(pending_keywords) <= 200 and time.time() - last_send_time >= resend_wait_time:
+                self.send_to_kafka(list(pending_keywords))
+                last_send_time = time.time()
+            time.sleep(wait_time)
 
-        wait_time = 60*5
-        while set(keywords) != set(serp_hash_json_df['keyword']):
-            print(f"[{datetime.now()}] {len(set(serp_hash_json_df['keyword']))}/{len(set(keywords))}개 수집 완료")
-            not_collected_keywords = set(keywords) - set(serp_hash_json_df['keyword'])
-            if len(not_collected_keywords) <= 200:
-                self.send_to_kafka(not_collected_keywords)
-                wait_time = 60*7
-            time.sleep(wait_time) # 5분 기다림
-            serp_hash_json_df = self.db.get_hash_json_by_keywords(keywords) # serp_history 테이블에서 조회
-        
         print(f"[{datetime.now()}] 모든 서프 수집 완료 : {len(keywords)}개 키워드")
         if return_result:
-            return serp_hash_json_df
+            if len(collected) == 0: # keywords가 비어있는 경우
+                return serp_hash_json_df
+            return pd.concat(collected, axis=0).reset_index(drop=True)
         else:
             return True
+
+    def get_hash_json(self, keywords : List[str], collected_time : str = None) -> "pd.DataFrame":
+        '''
+        serp_history 테이블에서 keywords의 hash, json 조회 (collected_time 있으면 그 이후에 수집된 서프만)
+        '''
+        if collected_time == None:
+            return self.db.get_hash_json_by_keywords(keywords)
+        return self.db.get_hash_json_over_collected_time(keywords, collected_time)
     
     def send_to_kafka_and_check_all_keywords_collected(self, 
                                                        keywords : List[str],
@@ -119,14 +157,14 @@ class SerpCollector:
     
     def get_serp_by_hash(self, hash_value):
         url = f"https://mongttang-data-api.ascentlab.io/serp/?row_key={hash_value}&f=json"
-        response = requests.get(url)
-        serp = json.loads(response.text)
+        response = self.session.get(url, timeout=SerpCollector.SERP_DATA_TIMEOUT)
+        serp = json_codec.loads(response.content) # 응답 bytes를 바로 파싱
     
         return serp
 
     def get_serp_by_json(self, json_value):
-        response = requests.get(json_value)
-        serp = json.loads(response.text)
+        response = self.session.get(json_value, timeout=SerpCollector.SERP_DATA_TIMEOUT)
+        serp = json_codec.loads(response.content) # 응답 bytes를 바로 파싱
         
         return serp
     
@@ -142,26 +180,40 @@ class SerpCollector:
         else:
             return serp
                    
+    def _get_serp_by_json_or_hash_safe(self, keyword, json_value, hash_value) -> Tuple[str, Union[dict, None]]:
+        try:
+            return keyword, self.get_serp_by_json_or_hash(json_value, hash_value)
+        except Exception as e:
+            print(f"[{datetime.now()}] {keyword} 서프 조회 실패 (hash : {hash_value}) : {e}")
+            return keyword, None
+
+    def iter_serps(self, serp_hash_json_df : "pd.DataFrame") -> Iterator[Tuple[str, dict]]:
+        '''
+        serp_hash_json_df(keyword, hash, json)의 서프를 max_workers개씩 동시에 조회해서 완료되는 순서대로 (keyword, serp) 반환
+        hash로 조회 실패하면 json으로 조회 (둘 다 실패하면 반환하지 않음)
+        '''
+        rows = zip(serp_hash_json_df['keyword'], serp_hash_json_df['hash'], serp_hash_json_df['json'])
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = set()
+            for keyword, hash_value, json_value in rows:
+                running.add(executor.submit(self._get_serp_by_json_or_hash_safe, keyword, json_value, hash_value))
+                if len(running) >= self.max_workers * 2: # 요청 대기 개수 제한 (결과가 메모리에 쌓이지 않도록)
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        keyword, serp = future.result()
+                        if serp != None:
+                            yield keyword, serp
+            for future in running:
+                keyword, serp = future.result()
+                if serp != None:
+                    yield keyword, serp
+                   
     def get_serps(self, keywords : List[str]) -> dict:
         '''
         input으로 받은 키워드 리스트의 모든 서프 반환
         '''
         serp_hash_json_df = self.db.get_hash_json_by_keywords(keywords) # serp_history 테이블에서 조회
-        serps_by_keyword = {}
-        if len(serp_hash_json_df)> 0:
-            for i in range(len(serp_hash_json_df)):
-                keyword = serp_hash_json_df.loc[i, 'keyword']
-                hash_value = serp_hash_json_df.loc[i, 'hash']
-                json_value = serp_hash_json_df.loc[i, 'json']
-                serp = self.get_serp_by_hash(hash_value)
-                if not SerpValidator(serp).validate():
-                    serp = self.get_serp_by_json(json_value)
-                    if SerpValidator(serp).validate():
-                        serps_by_keyword[keyword] = serp
-                else:
-                   serps_by_keyword[keyword] = serp            
-            
-            return serps_by_keyword
+        return {keyword : serp for keyword, serp in self.iter_serps(serp_hash_json_df)}
         
     def get_serps_over_collected_time(self, 
                                       keywords : List[str], 
@@ -172,21 +224,7 @@ class SerpCollector:
         '''
         serp_hash_json_df = self.db.get_hash_json_over_collected_time(keywords, collected_time) # serp_history 테이블에서 조회
         print(f"[{datetime.now()}] {len(serp_hash_json_df)}/{len(keywords)}개 키워드 {collected_time} 이후 수집된 서프 존재")
-        serps_by_keyword = {}
-        if len(serp_hash_json_df)> 0:
-            for i in range(len(serp_hash_json_df)):
-                keyword = serp_hash_json_df.loc[i, 'keyword']
-                hash_value = serp_hash_json_df.loc[i, 'hash']
-                json_value = serp_hash_json_df.loc[i, 'json']
-                serp = self.get_serp_by_hash(hash_value)
-                if not SerpValidator(serp).validate():
-                    serp = self.get_serp_by_json(json_value)
-                    if SerpValidator(serp).validate():
-                        serps_by_keyword[keyword] = serp
-                else:
-                   serps_by_keyword[keyword] = serp            
-            
-            return serps_by_keyword
+        return {keyword : serp for keyword, serp in self.iter_serps(serp_hash_json_df)}
         
     def save_serp_to_local(self,
                            keywords : List[str],
@@ -194,22 +232,15 @@ class SerpCollector:
                            collected_time : str = None # yyyy-mm-dd hh:mm:ss
                            ) -> str: # 저장된 경로 반환
         '''
-        save_path 에 jsonl 형태로 서프 저장
+        save_path 에 jsonl 형태로 서프 저장 (조회가 완료되는 순서대로 저장)
         '''
-        if collected_time == None:
-            json_hash = self.db.get_hash_json_by_keywords(keywords)
-        else:
-            json_hash = self.db.get_hash_json_over_collected_time(keywords, collected_time)
+        json_hash = self.get_hash_json(keywords, collected_time)
         print(f"[{datetime.now()}] {len(json_hash)}/{len(keywords)}개 서프 저장 시작 (save_path : {save_path})")
         success_cnt = 0
-        for i in range(len(json_hash)):
-            keyword = json_hash.loc[i, 'keyword']
-            hash_value = json_hash.loc[i, 'hash']
-            json_value = json_hash.loc[i, 'json']
-            serp = self.get_serp_by_json_or_hash(json_value, hash_value)
-            if serp != None:
+        with JsonlWriter(save_path) as writer: # 파일은 한 번만 열어서 저장
+            for keyword, serp in self.iter_serps(json_hash):
                 success_cnt += 1
-                JsonlFileHandler(save_path).write(serp)
+                writer.write(serp)
         
         print(f"[{datetime.now()}] {success_cnt}/{len(keywords)}개 서프 저장 완료 (save_path : {save_path})")
         
@@ -236,7 +267,7 @@ class SerpCollector:
         }
         res = requests.get(url, params=params)
         if res.status_code == HTTPStatus.OK:
-            rowkeys = list(res.json())
+            rowkeys = list(json_codec.loads(res.content))
         else:
             rowkeys = []
         return list(rowkeys)[0]
@@ -251,7 +282,7 @@ class SerpCollector:
         url = "http://mongttang-data-api.ascentlab.io/serp/"
         params = {"row_key": rowkey, "f": f}
         res = requests.get(url, params=params)
-        return res.json()
+        return json_codec.loads(res.content)
     ####################################
     
     def fetch_serp_data(self, serp_api_params):
@@ -260,7 +291,7 @@ class SerpCollector:
                                  json=asdict(serp_api_params),
                                  timeout=60.0 * 5 + 15.0)
         if response.status_code == HTTPStatus.OK:
-            _serp = json.loads(response.text)
+            _serp = json_codec.loads(response.content) # 응답 bytes를 바로 파싱
             print(f"get_serp_from_serp_api {serp_api_params.q}")
             return _serp, []
         else:
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Union
+
+from utils import json_codec
+
+class SuggestCache:
+    '''
+    서제스트 api 응답을 로컬 sqlite에 저장해두고 재사용하는 캐시
+    - key : SuggestApiParams의 (query, hl, gl, ds, pre_expand_keyword)
+    - ttl(초)이 지난 응답은 사용하지 않음
+    - max_entries개를 넘으면 가장 오래 사용되지 않은 응답부터 삭제 (LRU)
+    - 여러 job이 같은 파일을 사용하므로 쓰기(put, accessed_time 갱신)는 메모리에 모아두었다가
+      commit_interval개 이상 쌓이거나 commit_seconds초가 지나면 짧은 transaction 한 번으로 저장
+    - db가 잠겨 있으면(OperationalError) get은 miss, 쓰기는 건너뜀 (수집은 계속 진행)
+    '''
+    def __init__(self,
+                 path:str,
+                 ttl:int=60*60*6, # 6시간
+                 max_entries:int=5_000_000,
+                 commit_interval:int=200, # 몇 개씩 모아서 저장할지
+                 commit_seconds:float=1.0, # 모아둔 쓰기를 최대 몇 초 뒤에 저장할지
+                 busy_timeout:float=5.0, # db가 잠겨 있을 때 기다리는 시간(초)
+                 evict_seconds:float=60.0): # max_entries 초과 확인 주기(초)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.commit_interval = commit_interval
+        self.commit_seconds = commit_seconds
+        self.evict_seconds = evict_seconds
+        self.statistics = {"hit": 0, "miss": 0, "evict": 0, "error": 0}
+        self._puts = {} # key -> (response, created_time), 아직 저장하지 않은 응답
+        self._touched = {} # key -> accessed_time, 아직 저장하지 않은 accessed_time
+        self._last_commit_time = time.monotonic()
+        self._last_evict_time = time.monotonic()
+        self._lock = threading.Lock()
+
+        save_folder = os.path.dirname(path)
+        if save_folder and not os.path.exists(save_folder):
+            os.makedirs(save_folder)
+        # get/put은 event loop 밖의 thread에서 호출하므로 check_same_thread=False (self._lock으로 보호)
+        self.conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL") # 여러 job이 동시에 같은 캐시 사용
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS suggest_cache (
+                                key TEXT PRIMARY KEY,
+                                response TEXT NOT NULL,
+                                created_time REAL NOT NULL,
+                                accessed_time REAL NOT NULL)''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed_time ON suggest_cache (accessed_time)")
+        self.conn.commit()
+        self.purge_expired()
+
+    @staticmethod
+    def make_key(suggest_api_params) -> str:
+        return json.dumps([suggest_api_params.query,
+                           suggest_api_params.hl,
+                           suggest_api_params.gl,
+                           suggest_api_params.ds,
+                           suggest_api_params.pre_expand_keyword], ensure_ascii=False)
+
+    def get(self, suggest_api_params) -> Union[dict, None]:
+        key = self.make_key(suggest_api_params)
+        now = time.time()
+        with self._lock:
+            if key in self._puts:
+                row = self._puts[key]
+            else:
+                try:
+                    row = self.conn.execute("SELECT response, created_time FROM suggest_cache WHERE key = ?", (key,)).fetchone()
+                except sqlite3.OperationalError as e:
+                    print(f"[{datetime.now()}] error from SuggestCache.get : {e}")
+                    self.statistics["error"] += 1
+                    row = None
+            if row == None or now - row[1] > self.ttl:
+                self.statistics["miss"] += 1
+                return None
+            self.statistics["hit"] += 1
+            self._touched[key] = now
+            self._commit_if_due()
+        return json_codec.loads(row[0])
+
+    def put(self, suggest_api_params, response:dict):
+        key = self.make_key(suggest_api_params)
+        with self._lock:
+            self._puts[key] = (json_codec.dumps_str(response), time.time())
+            self._commit_if_due()
+
+    def _commit_if_due(self):
+        if len(self._puts) + len(self._touched) >= self.commit_interval or time.monotonic() - self._last_commit_time >= self.commit_seconds:
+            self._commit()
+
+    def _commit(self):
+        '''
+        모아둔 쓰기를 하나의 transaction으로 저장 (실패하면 버림)
+        '''
+        puts, touched = self._puts, self._touched
+        self._puts, self._touched = {}, {}
+        self._last_commit_time = time.monotonic()
+        if len(puts) == 0 and len(touched) == 0:
+            return
+        try:
+            self.conn.executemany("INSERT OR REPLACE INTO suggest_cache (key, response, created_time, accessed_time) VALUES (?, ?, ?, ?)",
+                                  [(key, response, created_time, touched.pop(key, created_time)) for key, (response, created_time) in puts.items()])
+            self.conn.executemany("UPDATE suggest_cache SET accessed_time = ? WHERE key = ?",
+                                  [(accessed_time, key) for key, accessed_time in touched.items()])
+            if time.monotonic() - self._last_evict_time >= self.evict_seconds: # COUNT(*)는 느려서 가끔만 확인
+                self._evict()
+                self._last_evict_time = time.monotonic()
+            self.conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"[{datetime.now()}] error from SuggestCache._commit : {e} ({len(puts)}개 응답 저장 건너뜀)")
+            self.statistics["error"] += 1
+            self.conn.rollback()
+
+    def _evict(self):
+        '''
+        max_entries개를 넘는 만큼 accessed_time이 오래된 순으로 삭제
+        '''
+        count = self.conn.execute("SELECT COUNT(*) FROM suggest_cache").fetchone()[0]
+        if count > self.max_entries:
+            over = count - self.max_entries
+            self.conn.execute('''DELETE FROM suggest_cache WHERE key IN (
+                                    SELECT key FROM suggest_cache ORDER BY accessed_time LIMIT ?)''', (over,))
+            self.statistics["evict"] += over
+
+    def purge_expired(self):
+        with self._lock:
+            try:
+                self.conn.execute("DELETE FROM suggest_cache WHERE created_time < ?", (time.time() - self.ttl,))
+                self.conn.commit()
+            except sqlite3.OperationalError as e: # 다른 job이 쓰는 중이면 다음에 삭제
+                print(f"[{datetime.now()}] error from SuggestCache.purge_expired : {e}")
+                self.conn.rollback()
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -1,16 +1,29 @@
-import json
+import math
+import time
+import queue
+import asyncio
+import aiohttp
 import requests
-from tenacity import retry, stop_after_attempt
+import threading
+import itertools
+from tenacity import retry, stop_after_attempt, wait_random_exponential
 from http import HTTPStatus
-from multiprocessing import Pool
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List, Iterable, Iterator, Callable, Awaitable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 from lang import Ko, Ja, En
+from utils import json_codec
+from utils.rate_limiter import RateLimiter
+from collector.suggest_collector.suggest_cache import SuggestCache
 
 if TYPE_CHECKING:
     from lang import LanguageBase
 
+SUGGEST_API_URL = "http://google-suggest-api.ascentlab.io/api/suggest/v2/suggestions"
+SUGGEST_API_HEADERS = {"Content-Type": "application/json"}
+SUGGEST_API_TIMEOUT = 20
+
 @dataclass(frozen=True)
 class SuggestApiParams:
     query: str
@@ -21,11 +34,10 @@ class SuggestApiParams:
     ds:str = 'google'
     usage_id:str= "yujin.lee"
 
-@retry(stop=stop_after_attempt(10))
-def get_suggestions(suggest_api_params):
-    url = "http://google-suggest-api.ascentlab.io/api/suggest/v2/suggestions"
-    suggestions = []
-
+def make_payload(suggest_api_params) -> dict:
+    '''
+    서제스트 api 요청 payload 생성
+    '''
     if suggest_api_params.ds == "youtube":
         _payload = {
             "q": f"{suggest_api_params.query}",
@@ -45,16 +57,21 @@ def get_suggestions(suggest_api_params):
     if suggest_api_params.pre_expand_keyword:
         _payload["q"] = suggest_api_params.query
         _payload["pre_expand_keyword"] = suggest_api_params.pre_expand_keyword
+    return _payload
 
-    payload = json.dumps(_payload)
-    headers = {"Content-Type": "application/json"}
+# 재시도 간격 : 0.5초부터 지수적으로 증가 (최대 30초) + jitter
+@retry(stop=stop_after_attempt(10), wait=wait_random_exponential(multiplier=0.5, max=30))
+def get_suggestions(suggest_api_params):
+    suggestions = []
+    _payload = make_payload(suggest_api_params)
+    payload = json_codec.dumps(_payload)
 
     try:
-        response = requests.post(url, headers=headers, data=payload, timeout=20)
+        response = requests.post(SUGGEST_API_URL, headers=SUGGEST_API_HEADERS, data=payload, timeout=SUGGEST_API_TIMEOUT)
         status_code = response.status_code
 
         if status_code == HTTPStatus.OK:
-            suggestions = json.loads(response.text)
+            suggestions = json_codec.loads(response.content) # 응답 bytes를 바로 파싱
             return suggestions
         else:
             print(f"Failed to get suggestions - retrying: {_payload}")
@@ -71,26 +88,267 @@ def fetch_suggestions(suggest_api_params):
         print("Max retries reached. Returning None.")
         return None
 
+@retry(stop=stop_after_attempt(10), wait=wait_random_exponential(multiplier=0.5, max=30))
+async def get_suggestions_async(session : aiohttp.ClientSession,
+                                rate_limiter : RateLimiter,
+                                suggest_api_params):
+    '''
+    get_suggestions의 asyncio 버전 (session의 keep-alive 커넥션 재사용)
+    요청할 때마다 rate_limiter의 qps, 동시 요청 개수 제한을 따르고 응답 결과(성공 여부, 응답 시간)를 알려줌
+    '''
+    _payload = make_payload(suggest_api_params)
+    payload = json_codec.dumps(_payload)
+
+    await rate_limiter.acquire(SUGGEST_API_URL)
+    start = time.monotonic()
+    success = False
+    try:
+        async with session.post(SUGGEST_API_URL, headers=SUGGEST_API_HEADERS, data=payload) as response:
+            if response.status == HTTPStatus.OK:
+                suggestions = json_codec.loads(await response.read()) # 응답 bytes를 바로 파싱
+                success = True
+                return suggestions
+            else:
+                print(f"Failed to get suggestions - retrying: {_payload}")
+                raise Exception("API response error!")
+    except Exception as e:
+        print(f"Request failed: {e}")
+        raise
+    finally:
+        await rate_limiter.release(SUGGEST_API_URL, success, time.monotonic() - start)
+
+# 최대 10번 재시도 후 실패할 경우 None 반환 (fetch_suggestions와 동일)
+async def fetch_suggestions_async(session : aiohttp.ClientSession,
+                                  rate_limiter : RateLimiter,
+                                  suggest_api_params):
+    try:
+        return await get_suggestions_async(session, rate_limiter, suggest_api_params)
+    except Exception:
+        print("Max retries reached. Returning None.")
+        return None
+
 class Suggest:
-    def __init__(self):
+    def __init__(self, cache : SuggestCache = None):
         self.lang_dict = {"ko":Ko(),
                           "ja":Ja(),
                           "en":En()}    
+        self.cache = cache # 있으면 캐시된 응답을 먼저 사용
     
+    def _make_params(self, targets, lang, service) -> Iterator[SuggestApiParams]:
+        lang : LanguageBase = self.lang_dict[lang]
+        return (SuggestApiParams(query=t, 
+                                 hl=lang.hl,
+                                 gl=lang.gl,
+                                 expand_mode='exact',
+                                 ds=service) \
+                                 for t in targets)
+
+    async def _fetch(self,
+                     session : aiohttp.ClientSession,
+                     rate_limiter : RateLimiter,
+                     suggest_api_params : SuggestApiParams):
+        '''
+        캐시에 있으면 캐시된 응답 반환, 없으면 api 요청 후 캐시에 저장
+        '''
+        loop = asyncio.get_running_loop()
+        if self.cache != None:
+            # sqlite I/O는 event loop를 막지 않도록 thread에서 실행
+            res = await loop.run_in_executor(None, self.cache.get, suggest_api_params)
+            if res is not None:
+                return res
+        res = await fetch_suggestions_async(session, rate_limiter, suggest_api_params)
+        if res is not None and self.cache != None:
+            await loop.run_in_executor(None, self.cache.put, suggest_api_params, res)
+        return res
+
+    async def _requests_async(self,
+                              targets : List[SuggestApiParams],
+                              max_concurrency : int,
+                              qps : float = None) -> list:
+        '''
+        하나의 커넥션 풀(session)로 targets 서제스트 요청 (최대 max_concurrency개 동시 요청)
+        '''
+        rate_limiter = RateLimiter(qps=qps, max_concurrency=max_concurrency)
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=SUGGEST_API_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            result = await asyncio.gather(*[self._fetch(session, rate_limiter, t) for t in targets])
+        print(f"rate limiter : {rate_limiter.summary()}")
+        if self.cache != None:
+            self.cache.flush()
+        return result
+
     def _requests(self,
                   targets,
                   lang,
                   service, # ['google', 'youtube']
-                  num_processes : int = 30) -> dict:
-        lang : LanguageBase = self.lang_dict[lang]
-        targets = [SuggestApiParams(query=t, 
-                                    hl=lang.hl,
-                                    gl=lang.gl,
-                                    expand_mode='exact',
-                                    ds=service) \
-                                    for t in targets]
+                  max_concurrency : int = 30,
+                  qps : float = None) -> list:
+        targets = list(self._make_params(targets, lang, service))
         print(targets[0])
-        with Pool(num_processes) as pool:
-            result = pool.map(fetch_suggestions, targets)
+        result = asyncio.run(self._requests_async(targets, max_concurrency, qps))
         result = [res for res in result if res is not None]
-        return result
\ No newline at end of file
+        return result
+
+    async def _stream_async(self,
+                            targets : Iterator[SuggestApiParams],
+                            max_concurrency : int,
+                            qps : float,
+                            put : Callable[[dict], Awaitable[bool]]):
+        '''
+        max_concurrency개의 worker가 targets를 나눠서 요청하고 완료된 결과를 put으로 넘김 (put이 False면 중단)
+        (실제 동시 요청 개수는 rate_limiter가 응답 상태에 따라 조절)
+        '''
+        rate_limiter = RateLimiter(qps=qps, max_concurrency=max_concurrency)
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=SUGGEST_API_TIMEOUT)
+
+        async def worker(session):
+            for target in targets: # 모든 worker가 같은 iterator를 공유
+                res = await self._fetch(session, rate_limiter, target)
+                if res is not None and not await put(res):
+                    return
+
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                await asyncio.gather(*[worker(session) for _ in range(max_concurrency)])
+        finally: # 중간에 취소되어도 캐시에 쌓인 응답은 저장
+            print(f"rate limiter : {rate_limiter.summary()}")
+            if self.cache != None:
+                self.cache.flush()
+                print(f"suggest cache : {self.cache.statistics}")
+
+    async def _expand_stream_async(self,
+                                   targets : Iterator[SuggestApiParams],
+                                   lang,
+                                   service,
+                                   expand : Callable[[dict], Iterable[str]],
+                                   max_concurrency : int,
+                                   qps : float,
+                                   put : Callable[[dict], Awaitable[bool]]):
+        '''
+        _stream_async와 동일하지만 응답이 올 때마다 expand(응답)이 반환한 확장 텍스트를 바로 요청 목록에 추가
+        (단계별로 전체 수집이 끝날 때까지 기다리지 않음)
+        확장 단계가 깊은 target부터 요청해서 대기 중인 target이 계속 쌓이지 않도록 함
+        '''
+        rate_limiter = RateLimiter(qps=qps, max_concurrency=max_concurrency)
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=SUGGEST_API_TIMEOUT)
+        work_queue = asyncio.PriorityQueue() # (-확장 단계, 추가된 순서, target)
+        order = itertools.count()
+        for target in targets:
+            work_queue.put_nowait((0, next(order), target))
+
+        async def worker(session):
+            while True:
+                depth, _, target = await work_queue.get()
+                try:
+                    res = await self._fetch(session, rate_limiter, target)
+                    if res is not None:
+                        for child in self._make_params(expand(res), lang, service):
+                            work_queue.put_nowait((depth - 1, next(order), child))
+                        if not await put(res):
+                            return
+                finally:
+                    work_queue.task_done()
+
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                workers = [asyncio.create_task(worker(session)) for _ in range(max_concurrency)]
+                join = asyncio.create_task(work_queue.join())
+                # 모든 target(확장된 target 포함) 완료 혹은 worker에서 에러 발생(혹은 중단)할 때까지 대기
+                try:
+                    await asyncio.wait([join, *workers], return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for task in [join, *workers]:
+                        task.cancel()
+                    results = await asyncio.gather(join, *workers, return_exceptions=True)
+        finally: # 중간에 취소되어도 캐시에 쌓인 응답은 저장
+            print(f"rate limiter : {rate_limiter.summary()}")
+            if self.cache != None:
+                self.cache.flush()
+                print(f"suggest cache : {self.cache.statistics}")
+        for res in results:
+            if isinstance(res, Exception) and not isinstance(res, asyncio.CancelledError):
+                raise res
+
+    @staticmethod
+    def _put(result_queue : queue.Queue, item, stop : threading.Event) -> bool:
+        '''
+        queue가 가득 차 있으면 stop이 될 때까지 기다림 (제너레이터가 닫혀도 thread가 영원히 막히지 않도록)
+        '''
+        while not stop.is_set():
+            try:
+                result_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _requests_stream(self,
+                         targets : Iterable[str],
+                         lang,
+                         service, # ['google', 'youtube']
+                         qps : float = None, # 초당 최대 요청 수 (None 이면 제한 없음)
+                         max_concurrency : int = None, # 최대 동시 요청 개수 (None 이면 qps로 설정)
+                         buffer_size : int = 1000,
+                         expand : Callable[[dict], Iterable[str]] = None # 응답을 받아 추가로 요청할 확장 텍스트 반환
+                         ) -> Iterator[dict]:
+        '''
+        서제스트 요청 후 완료되는 순서대로 결과를 하나씩 반환하는 제너레이터
+        (결과 순서는 targets 순서와 다름, 실패한 요청은 반환하지 않음)
+        expand가 있으면 응답마다 expand가 반환한 확장 텍스트도 이어서 요청 (expand는 수집 thread에서 호출됨)
+        제너레이터를 중간에 닫으면 진행 중인 요청을 취소하고 수집 thread를 종료
+        '''
+        if max_concurrency == None:
+            max_concurrency = math.ceil(qps) if qps != None else 30
+        targets = self._make_params(targets, lang, service)
+        result_queue = queue.Queue(maxsize=buffer_size)
+        stop = threading.Event()
+        # queue가 가득 차면 소비될 때까지 기다리는 put은 전용 thread에서 실행 (캐시 조회/저장 thread를 막지 않도록)
+        put_executor = ThreadPoolExecutor(max_workers=1)
+        running = [] # (event loop, 수집 task)
+        done = object()
+        errors = []
+
+        async def put(res) -> bool:
+            return await asyncio.get_running_loop().run_in_executor(put_executor, self._put, result_queue, res, stop)
+
+        async def collect():
+            running.append((asyncio.get_running_loop(), asyncio.current_task()))
+            if stop.is_set(): # 시작 전에 닫힘
+                return
+            if expand == None:
+                await self._stream_async(targets, max_concurrency, qps, put)
+            else:
+                await self._expand_stream_async(targets, lang, service, expand, max_concurrency, qps, put)
+
+        def run():
+            try:
+                asyncio.run(collect())
+            except asyncio.CancelledError: # 제너레이터가 닫혀서 취소됨
+                pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self._put(result_queue, done, stop)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                res = result_queue.get()
+                if res is done:
+                    break
+                yield res
+        finally:
+            stop.set()
+            for loop, task in running:
+                try:
+                    loop.call_soon_threadsafe(task.cancel)
+                except RuntimeError: # 이미 끝난 event loop
+                    pass
+            thread.join()
+            put_executor.shutdown(wait=True)
+        if errors:
+            raise errors[0]
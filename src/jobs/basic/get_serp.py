@@ -4,36 +4,16 @@ import argparse
 from typing import List, Tuple
 from datetime import datetime
 
-from utils.file import TXTFileHandler, JsonlFileHandler, GZipFileHandler
+from utils.file import TXTFileHandler, JsonlFileHandler, JsonlWriter, GZipFileHandler
 from collector.serp_collector.serp_collector import SerpCollector
 from utils.task_history import TaskHistory
 from utils.hdfs import HdfsFileHandler
+from utils.serp_keyword_registry import SerpKeywordRegistry
 from utils.slack import ds_trend_finder_dbgout, ds_trend_finder_dbgout_error
 from utils.decorator import error_notifier
 from config import postgres_db_config
 from serp.serp_checker import SerpChecker, SerpCheckerKo, SerpCheckerJa, SerpCheckerEn
 
-def get_keywords_already_collected_serp(
-                                        lang:str, # ["ko", "ja"]
-                                        date:str # yyyymmdd
-                                        ) -> List[str]:
-    '''
-    hdfs에서 해당 날짜에 서프가 이미 수집된 키워드 목록 가져오기
-    '''
-    hdfs = HdfsFileHandler()
-    services = ["google", 'youtube']
-    suggest_types = ["basic", "target"]
-    keywords = []
-    for service in services:
-        for suggest_type in suggest_types:
-            file_path = f"/user/ds/wordpopcorn/{lang}/daily/{service}_suggest_for_llm_entity_topic/{date[:4]}/{date[:6]}/{date[:8]}/serp_keywords_{suggest_type}.txt"
-            if not hdfs.exist(file_path):
-                print(f"[{datetime.now()}] 해당 hdfs 경로에 파일이 존재하지 않습니다. (file_path : {file_path})")
-                continue
-            contents = hdfs.load(file_path)
-            keywords += list(set([line.strip() for line in contents.splitlines() if line.strip()]))  # 중복 제거 및 정렬
-    return keywords
-
 class EntitySerpDaily:
     def __init__(self, job_id:str, lang:str, service:str, log_task_history:bool=False):
         # 기본 정보
@@ -56,7 +36,7 @@ class EntitySerpDaily:
         # hdfs 관련
         self.hdfs = HdfsFileHandler()
         self.hdfs_upload_folder = f"/user/ds/wordpopcorn/{self.lang}/daily/{self.service}_suggest_for_llm_entity_topic/{self.job_id[:4]}/{self.job_id[:6]}/{self.job_id[:8]}/{self.job_id}"
-        self.hdfs_already_collected_serp_keywords_path = f"/user/ds/wordpopcorn/{self.lang}/daily/{self.service}_suggest_for_llm_entity_topic/{self.job_id[:4]}/{self.job_id[:6]}/{self.job_id[:8]}/serp_keywords_{self.suggest_type}.txt"
+        self.serp_keyword_registry = SerpKeywordRegistry(self.hdfs, self.lang, self.job_id, self.service, self.suggest_type) # 오늘 서프를 수집한 키워드 (serp_keywords_*.txt)
        
         # Task History 관련
         self.log_task_history = log_task_history
@@ -70,22 +50,12 @@ class EntitySerpDaily:
         self.serp_checker = self.get_serp_checker()
 
     @error_notifier
-    def append_keywords_to_serp_keywords_txt(self, keywords, log:bool=True):
+    def append_keywords_to_serp_keywords_txt(self, keywords):
         '''
-        hdfs에 저장된 serp_keywords_target.txt에 키워드 추가
+        hdfs에 저장된 serp_keywords_{suggest_type}.txt에 키워드 추가
+        (모아두었다가 한 번에 저장, job이 끝날 때 serp_keyword_registry.flush()로 남은 키워드 저장)
         '''
-        # 키워드 리스트를 문자열로 변환 (줄바꿈으로 각 키워드 구분)
-        keyword_data = '\n'.join(keywords) + '\n'
-
-        # 파일이 존재하는지 확인하고, 없으면 새로 생성
-        if not self.hdfs.exist(self.hdfs_already_collected_serp_keywords_path):
-            # 파일이 존재하지 않을 경우 새로 생성
-            self.hdfs.write(self.hdfs_already_collected_serp_keywords_path, keyword_data, encoding='utf-8')
-        else:
-            # 파일이 존재할 경우, append 모드로 키워드 추가
-            self.hdfs.write(self.hdfs_already_collected_serp_keywords_path, keyword_data, encoding='utf-8', append=True)
-        if log:
-            print(f"[{datetime.now()}] hdfs에 키워드 추가 완료 (keywords : {len(keywords)}개 키워드, hdfs_path : {self.hdfs_already_collected_serp_keywords_path})")
+        self.serp_keyword_registry.add(keywords)
 
     @error_notifier
     def get_serp_checker(self) -> SerpChecker:
@@ -107,49 +77,49 @@ class EntitySerpDaily:
         failed_keywords = []
         success_keywords = []
 
-        while retry_count < max_retries: # 최대 2번까지만 retry
-            error_keywords = []
-            current_success = []
-            for i in range(0, len(keywords), batch_size):
-                print(f"[{datetime.now()}] {i}/{len(keywords)}")
-                res, error_res = self.serp_collector.get_serp_from_serp_api(keywords[i:i+batch_size], 
-                                                                            domain="llm_entity_topic")
-                # 해당 국가의 서프 구분
-                domestic_serps = []
-                non_domestic_serps = []
-                for r in res:
-                    if self.is_domestic_serp(r): domestic_serps.append(r)
-                    else: non_domestic_serps.append(r)
+        # 수집하는 동안 서프 저장 파일은 한 번만 열어서 저장
+        with JsonlWriter(self.serp_download_local_path) as domestic_writer, \
+             JsonlWriter(self.serp_download_local_path_non_domestic) as non_domestic_writer:
+            while retry_count < max_retries: # 최대 2번까지만 retry
+                error_keywords = []
+                current_success = []
+                for i in range(0, len(keywords), batch_size):
+                    print(f"[{datetime.now()}] {i}/{len(keywords)}")
+                    res, error_res = self.serp_collector.get_serp_from_serp_api(keywords[i:i+batch_size], 
+                                                                                domain="llm_entity_topic")
+                    # 해당 국가의 서프 구분
+                    domestic_serps, non_domestic_serps = self.split_domestic_serps(res)
                 
-                print(f"[{datetime.now()}] domestic_serps : {len(domestic_serps)}/{len(res)}개, non_domestic_serps : {len(non_domestic_serps)}/{len(res)}개")
+                    print(f"[{datetime.now()}] domestic_serps : {len(domestic_serps)}/{len(res)}개, non_domestic_serps : {len(non_domestic_serps)}/{len(res)}개")
 
-                JsonlFileHandler(self.serp_download_local_path).write(domestic_serps)
-                JsonlFileHandler(self.serp_download_local_path_non_domestic).write(non_domestic_serps)
+                    domestic_writer.write(domestic_serps)
+                    non_domestic_writer.write(non_domestic_serps)
 
-                # 성공한 키워드와 실패한 키워드 추적
-                try:
-                    current_success += [r['search_parameters']['q'] for r in res if r and 'search_parameters' in r and 'q' in r['search_parameters']]
-                except Exception as e:
-                    print(f"[{datetime.now()}] 성공한 키워드 추출 중 에러 발생: {e}")
+                    # 성공한 키워드와 실패한 키워드 추적
+                    try:
+                        current_success += [r['search_parameters']['q'] for r in res if r and 'search_parameters' in r and 'q' in r['search_parameters']]
+                    except Exception as e:
+                        print(f"[{datetime.now()}] 성공한 키워드 추출 중 에러 발생: {e}")
                 
-                try:
-                    error_keywords += [r[0]['query'] for r in error_res if (len(r)>0 and type(r[0])==dict and 'query' in r[0])]
-                except Exception as e:
-                    print(f"[{datetime.now()}] 실패한 키워드 추출 중 에러 발생: {e}")
+                    try:
+                        error_keywords += [r[0]['query'] for r in error_res if (len(r)>0 and type(r[0])==dict and 'query' in r[0])]
+                    except Exception as e:
+                        print(f"[{datetime.now()}] 실패한 키워드 추출 중 에러 발생: {e}")
             
-            error_keywords_len = len(error_keywords) # 에러 키워드 수 갱신
-            keywords = error_keywords # 에러 키워드로 다시 수집
-            retry_count += 1
-            print(f"[{datetime.now()}] 서프 수집 에러 키워드 : {error_keywords_len} 개 (retry count: {retry_count}/{max_retries})")
+                error_keywords_len = len(error_keywords) # 에러 키워드 수 갱신
+                keywords = error_keywords # 에러 키워드로 다시 수집
+                retry_count += 1
+                print(f"[{datetime.now()}] 서프 수집 에러 키워드 : {error_keywords_len} 개 (retry count: {retry_count}/{max_retries})")
             
-            if retry_count == max_retries:
-                failed_keywords = error_keywords
-                success_keywords = list(set(current_success))
-                # 실패한 키워드 추가
-                self.final_failed_keywords.update(failed_keywords)
-                # 성공한 키워드 제거
-                self.final_failed_keywords -= set(success_keywords)
+                if retry_count == max_retries:
+                    failed_keywords = error_keywords
+                    success_keywords = list(set(current_success))
+                    # 실패한 키워드 추가
+                    self.final_failed_keywords.update(failed_keywords)
+                    # 성공한 키워드 제거
+                    self.final_failed_keywords -= set(success_keywords)
                 
+
         print(f"[{datetime.now()}] 서프 수집 완료 (local dest : {self.serp_download_local_path})")
         print(f"[{datetime.now()}] 수집해야 할 키워드 : {len(keywords)} 개")
         print(f"[{datetime.now()}] 최종 수집 성공 키워드 : {len(success_keywords)} 개")
@@ -160,17 +130,18 @@ class EntitySerpDaily:
     def is_domestic_serp(self, serp:dict) -> bool:
         return self.serp_checker(serp).is_domestic()
     
+    @error_notifier
+    def split_domestic_serps(self, serps:List[dict]) -> Tuple[List[dict], List[dict]]:
+        '''
+        (해당 국가 서프, 해당 국가가 아닌 서프)로 나눔
+        '''
+        return self.serp_checker.split_domestic(serps)
+    
     @error_notifier
     def count_line(self, path) -> int:
-        if path.endswith(".gz"): # 압축 파일이면 압축해제
-            read_path = GZipFileHandler.ungzip(path)
-        else:
-            read_path = path
-        lines = JsonlFileHandler(read_path).count_line()
-        if (path != read_path and 
-            ~read_path.endswith(".gz")): # 압축 풀었던 파일 다시 압축
-            GZipFileHandler.gzip(read_path)
-        return lines
+        if not os.path.exists(path): # 수집한 서프가 없으면 파일이 없음
+            return 0
+        return JsonlFileHandler(path).count_line() # .gz 파일도 압축 해제 없이 읽음
     
     @error_notifier
     def extract_statistics(self):
@@ -183,21 +154,25 @@ class EntitySerpDaily:
             "total": domestic_serp_count + non_domestic_serp_count,
             "domestic": domestic_serp_count,
             "non_domestic": non_domestic_serp_count,
+            "hdfs": self.hdfs.statistics,
             "failed": len(self.final_failed_keywords)  # 최종 실패 키워드 리스트의 길이 사용
         }
     
     @error_notifier
     def upload_to_hdfs(self):
+        upload_files = []
         if os.path.exists(self.serp_download_local_path):
             basic_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_serp.jsonl.gz"
-            self.hdfs.upload(source=self.serp_download_local_path, dest=basic_hdfs_path, overwrite=True)
+            upload_files.append((self.serp_download_local_path, basic_hdfs_path))
         else:
             print(f"[{datetime.now()}] error from upload_to_hdfs : 로컬에 해당 파일이 존재하지 않습니다 (serp_download_local_path : {self.serp_download_local_path})")
         if os.path.exists(self.serp_download_local_path_non_domestic):
             non_domestic_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_serp_non_domestic.jsonl.gz"
-            self.hdfs.upload(source=self.serp_download_local_path_non_domestic, dest=non_domestic_hdfs_path, overwrite=True)
+            upload_files.append((self.serp_download_local_path_non_domestic, non_domestic_hdfs_path))
         else:
             print(f"[{datetime.now()}] error from upload_to_hdfs : 로컬에 해당 파일이 존재하지 않습니다 (serp_download_local_path_non_domestic : {self.serp_download_local_path_non_domestic})")
+        if len(upload_files) > 0:
+            self.hdfs.upload_files(upload_files, job_name=f"{self.suggest_type}_serp") # 동시에 업로드하고 내용 확인 후 _SUCCESS.{suggest_type}_serp에 기록
 
     def run(self):
         try:
@@ -236,7 +211,7 @@ class EntitySerpDaily:
                     # 새로운 키워드를 처리
                     keywords_to_collect_serp = list(set(trend_keywords[last_keyword_count:]) - already_collected_keywords)
                     print(f"[{datetime.now()}] 이미 수집된 키워드 제거 후 1 ({len(keywords_to_collect_serp)})개")
-                    keywords_to_collect_serp = list(set(keywords_to_collect_serp) - set(get_keywords_already_collected_serp(self.lang, self.job_id))) # 오늘 수집한 키워드 제외
+                    keywords_to_collect_serp = list(set(keywords_to_collect_serp) - self.serp_keyword_registry.refresh()) # 오늘 수집한 키워드 제외
                     print(f"[{datetime.now()}] 이미 수집된 키워드 제거 후 2 ({len(keywords_to_collect_serp)})개")
                     success_keywords, failed_keywords = self.collect_serp(keywords_to_collect_serp) # 이미 수집한 키워드 제외하고 수집
                     self.append_keywords_to_serp_keywords_txt(success_keywords) # 수집한 키워드 hdfs에 저장
@@ -255,16 +230,18 @@ class EntitySerpDaily:
                 time.sleep(60*1)  # 1분마다 파일을 확인
 
             print(f"[{datetime.now()}] 더 이상 키워드가 추가되지 않아 프로세스를 종료합니다.")
+            self.serp_keyword_registry.flush() # 모아둔 키워드 hdfs에 저장
 
-            # 압축
-            self.serp_download_local_path = GZipFileHandler.gzip(self.serp_download_local_path)
-            self.serp_download_local_path_non_domestic = GZipFileHandler.gzip(self.serp_download_local_path_non_domestic)
+            # 압축 (수집한 서프가 없으면 파일이 없음)
+            self.serp_download_local_path = GZipFileHandler.gzip(self.serp_download_local_path, missing_ok=True)
+            self.serp_download_local_path_non_domestic = GZipFileHandler.gzip(self.serp_download_local_path_non_domestic, missing_ok=True)
 
             # HDFS 업로드
             self.upload_to_hdfs()
             
         except Exception as e:
             print(f"[{datetime.now()}] 서프 수집 실패 작업 종료\nError Msg : {e}")
+            self.serp_keyword_registry.flush() # 수집한 키워드는 실패해도 저장
             ds_trend_finder_dbgout_error(self.lang,
                                          f"{self.slack_prefix_msg}\nMessage : 서프 수집 실패 작업 종료")
             if self.log_task_history:
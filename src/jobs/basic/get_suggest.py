@@ -1,20 +1,21 @@
 import os
-import gc
-import math
 import argparse
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Union
 
 from collector.suggest_collector.suggest_collect import Suggest
-from validator.trend_keyword_validator import is_trend_keyword, cnt_valid_suggest
-from utils.file import JsonlFileHandler, GZipFileHandler, TXTFileHandler, has_file_extension
-from utils.data import Trie, remove_duplicates_from_new_keywords, remove_duplicates_from_new_keywords_ko, remove_duplicates_with_spaces
+from collector.suggest_collector.suggest_cache import SuggestCache
+from validator.trend_keyword_validator import extract_trend_keywords, cnt_valid_suggest
+from utils.file import JsonlFileHandler, JsonlWriter, GZipFileHandler, TXTFileHandler, KeywordIndexFileHandler, has_file_extension
+from utils.data import remove_duplicates_from_new_keywords, remove_duplicates_from_new_keywords_ko, remove_duplicates_with_spaces
+from utils.record import SuggestResult
 from utils.hdfs import HdfsFileHandler
+from utils.trend_history import TrendKeywordHistoryLoader
 from utils.task_history import TaskHistory
 from utils.slack import ds_trend_finder_dbgout, ds_trend_finder_dbgout_error
 from utils.decorator import error_notifier
 from utils.converter import adjust_job_id
-from lang import Ko, Ja, En, filter_en_valid_trend_keyword, filter_en_valid_token_count
+from lang import Ko, Ja, En, filter_en_valid_trend_keywords
 from config import postgres_db_config
 
 class EntitySuggestDaily:
@@ -34,6 +35,7 @@ class EntitySuggestDaily:
         self.new_trend_keyword_file = f"{self.local_folder_path}/{self.job_id}_trend_keywords_new.txt" # 새로 나온 트렌드 키워드 저장
         self.except_for_valid_trend_keywords_file = f"{self.local_folder_path}/{self.job_id}_except_for_valid_trend_keywords.txt" # 유효하지 않은 트렌드 키워드 저장
         self.local_result_path = f"{self.local_folder_path}/{self.job_id}.jsonl"
+        self.collected_keyword_index = KeywordIndexFileHandler(f"{self.local_folder_path}/{self.job_id}_collected_keywords.txt", self.local_result_path) # 수집 완료된 키워드 인덱스
         
         # hdfs 관련
         self.hdfs = HdfsFileHandler()
@@ -48,8 +50,11 @@ class EntitySuggestDaily:
         # slack 관련
         self.slack_prefix_msg = f"Job Id : `{self.job_id}`\nTask Name : `{self.task_name}`-`{self.lang}`"
 
+        # 서제스트 캐시 관련 (google/youtube, basic/target job이 같은 캐시 공유)
+        self.suggest_cache = SuggestCache("./data/cache/suggest_cache.sqlite", ttl=60*60*6)
+
         # 통계량 관련
-        self.statistics = {"call": {}, "valid": {}, "trend_keyword": {}}
+        self.statistics = {"call": {}, "valid": {}, "trend_keyword": {}, "cache": self.suggest_cache.statistics, "hdfs": self.hdfs.statistics}
 
     @error_notifier
     def get_lang(self, lang:str):
@@ -97,31 +102,18 @@ class EntitySuggestDaily:
         already_collected_keywords = []
         if os.path.exists(self.local_result_path):
             print(f"[{datetime.now()}] 이미 수집된 서제스트 결과가 있습니다. (path : {self.local_result_path})")
-            for line in JsonlFileHandler(self.local_result_path).read_generator():
-                already_collected_keywords.append(line['keyword'])
+            already_collected_keywords = list(self.collected_keyword_index.read()) # jsonl 대신 인덱스 파일에서 읽음
             print(f"[{datetime.now()}] ㄴ {len(already_collected_keywords)}개 키워드 수집되어 있음")
-        return list(set(already_collected_keywords))
+        return already_collected_keywords
     
     @error_notifier
     def get_past_trend_keywords(self, today:str, lang:str, days:int) -> List[str]:
         '''
         이전 트렌드 키워드 목록 가져오기
         '''
-        services = ['google', 'youtube']
-                
-        print(f"[{datetime.now()}] {today} 기준 이전 {days}일 트렌드 키워드 목록 가져오기")
-        today_datetime = datetime.strptime(today, "%Y%m%d")
-        past_trend_keywords = []
-        for i in range(1, days+1, 1):
-            date = today_datetime - timedelta(days=i)
-            date = date.strftime("%Y%m%d")
-            for service in services:
-                txt_files = self.get_all_txt_files(f"/user/ds/wordpopcorn/{lang}/daily/{service}_suggest_for_llm_entity_topic/{date[:4]}/{date[:6]}/{date[:8]}")
-                for file in txt_files:
-                    past_trend_keywords += self.load_keywords_from_hdfs(file)
-
-        past_trend_keywords = list(set(past_trend_keywords))
-        print(f"키워드 개수 : {len(set(past_trend_keywords))}")
+        # 날짜/서비스별 폴더를 동시에 읽고, 지난 날짜는 로컬 스냅샷 재사용 (어제 것만 hdfs에서 읽음)
+        loader = TrendKeywordHistoryLoader(self.hdfs, lang)
+        past_trend_keywords = loader.load(today, days)
 
         return past_trend_keywords
     
@@ -168,60 +160,82 @@ class EntitySuggestDaily:
     def get_suggest_and_request_serp(self,
                                      targets : List[str],
                                      result_file_path : str, # "*.jsonl"
-                                     num_processes:int
+                                     qps:float, # 초당 최대 요청 수
+                                     chunk_size:int=2000, # 몇 개의 결과마다 저장할지
+                                     expand=None # 응답을 받아 추가로 수집할 키워드를 반환하는 함수 (Suggest._requests_stream 참고)
                                      ) -> str: # 저장 경로 반환
         '''
         서제스트 수집 요청 및 로컬에 저장 + 서프 수집 요청
+        수집이 완료되는 순서대로 chunk_size개씩 바로 저장 (느린 키워드가 있어도 나머지 결과는 먼저 저장됨)
+        expand가 있으면 수집 개수는 len(targets)보다 많을 수 있음
         '''
-        suggest = Suggest()
-        batch_size = 10000
-        print(f"[{datetime.now()}] 수집할 개수 : {len(targets)} | batch_size : {batch_size}")
-        for i in range(0, len(targets), batch_size):
-            start = datetime.now()
-            result = suggest._requests(targets[i : i+batch_size], 
-                                       self.lang, 
-                                       self.service, 
-                                       num_processes = num_processes)
-            print(f"[{datetime.now()}]    ㄴ batch {int((i+batch_size)/batch_size)}/{math.ceil(len(targets)/batch_size)} finish : {datetime.now()-start}")
-            JsonlFileHandler(result_file_path).write(result)
-            # 트렌드 키워드 추출
-            try:
-                trend_keywords = [suggestion['text'] for res in result for suggestion in res['suggestions'] if is_trend_keyword(suggestion['text'], # 트렌드 키워드 추출
-                                                                                                                        suggestion['suggest_type'], 
-                                                                                                                        suggestion['suggest_subtypes'])]
-                valid_trend_keywords = [keyword for keyword in trend_keywords if self.filter_valid_trend_keywords(keyword)] # 트렌드 키워드 중 유효한 키워드만 추출
-                print(f"[{datetime.now()}]       ㄴ✔️유효한 트렌드 키워드 개수 : {len(valid_trend_keywords)}/{len(trend_keywords)}")
-                TXTFileHandler(self.trend_keyword_file).write(valid_trend_keywords) # valid_trend_keywords 저장
-                TXTFileHandler(self.except_for_valid_trend_keywords_file).write(list(set(trend_keywords) - set(valid_trend_keywords))) # valid_trend_keywords를 제외한 나머지 저장
-                # 새로 나온 트렌드 키워드 추출
-                if self.lang == "ko":
-                    new_trend_keywords = list(remove_duplicates_from_new_keywords_ko(set(self.past_trend_keywords), set(valid_trend_keywords)))
-                else:
-                    new_trend_keywords = list(remove_duplicates_from_new_keywords(set(self.past_trend_keywords), set(valid_trend_keywords)))
-                TXTFileHandler(self.new_trend_keyword_file).write(new_trend_keywords)
-            except Exception as e:
-                print(f"[{datetime.now()}] 트렌드 키워드 추출 및 저장 실패 : {e}")
-            # TODO : 서프 수집 요청 (kafka)
-            
+        suggest = Suggest(cache=self.suggest_cache)
+        start = datetime.now()
+        print(f"[{datetime.now()}] 수집할 개수 : {len(targets)} | chunk_size : {chunk_size}")
+        if len(targets) == 0:
+            return result_file_path
+        with JsonlWriter(result_file_path) as writer: # 수집하는 동안 결과 파일은 한 번만 열어서 저장
+            result = []
+            collected_cnt = 0
+            for res in suggest._requests_stream(targets, 
+                                                self.lang, 
+                                                self.service, 
+                                                qps = qps,
+                                                expand = expand):
+                result.append(res)
+                if len(result) >= chunk_size:
+                    collected_cnt += len(result)
+                    self.save_suggest_result(result, result_file_path, writer)
+                    print(f"[{datetime.now()}]    ㄴ {collected_cnt}/{len(targets)} 수집 완료 : {datetime.now()-start}")
+                    result = []
+            if len(result) > 0:
+                collected_cnt += len(result)
+                self.save_suggest_result(result, result_file_path, writer)
+        print(f"[{datetime.now()}]    ㄴ {collected_cnt}/{len(targets)} 수집 완료 : {datetime.now()-start}")
         return result_file_path
 
     @error_notifier
-    def filter_valid_trend_keywords(self, trend_keyword:str) -> bool:
+    def save_suggest_result(self, result : List[dict], result_file_path : str, writer : JsonlWriter):
+        '''
+        서제스트 수집 결과 로컬에 저장(writer : result_file_path에 쓰는 JsonlWriter) + 트렌드 키워드 추출 및 저장
+        '''
+        writer.write(result)
+        writer.flush() # 인덱스에 추가하기 전에 jsonl에 기록
+        if result_file_path == self.local_result_path:
+            self.collected_keyword_index.append([res['keyword'] for res in result]) # jsonl에 저장된 후 인덱스에 추가
+        # 트렌드 키워드 추출
+        try:
+            trend_keywords = extract_trend_keywords([SuggestResult.from_dict(res) for res in result]) # 트렌드 키워드 추출
+            valid_trend_keywords = self.filter_valid_trend_keywords(trend_keywords) # 트렌드 키워드 중 유효한 키워드만 추출
+            print(f"[{datetime.now()}]       ㄴ✔️유효한 트렌드 키워드 개수 : {len(valid_trend_keywords)}/{len(trend_keywords)}")
+            TXTFileHandler(self.trend_keyword_file).write(valid_trend_keywords) # valid_trend_keywords 저장
+            TXTFileHandler(self.except_for_valid_trend_keywords_file).write(list(set(trend_keywords) - set(valid_trend_keywords))) # valid_trend_keywords를 제외한 나머지 저장
+            # 새로 나온 트렌드 키워드 추출
+            if self.lang == "ko":
+                new_trend_keywords = list(remove_duplicates_from_new_keywords_ko(set(self.past_trend_keywords), set(valid_trend_keywords)))
+            else:
+                new_trend_keywords = list(remove_duplicates_from_new_keywords(set(self.past_trend_keywords), set(valid_trend_keywords)))
+            TXTFileHandler(self.new_trend_keyword_file).write(new_trend_keywords)
+        except Exception as e:
+            print(f"[{datetime.now()}] 트렌드 키워드 추출 및 저장 실패 : {e}")
+        # TODO : 서프 수집 요청 (kafka)
+
+    @error_notifier
+    def filter_valid_trend_keywords(self, trend_keywords:List[str]) -> List[str]:
         '''
-        입력된 트렌드 키워드가 유효한 키워드인지 확인
+        입력된 트렌드 키워드 중 유효한 키워드만 반환
         '''
         if self.lang == "en":
-            if filter_en_valid_trend_keyword(trend_keyword) & filter_en_valid_token_count(trend_keyword): return True
-            else: return False
+            return filter_en_valid_trend_keywords(trend_keywords)
         else:
-            return True
+            return trend_keywords
         
     @error_notifier
     def run_basic(self):
         '''
         기본 서제스트 수집
         '''
-        basic_num_process = 100
+        basic_qps = 100 # 초당 최대 요청 수
         print(f"[{datetime.now()}] job_id : {self.job_id} | service : {self.service} ⭐기본 서제스트⭐ 수집 시작")
 
         # 기본 서제스트
@@ -230,100 +244,85 @@ class EntitySuggestDaily:
         print(f"[{datetime.now()}] 기본 extension text 추가 후 개수 {len(targets)}")
 
         # 기본 서제스트 수집
-        print(f"[{datetime.now()}] 기본 서제스트 수집 시작 (총 수집할 개수 : {len(targets)}, process_num : {basic_num_process})")
+        print(f"[{datetime.now()}] 기본 서제스트 수집 시작 (총 수집할 개수 : {len(targets)}, qps : {basic_qps})")
         
         already_collected_keywords = self.get_already_collected_keywords()
         targets = list(set(targets) - set(already_collected_keywords))
-        self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=basic_num_process)
+        self.get_suggest_and_request_serp(targets, self.local_result_path, qps=basic_qps)
         self.local_result_path = GZipFileHandler.gzip(self.local_result_path)
         print(f"[{datetime.now()}] 기본 서제스트 수집 완료")
 
     @error_notifier
-    def filtering_rank_4_targets(self) -> List[str]:
+    def init_rank_expansion(self, requested_keywords : set, valid_threshold : int = 6):
         '''
-        4단계 수집할 target 추출
-        2단계에서 valid한 서제스트가 valid_threshold개 이상인 완성형 문자로 시작하는 확장 문자만 수집
-
-        수집한 파일에서 2단계에 해당하는 text 판별
-        2단계에서 valid한 서제스트가 valid_threshold개 이상인 완성형 문자로 시작하는 확장 문자만 수집
+        2단계 -> 4단계, 4단계 -> 5단계 확장 준비 (expand_valid_prefix에서 사용)
+        requested_keywords : 이미 수집했거나 요청할 키워드 (확장 문자 중 여기 있는 것은 다시 요청하지 않음)
         '''
         lang = self.get_lang(self.lang)
-        rank2_targets = lang.suggest_extension_texts_by_rank("2_small")
-        rank4_targets = lang.suggest_extension_texts_by_rank("4_small_with_space")
-        self.statistics["valid"]["rank2"] = {"1":0, "2":0, "3":0, "4":0, "5":0, "6":0, "7":0, "8":0, "9":0, "10":0}
-        
-        print(f"\n[{datetime.now()}] 4단계 수집할 target 추출 시작")
-        targets = []
-        valid_threshold = 6 # 최소 valid한 서제스트 개수
+        self.rank_expansion = {
+            "lang": lang,
+            "valid_threshold": valid_threshold, # 최소 valid한 서제스트 개수
+            "prefixes": {"rank2": set(lang.suggest_extension_texts_by_rank("2_small")),
+                         "rank4": set(lang.suggest_extension_texts_by_rank("4_small_with_space"))},
+            "next_rank": {"rank2": "rank4", "rank4": "rank5"},
+            "valid_suggests": {"rank2": [], "rank4": []},
+            "targets": {"rank4": [], "rank5": []},
+            "requested_keywords": requested_keywords,
+        }
+        for rank in ["rank2", "rank4"]:
+            self.statistics["valid"][rank] = {"1":0, "2":0, "3":0, "4":0, "5":0, "6":0, "7":0, "8":0, "9":0, "10":0}
+        for rank in ["rank4", "rank5"]:
+            self.statistics["call"][rank] = 0
         print(f"[{datetime.now()}] valid_threshold : {valid_threshold}")
-        valid_suggest_result_path = f"{self.local_folder_path}/{self.job_id}_valid_suggests_rank4_thres{valid_threshold}.jsonl"
-        for line in JsonlFileHandler(self.local_result_path).read_generator():
-            keyword = line['keyword']
-            if keyword in rank2_targets: # 2단계 확장 문자로 수집한 결과일 경우
-                valid_suggest_cnt, valid_suggests = cnt_valid_suggest(suggestions=line['suggestions'], 
-                                                                      input_text=keyword, 
-                                                                      return_result=True)
-                if str(valid_suggest_cnt) not in self.statistics["valid"]["rank2"]:
-                    self.statistics["valid"]["rank2"][str(valid_suggest_cnt)] = 0
-                self.statistics["valid"]["rank2"][str(valid_suggest_cnt)] += 1
-                JsonlFileHandler(valid_suggest_result_path).write({keyword : valid_suggests})
-                if valid_suggest_cnt >= valid_threshold:
-                    targets += [t for t in rank4_targets if t.startswith(keyword)] # 4단계 확장 문자 중 2단계 확장 문자로 시작하는 것만 추출
-        targets = list(set(targets))
-        print(f"[{datetime.now()}] 4단계 수집할 target 추출 완료\n")
 
-        print(f"[{datetime.now()}] 4단계 수집할 target 개수 : {len(targets)}개/{len(rank4_targets)}개중")
-        GZipFileHandler.gzip(valid_suggest_result_path)
-        TXTFileHandler(f"{self.local_folder_path}/{self.job_id}_target_rank4_thres{valid_threshold}.txt").write(targets)
-        return targets
+    def expand_valid_prefix(self, line : Union[dict, SuggestResult]) -> List[str]:
+        '''
+        2단계(4단계) 확장 문자의 서제스트 결과에서 valid한 서제스트가 valid_threshold개 이상이면
+        그 확장 문자로 시작하는 4단계(5단계) 확장 문자 중 아직 요청하지 않은 것 반환
+        응답이 올 때마다 호출되므로 단계별로 결과 파일을 다시 읽지 않아도 됨
+        (수집 중에는 api 응답(dict), 재시작 시에는 결과 파일에서 읽은 SuggestResult가 들어옴)
+        '''
+        expansion = self.rank_expansion
+        keyword = line['keyword'] if isinstance(line, dict) else line.keyword
+        for rank, prefixes in expansion["prefixes"].items():
+            if keyword not in prefixes:
+                continue
+            if isinstance(line, dict):
+                line = SuggestResult.from_dict(line)
+            valid_suggest_cnt, valid_suggests = cnt_valid_suggest(suggestions=line.suggestions, 
+                                                                  input_text=keyword, 
+                                                                  return_result=True)
+            if str(valid_suggest_cnt) not in self.statistics["valid"][rank]:
+                self.statistics["valid"][rank][str(valid_suggest_cnt)] = 0
+            self.statistics["valid"][rank][str(valid_suggest_cnt)] += 1
+            expansion["valid_suggests"][rank].append({keyword : valid_suggests})
+            if valid_suggest_cnt < expansion["valid_threshold"]:
+                return []
+            next_rank = expansion["next_rank"][rank]
+            targets = list(expansion["lang"].iter_extension_texts_by_prefix(keyword)) # 다음 단계 확장 문자 중 keyword로 시작하는 것만 생성
+            expansion["targets"][next_rank].extend(targets)
+            new_targets = [t for t in targets if t not in expansion["requested_keywords"]]
+            expansion["requested_keywords"].update(new_targets)
+            self.statistics["call"][next_rank] += len(new_targets)
+            return new_targets
+        return []
 
     @error_notifier
-    def filtering_rank_5_targets(self) -> List[str]:
+    def save_rank_expansion_result(self):
         '''
-        5단계 수집할 target 추출
-        4단계에서 valid한 서제스트가 valid_threshold개 이상인 완성형 문자로 시작하는 확장 문자만 수집
+        단계별 valid한 서제스트, 확장한 target 저장
         '''
-        lang = self.get_lang(self.lang)
-        rank4_targets = lang.suggest_extension_texts_by_rank("4_small_with_space")
-        rank5_targets = lang.suggest_extension_texts_by_rank("5_small_with_space")
-        self.statistics["valid"]["rank4"] = {"1":0, "2":0, "3":0, "4":0, "5":0, "6":0, "7":0, "8":0, "9":0, "10":0}
-        
-        print(f"\n[{datetime.now()}] Trie 생성 시작")
-        trie = Trie()
-        for target in rank5_targets:
-            trie.insert(target)
-        print(f"[{datetime.now()}] Trie 생성 완료\n")
-
-        print(f"\n[{datetime.now()}] 5단계 수집할 target 추출 시작")
-        targets = []
-        valid_threshold = 6 # 최소 valid한 서제스트 개수
-        print(f"[{datetime.now()}] valid_threshold : {valid_threshold}")
-        valid_suggest_result_path = f"{self.local_folder_path}/{self.job_id}_valid_suggests_rank5_thres{valid_threshold}.jsonl"
-        for line in JsonlFileHandler(self.local_result_path).read_generator():
-            keyword = line['keyword']
-            if keyword in rank4_targets: # 4단계 확장 문자로 수집한 결과일 경우
-                valid_suggest_cnt, valid_suggests = cnt_valid_suggest(suggestions=line['suggestions'], 
-                                                                      input_text=keyword, 
-                                                                      return_result=True)
-                if str(valid_suggest_cnt) not in self.statistics["valid"]["rank4"]:
-                    self.statistics["valid"]["rank4"][str(valid_suggest_cnt)] = 0
-                self.statistics["valid"]["rank4"][str(valid_suggest_cnt)] += 1
-                JsonlFileHandler(valid_suggest_result_path).write({keyword : valid_suggests})
-                if valid_suggest_cnt >= valid_threshold:
-                    filtered_targets = trie.starts_with(keyword)
-                    targets.extend(filtered_targets) # 5단계 확장 문자 중 4단계 확장 문자로 시작하는 것만 추출
-        targets = list(set(targets))
-        print(f"[{datetime.now()}] 5단계 수집할 target 추출 완료\n")
-
-        print(f"[{datetime.now()}] 5단계 수집할 target 개수 : {len(targets)}개/{len(rank5_targets)}개중")
+        expansion = self.rank_expansion
+        valid_threshold = expansion["valid_threshold"]
+        for rank, next_rank in expansion["next_rank"].items():
+            valid_suggest_result_path = f"{self.local_folder_path}/{self.job_id}_valid_suggests_{next_rank}_thres{valid_threshold}.jsonl"
+            if len(expansion["valid_suggests"][rank]) > 0:
+                JsonlFileHandler(valid_suggest_result_path).write(expansion["valid_suggests"][rank])
+                GZipFileHandler.gzip(valid_suggest_result_path)
+            targets = list(set(expansion["targets"][next_rank]))
+            print(f"[{datetime.now()}] {next_rank[-1]}단계 수집한 target 개수 : {len(targets)}개 (새로 요청 : {self.statistics['call'][next_rank]}개)")
+            TXTFileHandler(f"{self.local_folder_path}/{self.job_id}_target_{next_rank}_thres{valid_threshold}.txt").write(targets)
 
-        GZipFileHandler.gzip(valid_suggest_result_path)
-        TXTFileHandler(f"{self.local_folder_path}/{self.job_id}_target_rank5_thres{valid_threshold}.txt").write(targets)
-
-        del trie
-        gc.collect()
-        return targets
-    
     @error_notifier
     def run_basic_ko(self):
         '''
@@ -331,7 +330,7 @@ class EntitySuggestDaily:
         '''
         print(f"\n\n[{datetime.now()}] {self.service} {self.lang} 기본 서제스트 수집 시작")
         lang = self.get_lang(self.lang)
-        num_process = 100
+        qps = 100 # 초당 최대 요청 수
         # 1, 2, 3 단계 모두 수집
         extension_rank_1 = lang.suggest_extension_texts_by_rank(1)
         self.statistics['call']['rank1'] = len(extension_rank_1)
@@ -340,26 +339,18 @@ class EntitySuggestDaily:
         extension_rank_3 = lang.suggest_extension_texts_by_rank("3_small")
         self.statistics['call']['rank3'] = len(extension_rank_3)
         targets = extension_rank_1 + extension_rank_2 + extension_rank_3
-        print(f"[{datetime.now()}] 1, 2, 3 단계 extension text 추가 후 개수 {len(targets)} | process_num : {num_process}")
-        already_collected_keywords = self.get_already_collected_keywords()
-        targets = list(set(targets) - set(already_collected_keywords))
-        self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=num_process)
-
-        # 4단계 수집
-        ## 2단계에서 valid한 서제스트가 valid_threshold개 이상인 완성형 문자로 시작하는 확장 문자만 수집
-        targets = self.filtering_rank_4_targets()
-        already_collected_keywords = self.get_already_collected_keywords()
-        targets = list(set(targets) - set(already_collected_keywords))
-        self.statistics["call"]["rank4"] = len(targets)
-        self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=num_process)
-
-        # 5단계 수집
-        ## 4단계에서 valid한 서제스트가 valid_threshold개 이상인 완성형 문자로 시작하는 확장 문자만 수집
-        targets = self.filtering_rank_5_targets()
-        already_collected_keywords = self.get_already_collected_keywords()
-        targets = list(set(targets) - set(already_collected_keywords))
-        self.statistics["call"]["rank5"] = len(targets)
-        self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=num_process)
+        print(f"[{datetime.now()}] 1, 2, 3 단계 extension text 추가 후 개수 {len(targets)} | qps : {qps}")
+        already_collected_keywords = set(self.get_already_collected_keywords())
+
+        # 4, 5단계 수집
+        ## 2단계(4단계)에서 valid한 서제스트가 valid_threshold개 이상인 확장 문자는 응답을 받는 즉시 다음 단계 확장 문자 요청
+        self.init_rank_expansion(requested_keywords=already_collected_keywords | set(targets))
+        targets = list(set(targets) - already_collected_keywords)
+        if os.path.exists(self.local_result_path): # 이전에 수집된 결과가 있으면(재시작) 그 결과로도 확장
+            for line in JsonlFileHandler(self.local_result_path).read_generator(record_type=SuggestResult):
+                targets += self.expand_valid_prefix(line)
+        self.get_suggest_and_request_serp(targets, self.local_result_path, qps=qps, expand=self.expand_valid_prefix)
+        self.save_rank_expansion_result()
 
         self.local_result_path = GZipFileHandler.gzip(self.local_result_path)
         print(f"[{datetime.now()}] {self.service} {self.lang} 기본 서제스트 수집 완료\n\n")
@@ -380,13 +371,13 @@ class EntitySuggestDaily:
     @error_notifier
     def upload_to_hdfs(self):
         basic_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}.jsonl.gz"
-        self.hdfs.upload(source=self.local_result_path, dest=basic_hdfs_path, overwrite=True)
-
         trend_keyword_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords.txt"
-        self.hdfs.upload(source=self.trend_keyword_file, dest=trend_keyword_hdfs_path, overwrite=True)
-
         new_trend_keyword_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_new.txt"
-        self.hdfs.upload(source=self.new_trend_keyword_file, dest=new_trend_keyword_hdfs_path, overwrite=True)
+        # 동시에 업로드하고 내용 확인 후 _SUCCESS.{suggest_type}_suggest에 기록
+        self.hdfs.upload_files([(self.local_result_path, basic_hdfs_path),
+                                (self.trend_keyword_file, trend_keyword_hdfs_path),
+                                (self.new_trend_keyword_file, new_trend_keyword_hdfs_path)],
+                               job_name=f"{self.suggest_type}_suggest")
 
     def run(self):
         try:
@@ -1,20 +1,22 @@
 import os
 import gc
-import math
 import argparse
 from datetime import datetime, timedelta
 from typing import List
 
 from collector.suggest_collector.suggest_collect import Suggest
-from validator.trend_keyword_validator import is_trend_keyword, cnt_valid_suggest
-from utils.file import JsonlFileHandler, GZipFileHandler, TXTFileHandler, has_file_extension
-from utils.data import Trie, remove_duplicates_from_new_keywords, remove_duplicates_from_new_keywords_ko, remove_duplicates_with_spaces
+from collector.suggest_collector.suggest_cache import SuggestCache
+from validator.trend_keyword_validator import extract_trend_keywords, cnt_valid_suggest
+from utils.file import JsonlFileHandler, JsonlWriter, GZipFileHandler, TXTFileHandler, KeywordIndexFileHandler, has_file_extension
+from utils.data import remove_duplicates_from_new_keywords, remove_duplicates_from_new_keywords_ko, remove_duplicates_with_spaces
+from utils.record import SuggestResult
 from utils.hdfs import HdfsFileHandler
+from utils.trend_history import TrendKeywordHistoryLoader
 from utils.task_history import TaskHistory
 from utils.slack import ds_trend_finder_dbgout, ds_trend_finder_dbgout_error
 from utils.decorator import error_notifier
 from utils.converter import adjust_job_id
-from lang import Ko, Ja, En, filter_en_valid_trend_keyword, filter_en_valid_token_count
+from lang import Ko, Ja, En, filter_en_valid_trend_keywords
 from lang.ja.ja import hiragana, katakana, katakana_chouon, youon, sokuon_hiragana, sokuon_katakana, gairaigo_katakana, alphabet, number, kanji
             
 from config import postgres_db_config
@@ -36,6 +38,7 @@ class EntitySuggestDaily:
         self.new_trend_keyword_file = f"{self.local_folder_path}/{self.job_id}_trend_keywords_new.txt" # 새로 나온 트렌드 키워드 저장
         self.except_for_valid_trend_keywords_file = f"{self.local_folder_path}/{self.job_id}_except_for_valid_trend_keywords.txt" # 유효하지 않은 트렌드 키워드 저장
         self.local_result_path = f"{self.local_folder_path}/{self.job_id}.jsonl"
+        self.collected_keyword_index = KeywordIndexFileHandler(f"{self.local_folder_path}/{self.job_id}_collected_keywords.txt", self.local_result_path) # 수집 완료된 키워드 인덱스
         
         # hdfs 관련
         self.hdfs = HdfsFileHandler()
@@ -50,8 +53,11 @@ class EntitySuggestDaily:
         # slack 관련
         self.slack_prefix_msg = f"Job Id : `{self.job_id}`\nTask Name : `{self.task_name}`-`{self.lang}`"
 
+        # 서제스트 캐시 관련 (google/youtube, basic/target job이 같은 캐시 공유)
+        self.suggest_cache = SuggestCache("./data/cache/suggest_cache.sqlite", ttl=60*60*6)
+
         # 통계량 관련
-        self.statistics = {"call": {}, "valid": {}, "trend_keyword": {}}
+        self.statistics = {"call": {}, "valid": {}, "trend_keyword": {}, "cache": self.suggest_cache.statistics, "hdfs": self.hdfs.statistics}
 
     @error_notifier
     def get_lang(self, lang:str):
@@ -99,31 +105,18 @@ class EntitySuggestDaily:
         already_collected_keywords = []
         if os.path.exists(self.local_result_path):
             print(f"[{datetime.now()}] 이미 수집된 서제스트 결과가 있습니다. (path : {self.local_result_path})")
-            for line in JsonlFileHandler(self.local_result_path).read_generator():
-                already_collected_keywords.append(line['keyword'])
+            already_collected_keywords = list(self.collected_keyword_index.read()) # jsonl 대신 인덱스 파일에서 읽음
             print(f"[{datetime.now()}] ㄴ {len(already_collected_keywords)}개 키워드 수집되어 있음")
-        return list(set(already_collected_keywords))
+        return already_collected_keywords
     
     @error_notifier
     def get_past_trend_keywords(self, today:str, lang:str, days:int) -> List[str]:
         '''
         이전 트렌드 키워드 목록 가져오기
         '''
-        services = ['google', 'youtube']
-                
-        print(f"[{datetime.now()}] {today} 기준 이전 {days}일 트렌드 키워드 목록 가져오기")
-        today_datetime = datetime.strptime(today, "%Y%m%d")
-        past_trend_keywords = []
-        for i in range(1, days+1, 1):
-            date = today_datetime - timedelta(days=i)
-            date = date.strftime("%Y%m%d")
-            for service in services:
-                txt_files = self.get_all_txt_files(f"/user/ds/wordpopcorn/{lang}/daily/{service}_suggest_for_llm_entity_topic/{date[:4]}/{date[:6]}/{date[:8]}")
-                for file in txt_files:
-                    past_trend_keywords += self.load_keywords_from_hdfs(file)
-
-        past_trend_keywords = list(set(past_trend_keywords))
-        print(f"키워드 개수 : {len(set(past_trend_keywords))}")
+        # 날짜/서비스별 폴더를 동시에 읽고, 지난 날짜는 로컬 스냅샷 재사용 (어제 것만 hdfs에서 읽음)
+        loader = TrendKeywordHistoryLoader(self.hdfs, lang)
+        past_trend_keywords = loader.load(today, days)
 
         return past_trend_keywords
     
@@ -131,53 +124,72 @@ class EntitySuggestDaily:
     def get_suggest_and_request_serp(self,
                                      targets : List[str],
                                      result_file_path : str, # "*.jsonl"
-                                     num_processes:int
+                                     qps:float, # 초당 최대 요청 수
+                                     chunk_size:int=2000 # 몇 개의 결과마다 저장할지
                                      ) -> str: # 저장 경로 반환
         '''
         서제스트 수집 요청 및 로컬에 저장 + 서프 수집 요청
+        수집이 완료되는 순서대로 chunk_size개씩 바로 저장 (느린 키워드가 있어도 나머지 결과는 먼저 저장됨)
         '''
-        suggest = Suggest()
-        batch_size = 10000
-        print(f"[{datetime.now()}] 수집할 개수 : {len(targets)} | batch_size : {batch_size}")
-        for i in range(0, len(targets), batch_size):
-            start = datetime.now()
-            result = suggest._requests(targets[i : i+batch_size], 
-                                       self.lang, 
-                                       self.service, 
-                                       num_processes = num_processes)
-            print(f"[{datetime.now()}]    ㄴ batch {int((i+batch_size)/batch_size)}/{math.ceil(len(targets)/batch_size)} finish : {datetime.now()-start}")
-            JsonlFileHandler(result_file_path).write(result)
-            # 트렌드 키워드 추출
-            try:
-                trend_keywords = [suggestion['text'] for res in result for suggestion in res['suggestions'] if is_trend_keyword(suggestion['text'], # 트렌드 키워드 추출
-                                                                                                                        suggestion['suggest_type'], 
-                                                                                                                        suggestion['suggest_subtypes'])]
-                valid_trend_keywords = [keyword for keyword in trend_keywords if self.filter_valid_trend_keywords(keyword)] # 트렌드 키워드 중 유효한 키워드만 추출
-                print(f"[{datetime.now()}]       ㄴ✔️유효한 트렌드 키워드 개수 : {len(valid_trend_keywords)}/{len(trend_keywords)}")
-                TXTFileHandler(self.trend_keyword_file).write(valid_trend_keywords) # valid_trend_keywords 저장
-                TXTFileHandler(self.except_for_valid_trend_keywords_file).write(list(set(trend_keywords) - set(valid_trend_keywords))) # valid_trend_keywords를 제외한 나머지 저장
-                # 새로 나온 트렌드 키워드 추출
-                if self.lang == "ko":
-                    new_trend_keywords = list(remove_duplicates_from_new_keywords_ko(set(self.past_trend_keywords), set(valid_trend_keywords)))
-                else:
-                    new_trend_keywords = list(remove_duplicates_from_new_keywords(set(self.past_trend_keywords), set(valid_trend_keywords)))
-                TXTFileHandler(self.new_trend_keyword_file).write(new_trend_keywords)
-            except Exception as e:
-                print(f"[{datetime.now()}] 트렌드 키워드 추출 및 저장 실패 : {e}")
-            # TODO : 서프 수집 요청 (kafka)
-            
+        suggest = Suggest(cache=self.suggest_cache)
+        start = datetime.now()
+        print(f"[{datetime.now()}] 수집할 개수 : {len(targets)} | chunk_size : {chunk_size}")
+        if len(targets) == 0:
+            return result_file_path
+        with JsonlWriter(result_file_path) as writer: # 수집하는 동안 결과 파일은 한 번만 열어서 저장
+            result = []
+            collected_cnt = 0
+            for res in suggest._requests_stream(targets, 
+                                                self.lang, 
+                                                self.service, 
+                                                qps = qps):
+                result.append(res)
+                if len(result) >= chunk_size:
+                    collected_cnt += len(result)
+                    self.save_suggest_result(result, result_file_path, writer)
+                    print(f"[{datetime.now()}]    ㄴ {collected_cnt}/{len(targets)} 수집 완료 : {datetime.now()-start}")
+                    result = []
+            if len(result) > 0:
+                collected_cnt += len(result)
+                self.save_suggest_result(result, result_file_path, writer)
+        print(f"[{datetime.now()}]    ㄴ {collected_cnt}/{len(targets)} 수집 완료 : {datetime.now()-start}")
         return result_file_path
 
     @error_notifier
-    def filter_valid_trend_keywords(self, trend_keyword:str) -> bool:
+    def save_suggest_result(self, result : List[dict], result_file_path : str, writer : JsonlWriter):
         '''
-        입력된 트렌드 키워드가 유효한 키워드인지 확인
+        서제스트 수집 결과 로컬에 저장(writer : result_file_path에 쓰는 JsonlWriter) + 트렌드 키워드 추출 및 저장
+        '''
+        writer.write(result)
+        writer.flush() # 인덱스에 추가하기 전에 jsonl에 기록
+        if result_file_path == self.local_result_path:
+            self.collected_keyword_index.append([res['keyword'] for res in result]) # jsonl에 저장된 후 인덱스에 추가
+        # 트렌드 키워드 추출
+        try:
+            trend_keywords = extract_trend_keywords([SuggestResult.from_dict(res) for res in result]) # 트렌드 키워드 추출
+            valid_trend_keywords = self.filter_valid_trend_keywords(trend_keywords) # 트렌드 키워드 중 유효한 키워드만 추출
+            print(f"[{datetime.now()}]       ㄴ✔️유효한 트렌드 키워드 개수 : {len(valid_trend_keywords)}/{len(trend_keywords)}")
+            TXTFileHandler(self.trend_keyword_file).write(valid_trend_keywords) # valid_trend_keywords 저장
+            TXTFileHandler(self.except_for_valid_trend_keywords_file).write(list(set(trend_keywords) - set(valid_trend_keywords))) # valid_trend_keywords를 제외한 나머지 저장
+            # 새로 나온 트렌드 키워드 추출
+            if self.lang == "ko":
+                new_trend_keywords = list(remove_duplicates_from_new_keywords_ko(set(self.past_trend_keywords), set(valid_trend_keywords)))
+            else:
+                new_trend_keywords = list(remove_duplicates_from_new_keywords(set(self.past_trend_keywords), set(valid_trend_keywords)))
+            TXTFileHandler(self.new_trend_keyword_file).write(new_trend_keywords)
+        except Exception as e:
+            print(f"[{datetime.now()}] 트렌드 키워드 추출 및 저장 실패 : {e}")
+        # TODO : 서프 수집 요청 (kafka)
+
+    @error_notifier
+    def filter_valid_trend_keywords(self, trend_keywords:List[str]) -> List[str]:
+        '''
+        입력된 트렌드 키워드 중 유효한 키워드만 반환
         '''
         if self.lang == "en":
-            if filter_en_valid_trend_keyword(trend_keyword) & filter_en_valid_token_count(trend_keyword): return True
-            else: return False
+            return filter_en_valid_trend_keywords(trend_keywords)
         else:
-            return True
+            return trend_keywords
     
     @error_notifier
     def get_1st_extension(self) -> List[str]:
@@ -227,10 +239,10 @@ class EntitySuggestDaily:
         '''
         valid_targets = []
         start_time = datetime.now()
-        for line in JsonlFileHandler(self.local_result_path).read_generator():
-            keyword = line['keyword']
+        for line in JsonlFileHandler(self.local_result_path).read_generator(record_type=SuggestResult):
+            keyword = line.keyword
             if keyword in targets:
-                valid_suggest_cnt, valid_suggests = cnt_valid_suggest(suggestions=line['suggestions'],
+                valid_suggest_cnt, valid_suggests = cnt_valid_suggest(suggestions=line.suggestions,
                                                                       input_text=keyword,
                                                                       return_result=True)
                 if valid_suggest_cnt >= valid_threshold:
@@ -243,17 +255,17 @@ class EntitySuggestDaily:
         '''
         기본 서제스트 수집
         '''
-        basic_num_process = 100
+        basic_qps = 100 # 초당 최대 요청 수
         print(f"[{datetime.now()}] job_id : {self.job_id} | service : {self.service} ⭐기본 서제스트⭐ 수집 시작")
 
         # 1단계 확장 텍스트 가져오기
         print(f"[{datetime.now()}] 📍 1단계")
         targets_1 = self.get_1st_extension()
         # 서제스트 수집
-        print(f"[{datetime.now()}] ✅ 1단계 수집 시작 (총 수집할 개수 : {len(targets_1)}, process_num : {basic_num_process})")
+        print(f"[{datetime.now()}] ✅ 1단계 수집 시작 (총 수집할 개수 : {len(targets_1)}, qps : {basic_qps})")
         targets = targets_1
         self.statistics["call"]["rank1"] = len(targets)
-        self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=basic_num_process)
+        self.get_suggest_and_request_serp(targets, self.local_result_path, qps=basic_qps)
 
         valid_targets_1 = self.filtering_valid_trend_keywords(targets_1, 6)
         print(f"✅ 1단계 유효한 키워드 개수 : {len(valid_targets_1)}/{len(targets_1)}")
@@ -263,11 +275,11 @@ class EntitySuggestDaily:
         extension_2 = self.get_2st_extension()
         targets_2 = [x + y for x in valid_targets_1 for y in extension_2]
         # 서제스트 수집
-        print(f"[{datetime.now()}] ✅ 2단계 수집 시작 (총 수집할 개수 : {len(targets_2)}, process_num : {basic_num_process})")
+        print(f"[{datetime.now()}] ✅ 2단계 수집 시작 (총 수집할 개수 : {len(targets_2)}, qps : {basic_qps})")
         already_collected_keywords = self.get_already_collected_keywords() # 이미 수집한 키워드 목록
         targets = list(set(targets_2) - set(already_collected_keywords))
         self.statistics["call"]["rank2"] = len(targets)
-        self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=basic_num_process)
+        self.get_suggest_and_request_serp(targets, self.local_result_path, qps=basic_qps)
 
         # 2단계 확장 텍스트 가져오기
         valid_targets_2 = self.filtering_valid_trend_keywords(targets_2, 6)
@@ -278,11 +290,11 @@ class EntitySuggestDaily:
         extension_3 = self.get_3st_extension()
         targets_3 = [x + y for x in valid_targets_2 for y in extension_3]
         # 서제스트 수집
-        print(f"[{datetime.now()}] ✅ 3단계 수집 시작 (총 수집할 개수 : {len(targets_3)}, process_num : {basic_num_process})")
+        print(f"[{datetime.now()}] ✅ 3단계 수집 시작 (총 수집할 개수 : {len(targets_3)}, qps : {basic_qps})")
         already_collected_keywords = self.get_already_collected_keywords() # 이미 수집한 키워드 목록
         targets = list(set(targets_3) - set(already_collected_keywords))
         self.statistics["call"]["rank3"] = len(targets)
-        self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=basic_num_process)
+        self.get_suggest_and_request_serp(targets, self.local_result_path, qps=basic_qps)
 
         self.local_result_path = GZipFileHandler.gzip(self.local_result_path)
         print(f"[{datetime.now()}] 🎉 기본 서제스트 수집 완료")
@@ -303,13 +315,13 @@ class EntitySuggestDaily:
     @error_notifier
     def upload_to_hdfs(self):
         basic_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}.jsonl.gz"
-        self.hdfs.upload(source=self.local_result_path, dest=basic_hdfs_path, overwrite=True)
-
         trend_keyword_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords.txt"
-        self.hdfs.upload(source=self.trend_keyword_file, dest=trend_keyword_hdfs_path, overwrite=True)
-
         new_trend_keyword_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_new.txt"
-        self.hdfs.upload(source=self.new_trend_keyword_file, dest=new_trend_keyword_hdfs_path, overwrite=True)
+        # 동시에 업로드하고 내용 확인 후 _SUCCESS.{suggest_type}_suggest에 기록
+        self.hdfs.upload_files([(self.local_result_path, basic_hdfs_path),
+                                (self.trend_keyword_file, trend_keyword_hdfs_path),
+                                (self.new_trend_keyword_file, new_trend_keyword_hdfs_path)],
+                               job_name=f"{self.suggest_type}_suggest")
 
     def run(self):
         try:
@@ -1,23 +1,25 @@
 import os
-import math
 import argparse
 from datetime import datetime, timedelta
 from typing import List, Tuple
 
 from collector.suggest_collector.suggest_collect import Suggest
+from collector.suggest_collector.suggest_cache import SuggestCache
 from collector.google_trend_collector.google_trend_collector import (
     filter_google_trend_keywords_ko, 
     filter_google_trend_keywords_ja,
     filter_google_trend_keywords_en
 )
-from validator.trend_keyword_validator import is_trend_keyword
-from utils.file import JsonlFileHandler, GZipFileHandler, TXTFileHandler, JsonFileHandler, has_file_extension
+from validator.trend_keyword_validator import extract_trend_keywords
+from utils.file import JsonlFileHandler, JsonlWriter, GZipFileHandler, TXTFileHandler, KeywordIndexFileHandler, JsonFileHandler, has_file_extension
 from utils.db import QueryDatabaseKo, QueryDatabaseJa, QueryDatabaseEn
 from utils.text import extract_initial
 from utils.data import combine_dictionary, remove_duplicates_with_spaces, flatten_list
+from utils.record import Suggestion, SuggestResult
 from utils.hdfs import HdfsFileHandler
+from utils.trend_history import TrendKeywordHistoryLoader
 from utils.postgres import get_post_gres
-from lang import Ko, Ja, En, filter_en_valid_trend_keyword, filter_en_valid_token_count
+from lang import Ko, Ja, En, filter_en_valid_trend_keywords
 from config import postgres_db_config
 from utils.decorator import error_notifier
 from utils.task_history import TaskHistory
@@ -27,7 +29,7 @@ from utils.text import extract_initial_next_target_keyword
 from utils.converter import adjust_job_id, DateConverter
 from utils.slack import ds_trend_finder_dbgout, ds_trend_finder_dbgout_error
 
-def cnt_valid_suggest(suggestions:List[dict], 
+def cnt_valid_suggest(suggestions:List[Suggestion], 
                       target_keyword:str=None,
                       extension:str=None, # 알파벳 확장 문자 (있을 경우 입력, 없을 경우:None)
                       log:bool=False,
@@ -36,30 +38,30 @@ def cnt_valid_suggest(suggestions:List[dict],
         cnt_valid = 0
         valid_suggest = []
         for suggestion in suggestions:
-            if SuggestValidator.is_valid_suggest(suggestion['suggest_type'], suggestion['suggest_subtypes']):
+            if SuggestValidator.is_valid_suggest(suggestion.suggest_type, suggestion.suggest_subtypes):
                 if (target_keyword != None and
                     extension != None): # 타겟 키워드와 확장 문자가 모두 있을 경우
-                    initial_next_target_keyword = extract_initial_next_target_keyword([suggestion['text']], target_keyword=target_keyword)
+                    initial_next_target_keyword = extract_initial_next_target_keyword([suggestion.text], target_keyword=target_keyword)
                     if initial_next_target_keyword and len(initial_next_target_keyword) > 0:
                         if initial_next_target_keyword[0] == extension:
                             if log:
-                                print(f"✔️ {suggestion['text']} {suggestion['suggest_type']} {suggestion['suggest_subtypes']}")
+                                print(f"✔️ {suggestion.text} {suggestion.suggest_type} {suggestion.suggest_subtypes}")
                             cnt_valid += 1
-                            valid_suggest.append(suggestion['text'])
+                            valid_suggest.append(suggestion.text)
                         else:
                             if log:
-                                print(f"❌❗ {suggestion['text']} {suggestion['suggest_type']} {suggestion['suggest_subtypes']}")
+                                print(f"❌❗ {suggestion.text} {suggestion.suggest_type} {suggestion.suggest_subtypes}")
                     else:
                         if log:
-                            print(f"❌❗ {suggestion['text']} {suggestion['suggest_type']} {suggestion['suggest_subtypes']}")
+                            print(f"❌❗ {suggestion.text} {suggestion.suggest_type} {suggestion.suggest_subtypes}")
                 else:
                     if log:
-                        print(f"✔️ {suggestion['text']} {suggestion['suggest_type']} {suggestion['suggest_subtypes']}")
+                        print(f"✔️ {suggestion.text} {suggestion.suggest_type} {suggestion.suggest_subtypes}")
                     cnt_valid += 1
-                    valid_suggest.append(suggestion['text'])
+                    valid_suggest.append(suggestion.text)
             else:
                 if log:
-                    print(f"❌ {suggestion['text']} {suggestion['suggest_type']} {suggestion['suggest_subtypes']}")
+                    print(f"❌ {suggestion.text} {suggestion.suggest_type} {suggestion.suggest_subtypes}")
         if return_result:
             return cnt_valid, valid_suggest
         return cnt_valid
@@ -90,6 +92,7 @@ class EntitySuggestDaily:
         self.trend_keyword_google_trend_file = f"{self.local_folder_path}/{self.job_id}_trend_keywords_google_trend.txt" # 구글 트렌드 토픽에서 나온 트렌드 키워드 저장
         self.except_for_valid_trend_keywords_file = f"{self.local_folder_path}/{self.job_id}_except_for_valid_trend_keywords.txt" # 유효하지 않은 트렌드 키워드 저장
         self.local_result_path = f"{self.local_folder_path}/{self.job_id}.jsonl"
+        self.collected_keyword_index = KeywordIndexFileHandler(f"{self.local_folder_path}/{self.job_id}_collected_keywords.txt", self.local_result_path) # 수집 완료된 키워드 인덱스
         self.trend_keyword_by_target_file = f"{self.local_folder_path}/{self.job_id}_trend_keywords_by_target.jsonl"
         self.trend_keyword_by_target_google_trend_file = f"{self.local_folder_path}/{self.job_id}_trend_keywords_by_target_google_trend.jsonl" # 구글 트렌드 키워드에서 나온 트렌드 키워드 저장
         self.entity_topics_file = f"{self.local_folder_path}/{self.job_id}_topics.txt"
@@ -115,8 +118,11 @@ class EntitySuggestDaily:
         # 데이터 관련
         self.topics = {}
 
+        # 서제스트 캐시 관련 (google/youtube, basic/target job이 같은 캐시 공유)
+        self.suggest_cache = SuggestCache("./data/cache/suggest_cache.sqlite", ttl=60*60*6)
+
         # 통계량 관련
-        self.statistics = {"call": {}, "valid": {}, "trend_keyword": {}}
+        self.statistics = {"call": {}, "valid": {}, "trend_keyword": {}, "cache": self.suggest_cache.statistics, "hdfs": self.hdfs.statistics}
 
     @error_notifier
     def get_lang(self, lang:str):
@@ -233,10 +239,9 @@ class EntitySuggestDaily:
         already_collected_keywords = []
         if os.path.exists(self.local_result_path):
             print(f"[{datetime.now()}] 이미 수집된 서제스트 결과가 있습니다. (path : {self.local_result_path})")
-            for line in JsonlFileHandler(self.local_result_path).read_generator():
-                already_collected_keywords.append(line['keyword'])
+            already_collected_keywords = list(self.collected_keyword_index.read()) # jsonl 대신 인덱스 파일에서 읽음
             print(f"[{datetime.now()}] ㄴ {len(already_collected_keywords)}개 키워드 수집되어 있음")
-        return list(set(already_collected_keywords))
+        return already_collected_keywords
         
     @error_notifier
     def get_extension(self) -> List[str]:
@@ -288,42 +293,62 @@ class EntitySuggestDaily:
     def get_suggest_and_request_serp(self,
                                      targets : List[str],
                                      result_file_path : str, # "*.jsonl"
-                                     num_processes:int
+                                     qps:float, # 초당 최대 요청 수
+                                     chunk_size:int=2000 # 몇 개의 결과마다 저장할지
                                      ) -> str: # 저장 경로 반환
         '''
         서제스트 수집 요청 및 로컬에 저장 + 서프 수집 요청
+        수집이 완료되는 순서대로 chunk_size개씩 바로 저장 (느린 키워드가 있어도 나머지 결과는 먼저 저장됨)
         '''
-        suggest = Suggest()
-        batch_size = 10000
-        print(f"[{datetime.now()}] 수집할 개수 : {len(targets)} | batch_size : {batch_size}")
-        for i in range(0, len(targets), batch_size):
-            start = datetime.now()
-            result = suggest._requests(targets[i : i+batch_size], 
-                                       self.lang, 
-                                       self.service, 
-                                       num_processes = num_processes)
-            print(f"[{datetime.now()}]    ㄴ batch {int((i+batch_size)/batch_size)}/{math.ceil(len(targets)/batch_size)} finish : {datetime.now()-start}")
-            JsonlFileHandler(result_file_path).write(result)
-            # 트렌드 키워드 추출
-            try:
-                trend_keywords = [suggestion['text'] for res in result for suggestion in res['suggestions'] if is_trend_keyword(suggestion['text'], # 트렌드 키워드 추출
-                                                                                                                        suggestion['suggest_type'], 
-                                                                                                                        suggestion['suggest_subtypes'])]
-                valid_trend_keywords = [keyword for keyword in trend_keywords if self.filter_valid_trend_keywords(keyword)] # 트렌드 키워드 중 유효한 키워드만 추출
-                print(f"[{datetime.now()}]       ㄴ✔️유효한 트렌드 키워드 개수 : {len(valid_trend_keywords)}/{len(trend_keywords)}")
-                TXTFileHandler(self.trend_keyword_file).write(valid_trend_keywords) # valid_trend_keywords 저장
-                TXTFileHandler(self.except_for_valid_trend_keywords_file).write(list(set(trend_keywords) - set(valid_trend_keywords))) # valid_trend_keywords를 제외한 나머지 저장
-                # 새로 나온 트렌드 키워드 추출
-                if self.lang == "ko":
-                    new_trend_keywords = list(remove_duplicates_from_new_keywords_ko(set(self.past_trend_keywords), set(valid_trend_keywords)))
-                else:
-                    new_trend_keywords = list(remove_duplicates_from_new_keywords(set(self.past_trend_keywords), set(valid_trend_keywords)))
-                TXTFileHandler(self.new_trend_keyword_file).write(new_trend_keywords)
-            except Exception as e:
-                print(f"[{datetime.now()}] 트렌드 키워드 추출 및 저장 실패 : {e}")
-            # TODO : 서프 수집 요청 (kafka)
-            
+        suggest = Suggest(cache=self.suggest_cache)
+        start = datetime.now()
+        print(f"[{datetime.now()}] 수집할 개수 : {len(targets)} | chunk_size : {chunk_size}")
+        if len(targets) == 0:
+            return result_file_path
+        with JsonlWriter(result_file_path) as writer: # 수집하는 동안 결과 파일은 한 번만 열어서 저장
+            result = []
+            collected_cnt = 0
+            for res in suggest._requests_stream(targets, 
+                                                self.lang, 
+                                                self.service, 
+                                                qps = qps):
+                result.append(res)
+                if len(result) >= chunk_size:
+                    collected_cnt += len(result)
+                    self.save_suggest_result(result, result_file_path, writer)
+                    print(f"[{datetime.now()}]    ㄴ {collected_cnt}/{len(targets)} 수집 완료 : {datetime.now()-start}")
+                    result = []
+            if len(result) > 0:
+                collected_cnt += len(result)
+                self.save_suggest_result(result, result_file_path, writer)
+        print(f"[{datetime.now()}]    ㄴ {collected_cnt}/{len(targets)} 수집 완료 : {datetime.now()-start}")
         return result_file_path
+
+    @error_notifier
+    def save_suggest_result(self, result : List[dict], result_file_path : str, writer : JsonlWriter):
+        '''
+        서제스트 수집 결과 로컬에 저장(writer : result_file_path에 쓰는 JsonlWriter) + 트렌드 키워드 추출 및 저장
+        '''
+        writer.write(result)
+        writer.flush() # 인덱스에 추가하기 전에 jsonl에 기록
+        if result_file_path == self.local_result_path:
+            self.collected_keyword_index.append([res['keyword'] for res in result]) # jsonl에 저장된 후 인덱스에 추가
+        # 트렌드 키워드 추출
+        try:
+            trend_keywords = extract_trend_keywords([SuggestResult.from_dict(res) for res in result]) # 트렌드 키워드 추출
+            valid_trend_keywords = self.filter_valid_trend_keywords(trend_keywords) # 트렌드 키워드 중 유효한 키워드만 추출
+            print(f"[{datetime.now()}]       ㄴ✔️유효한 트렌드 키워드 개수 : {len(valid_trend_keywords)}/{len(trend_keywords)}")
+            TXTFileHandler(self.trend_keyword_file).write(valid_trend_keywords) # valid_trend_keywords 저장
+            TXTFileHandler(self.except_for_valid_trend_keywords_file).write(list(set(trend_keywords) - set(valid_trend_keywords))) # valid_trend_keywords를 제외한 나머지 저장
+            # 새로 나온 트렌드 키워드 추출
+            if self.lang == "ko":
+                new_trend_keywords = list(remove_duplicates_from_new_keywords_ko(set(self.past_trend_keywords), set(valid_trend_keywords)))
+            else:
+                new_trend_keywords = list(remove_duplicates_from_new_keywords(set(self.past_trend_keywords), set(valid_trend_keywords)))
+            TXTFileHandler(self.new_trend_keyword_file).write(new_trend_keywords)
+        except Exception as e:
+            print(f"[{datetime.now()}] 트렌드 키워드 추출 및 저장 실패 : {e}")
+        # TODO : 서프 수집 요청 (kafka)
     
     @error_notifier
     def load_keywords_from_hdfs(self, file_path):
@@ -374,21 +399,9 @@ class EntitySuggestDaily:
         '''
         이전 트렌드 키워드 목록 가져오기
         '''
-        services = ['google', 'youtube']
-                
-        print(f"[{datetime.now()}] {today} 기준 이전 {days}일 트렌드 키워드 목록 가져오기")
-        today_datetime = datetime.strptime(today, "%Y%m%d")
-        past_trend_keywords = []
-        for i in range(1, days+1, 1):
-            date = today_datetime - timedelta(days=i)
-            date = date.strftime("%Y%m%d")
-            for service in services:
-                txt_files = self.get_all_txt_files(f"/user/ds/wordpopcorn/{lang}/daily/{service}_suggest_for_llm_entity_topic/{date[:4]}/{date[:6]}/{date[:8]}")
-                for file in txt_files:
-                    past_trend_keywords += self.load_keywords_from_hdfs(file)
-
-        past_trend_keywords = list(set(past_trend_keywords))
-        print(f"키워드 개수 : {len(set(past_trend_keywords))}")
+        # 날짜/서비스별 폴더를 동시에 읽고, 지난 날짜는 로컬 스냅샷 재사용 (어제 것만 hdfs에서 읽음)
+        loader = TrendKeywordHistoryLoader(self.hdfs, lang, include_root_files=True)
+        past_trend_keywords = loader.load(today, days)
 
         return past_trend_keywords
 
@@ -400,9 +413,7 @@ class EntitySuggestDaily:
         collected_texts = []
         if os.path.exists(self.local_result_path):
             print(f"[{datetime.now()}] 이미 수집된 결과가 있습니다! ({self.local_result_path})")
-            for line in JsonlFileHandler(self.local_result_path).read_generator():
-                collected_texts.append(line['keyword'])
-            collected_texts = list(set(collected_texts))
+            collected_texts = list(self.collected_keyword_index.read()) # jsonl 대신 인덱스 파일에서 읽음
             print(f"[{datetime.now()}] 이미 수집된 키워드 : {len(collected_texts)}개")
         else:
             print(f"[{datetime.now()}] 이미 수집된 결과가 없습니다. (not found file {self.local_result_path})")
@@ -414,8 +425,8 @@ class EntitySuggestDaily:
         대상 키워드 있는 경우 해당 키워드의 0, 1단계 서제스트 수집
         '''
         try:
-            target_num_process = 95
-            print(f"[{datetime.now()}] 수집 프로세스 개수 : {target_num_process}")
+            target_qps = 95 # 초당 최대 요청 수
+            print(f"[{datetime.now()}] 초당 최대 요청 수 : {target_qps}")
             lang = self.get_lang(self.lang)
             extension_rank0 = lang.suggest_extension_texts_by_rank(0)
             self.statistics['call']['rank0'] = len(extension_rank0)
@@ -436,7 +447,7 @@ class EntitySuggestDaily:
             print(f"[{datetime.now()}] 이미 수집된 키워드 제외한 개수 {len(targets)}")
             already_collected_keywords = self.get_already_collected_keywords()
             targets = list(set(targets) - set(already_collected_keywords))
-            self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=target_num_process)
+            self.get_suggest_and_request_serp(targets, self.local_result_path, qps=target_qps)
             print(f"[{datetime.now()}] 대상 키워드 서제스트 0, 1 단계 수집 완료")
         except Exception as e:
             print(f"[{datetime.now()}] ERROR from get_target_letter_suggest : {e}")
@@ -450,19 +461,19 @@ class EntitySuggestDaily:
         '''
         try:
             valid_threshold = 8
-            target_num_process = 95            
-            print(f"[{datetime.now()}] 수집 프로세스 개수 : {target_num_process}")
+            target_qps = 95 # 초당 최대 요청 수
+            print(f"[{datetime.now()}] 초당 최대 요청 수 : {target_qps}")
             check_dict = combine_dictionary([self.make_check_dict("ko"), self.make_check_dict("ja"), self.make_check_dict("en")])
             targets = []
             cnt = 0
             self.statistics['valid']['rank2'] = {"1":0, "2":0, "3":0, "4":0, "5":0, "6":0, "7":0, "8":0, "9":0, "10":0}
-            for line in JsonlFileHandler(self.local_result_path).read_generator(line_len = self.target_letter_suggest_length): # 대상 키워드의 0, 1 단계만 수집된 상태 (get_target_letter_suggest의 결과)
+            for line in JsonlFileHandler(self.local_result_path).read_generator(line_len = self.target_letter_suggest_length, record_type=SuggestResult): # 대상 키워드의 0, 1 단계만 수집된 상태 (get_target_letter_suggest의 결과)
                 cnt += 1
-                extension_letter = line['keyword'][-1] # 확장 문자
-                target_keyword = line['keyword'][:-1].strip() # 대상 키워드
+                extension_letter = line.keyword[-1] # 확장 문자
+                target_keyword = line.keyword[:-1].strip() # 대상 키워드
                 if (target_keyword in llm_entity_topic and
                     extension_letter in check_dict): # 해당 문자가 초성인 경우
-                    valid_cnt = cnt_valid_suggest(line['suggestions'], 
+                    valid_cnt = cnt_valid_suggest(line.suggestions, 
                                             target_keyword=target_keyword, 
                                             extension=extension_letter, 
                                             log=False)
@@ -485,22 +496,21 @@ class EntitySuggestDaily:
             already_collected_keywords = self.get_already_collected_keywords()
             targets = list(set(targets) - set(already_collected_keywords))
             self.statistics['call']['rank2'] = len(targets)
-            self.get_suggest_and_request_serp(targets, self.local_result_path, num_processes=target_num_process)
+            self.get_suggest_and_request_serp(targets, self.local_result_path, qps=target_qps)
         except Exception as e:
             print(f"[{datetime.now()}] ERROR from get_target_charactor_suggest : {e}")
         else:
             print(f"[{datetime.now()}] 대상 키워드의 완성형 서제스트 수집 완료")
 
     @error_notifier
-    def filter_valid_trend_keywords(self, trend_keyword:str) -> bool:
+    def filter_valid_trend_keywords(self, trend_keywords:List[str]) -> List[str]:
         '''
-        입력된 트렌드 키워드가 유효한 키워드인지 확인
+        입력된 트렌드 키워드 중 유효한 키워드만 반환
         '''
         if self.lang == "en":
-            if filter_en_valid_trend_keyword(trend_keyword) & filter_en_valid_token_count(trend_keyword): return True
-            else: return False
+            return filter_en_valid_trend_keywords(trend_keywords)
         else:
-            return True
+            return trend_keywords
     
     @error_notifier
     def run_suggest(self):
@@ -538,63 +548,45 @@ class EntitySuggestDaily:
     
     @error_notifier
     def upload_to_hdfs(self):
-        # 서제스트 수집 결과 저장
-        target_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}.jsonl.gz"
-        self.hdfs.upload(source=self.local_result_path, dest=target_hdfs_path, overwrite=True)
-
-        # 오늘의 모든 트렌드 키워드 저장
-        trend_keyword_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords.txt"
-        self.hdfs.upload(source=self.trend_keyword_file, dest=trend_keyword_hdfs_path, overwrite=True)
-        
-        # n일 전 기준 오늘 새로 나온 트렌드 키워드 저장
-        new_trend_keyword_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_new.txt"
-        self.hdfs.upload(source=self.new_trend_keyword_file, dest=new_trend_keyword_hdfs_path, overwrite=True)
-
-        # 대상 키워드 토픽 저장
-        topics_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_topics.txt"
-        self.hdfs.upload(source=self.entity_topics_file, dest=topics_hdfs_path, overwrite=True)
-
-        # non_entity 대상 키워드 토픽 저장
-        non_entity_hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_topics_non_entity.txt"
-        self.hdfs.upload(source=self.non_entity_topics_file, dest=non_entity_hdfs_path, overwrite=True)
-
-        # 구글 트렌드 키워드 토픽 저장 - 수집 대상 키워드
-        hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_topics_google_trend.txt"
-        self.hdfs.upload(source=self.google_trend_topics_file, dest=hdfs_path, overwrite=True)
-    
-        # 구글 트렌드 키워드 토픽 저장 - 필터링된 키워드
-        hdfs_path = f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_topics_google_trend_filtered.txt"
-        self.hdfs.upload(source=self.google_trend_topics_filtered_file, dest=hdfs_path, overwrite=True)
+        upload_files = [
+            (self.local_result_path, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}.jsonl.gz"), # 서제스트 수집 결과
+            (self.trend_keyword_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords.txt"), # 오늘의 모든 트렌드 키워드
+            (self.new_trend_keyword_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_new.txt"), # n일 전 기준 오늘 새로 나온 트렌드 키워드
+            (self.entity_topics_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_topics.txt"), # 대상 키워드 토픽
+            (self.non_entity_topics_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_topics_non_entity.txt"), # non_entity 대상 키워드 토픽
+            (self.google_trend_topics_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_topics_google_trend.txt"), # 구글 트렌드 키워드 토픽 - 수집 대상 키워드
+            (self.google_trend_topics_filtered_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_topics_google_trend_filtered.txt"), # 구글 트렌드 키워드 토픽 - 필터링된 키워드
+        ]
+        # 동시에 업로드하고 내용 확인 후 _SUCCESS.{suggest_type}_suggest에 기록
+        self.hdfs.upload_files(upload_files, job_name=f"{self.suggest_type}_suggest")
 
     def extract_trend_keywords_by_entity(self):
         '''
         entity별 트렌드 키워드 추출
         '''
         start_time = datetime.now()
-        if self.local_result_path.endswith(".gz"):
-            self.local_result_path = GZipFileHandler.ungzip(self.local_result_path)
-        for line in JsonlFileHandler(self.local_result_path).read_generator(): 
-            keyword = line['keyword']
-            target = " ".join(keyword.split(' ')[:-1]).strip()
-            extension = keyword.split(' ')[-1]
-                
-            trend_keywords = [suggestion['text'] for suggestion in line['suggestions'] if is_trend_keyword(suggestion['text'], # 트렌드 키워드 추출
-                                                                                                                                suggestion['suggest_type'], 
-                                                                                                                                suggestion['suggest_subtypes'])]
-            if target in self.topics["google_trend"]:
-                JsonlFileHandler(self.trend_keyword_by_target_google_trend_file).write({"keyword": keyword, "target": target, "extension":extension, "trend_keywords": trend_keywords})
-                TXTFileHandler(self.trend_keyword_google_trend_file).write(trend_keywords)
-            JsonlFileHandler(self.trend_keyword_by_target_file).write({"keyword": keyword, "target": target, "extension":extension, "trend_keywords": trend_keywords})
-        if self.local_result_path.endswith(".jsonl"):
-            self.local_result_path = GZipFileHandler.gzip(self.local_result_path)
-        self.trend_keyword_by_target_file = GZipFileHandler.gzip(self.trend_keyword_by_target_file)
-        self.trend_keyword_by_target_google_trend_file = GZipFileHandler.gzip(self.trend_keyword_by_target_google_trend_file)
-        self.hdfs.upload(source=self.trend_keyword_by_target_file,
-                         dest=f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_by_target.jsonl.gz", overwrite=True)
-        self.hdfs.upload(source=self.trend_keyword_by_target_google_trend_file,
-                         dest=f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_by_target_google_trend.jsonl.gz", overwrite=True)
-        self.hdfs.upload(source=self.trend_keyword_google_trend_file,
-                         dest=f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_google_trend.txt", overwrite=True)
+        google_trend_keywords = []
+        # 결과 파일은 압축된 채로 읽고, 추출 결과는 바로 .gz로 저장
+        self.trend_keyword_by_target_file = f"{self.trend_keyword_by_target_file}.gz"
+        self.trend_keyword_by_target_google_trend_file = f"{self.trend_keyword_by_target_google_trend_file}.gz"
+        with JsonlWriter(self.trend_keyword_by_target_file, mode="w") as writer, \
+             JsonlWriter(self.trend_keyword_by_target_google_trend_file, mode="w") as google_trend_writer:
+            for line in JsonlFileHandler(self.local_result_path).read_generator(record_type=SuggestResult): 
+                keyword = line.keyword
+                target = " ".join(keyword.split(' ')[:-1]).strip()
+                extension = keyword.split(' ')[-1]
+                    
+                trend_keywords = extract_trend_keywords([line]) # 트렌드 키워드 추출
+                if target in self.topics["google_trend"]:
+                    google_trend_writer.write({"keyword": keyword, "target": target, "extension":extension, "trend_keywords": trend_keywords})
+                    google_trend_keywords += trend_keywords
+                writer.write({"keyword": keyword, "target": target, "extension":extension, "trend_keywords": trend_keywords})
+        TXTFileHandler(self.trend_keyword_google_trend_file).write(google_trend_keywords)
+        self.hdfs.upload_files([
+            (self.trend_keyword_by_target_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_by_target.jsonl.gz"),
+            (self.trend_keyword_by_target_google_trend_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_by_target_google_trend.jsonl.gz"),
+            (self.trend_keyword_google_trend_file, f"{self.hdfs_upload_folder}/{self.job_id}_{self.suggest_type}_trend_keywords_google_trend.txt"),
+        ], job_name=f"{self.suggest_type}_suggest")
         print(f"[{datetime.now()}] {self.lang} {self.service} 대상 키워드별 트렌드 키워드 추출 완료 | Process Time : {datetime.now()-start_time}")
 
     def run(self):
@@ -60,8 +60,7 @@ class DailyTasksMonitor:
     def load_keywords_from_hdfs(self, file_path) -> set:
         """HDFS에서 txt 파일을 읽어와서 키워드 리스트로 반환"""
         try:
-            with self.hdfs.client.read(file_path, encoding="utf-8") as f:
-                contents = f.read()
+            contents = self.hdfs.load(file_path)
             keywords = set([line.strip() for line in contents.splitlines() if line.strip()])  # 중복 제거 및 정렬
             return sorted(keywords)
         except Exception as e:
@@ -86,16 +85,25 @@ class DailyTasksMonitor:
                     job_id = self.date + f"{hour:02}"
                     # hdfs 저장 폴더
                     collect_root_folder = f"/user/ds/wordpopcorn/{self.lang}/daily/{service}_suggest_for_llm_entity_topic/{self.date[:4]}/{self.date[:6]}/{self.date[:8]}/{job_id}"
-                    if self.hdfs.exist(collect_root_folder):
-                        all_success_folders.append(collect_root_folder)
-                        # hdfs에 업로드 되어있는 파일 리스트
+                    # 있어야 할 파일 리스트
+                    file_suggest = f"{job_id}_{suggest_type}.jsonl.gz" # 서제스트
+                    file_serp = f"{job_id}_{suggest_type}_serp.jsonl.gz" # 서프
+                    file_trend_keyword = f"{job_id}_{suggest_type}_trend_keywords.txt" # 트렌드 키워드
+                    file_trend_keyword_new = f"{job_id}_{suggest_type}_trend_keywords_new.txt" # 새로운 트렌드 키워드
+                    check_files = [file_suggest, file_serp, file_trend_keyword, file_trend_keyword_new]
+                    # hdfs에 업로드 되어있는 파일 리스트 (서제스트/서프 job의 _SUCCESS.{job_name}에 모든 파일이 기록되어 있으면 폴더 조회 생략)
+                    exist_file_list = None
+                    manifest_files = set()
+                    for job_name in [f"{suggest_type}_suggest", f"{suggest_type}_serp"]:
+                        success_manifest = self.hdfs.load_success_manifest(collect_root_folder, job_name)
+                        if success_manifest != None:
+                            manifest_files.update(success_manifest["files"])
+                    if set(check_files) <= manifest_files:
+                        exist_file_list = list(manifest_files)
+                    elif self.hdfs.exist(collect_root_folder):
                         exist_file_list = self.hdfs.list(collect_root_folder)
-                        # 있어야 할 파일 리스트
-                        file_suggest = f"{job_id}_{suggest_type}.jsonl.gz" # 서제스트
-                        file_serp = f"{job_id}_{suggest_type}_serp.jsonl.gz" # 서프
-                        file_trend_keyword = f"{job_id}_{suggest_type}_trend_keywords.txt" # 트렌드 키워드
-                        file_trend_keyword_new = f"{job_id}_{suggest_type}_trend_keywords_new.txt" # 새로운 트렌드 키워드
-                        check_files = [file_suggest, file_serp, file_trend_keyword, file_trend_keyword_new]
+                    if exist_file_list != None:
+                        all_success_folders.append(collect_root_folder)
                         # 존재하는 파일
                         success_files = set.intersection(set(check_files), set(exist_file_list))
                         all_success_files.extend(success_files)
@@ -238,6 +246,7 @@ class DailyTasksMonitor:
             print(f"[{datetime.now()}] {success_msg}")
             ds_trend_finder_dbgout(self.lang,
                                    success_msg)
+        print(f"[{datetime.now()}] hdfs 요청 통계 : {self.hdfs.statistics}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -1,4 +1,8 @@
 import re
+from typing import List
+
+# 영어, 숫자, 공백, 특수기호만 포함 + 영어 알파벳 또는 숫자 1자 이상 포함
+EN_VALID_TREND_KEYWORD_PATTERN = re.compile(r'''(?=[^A-Za-z0-9]*[A-Za-z0-9])[A-Za-z0-9\s!"#$%&'()*+,-./:;<=>?@[\]^_`{|}~]+''')
 
 def filter_en_valid_trend_keyword(keyword: str) -> bool:
     """
@@ -30,15 +34,7 @@ def filter_en_valid_trend_keyword(keyword: str) -> bool:
     >>> filter_en_valid_trend_keyword("hello@world")
     True  # 영어, 특수기호 포함
     """
-    
-    # 영어 또는 숫자가 포함되었는지 체크
-    if not re.search(r'[A-Za-z0-9]', keyword):
-        return False
-    
-    # 영어, 숫자, 공백, 특수기호만 포함된 키워드인지 확인
-    if re.match("^[A-Za-z0-9\s!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~]+$", keyword):
-        return True
-    return False
+    return EN_VALID_TREND_KEYWORD_PATTERN.fullmatch(keyword) != None
 
 def filter_en_valid_token_count(text: str, valid_cnt: int = 20) -> bool:
     """
@@ -63,4 +59,11 @@ def filter_en_valid_token_count(text: str, valid_cnt: int = 20) -> bool:
     """
     # 문자열을 공백 기준으로 분리하고 토큰 개수 확인
     token_count = len(text.split())
-    return token_count <= valid_cnt
\ No newline at end of file
+    return token_count <= valid_cnt
+
+def filter_en_valid_trend_keywords(keywords: List[str], valid_cnt: int = 20) -> List[str]:
+    """
+    filter_en_valid_trend_keyword, filter_en_valid_token_count 조건을 모두 만족하는 키워드만 반환
+    """
+    fullmatch = EN_VALID_TREND_KEYWORD_PATTERN.fullmatch
+    return [keyword for keyword in keywords if fullmatch(keyword) and len(keyword.split()) <= valid_cnt]
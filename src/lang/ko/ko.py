@@ -1,6 +1,7 @@
 import re
 import string
 from datetime import datetime
+from typing import Iterable, Iterator
 
 from lang.lang_base import LanguageBase
 from utils.file import PickleFileHandler
@@ -110,6 +111,31 @@ class Ko(LanguageBase):
             print(f"5_small_with_space: {len(extension_texts)}개, 소요시간: {datetime.now() - start_time}")
             return extension_texts
      
+    def iter_extension_texts_by_prefix(self, prefix : str) -> Iterator[str]:
+        '''
+        prefix 뒤에 완성형 문자(small set) 혹은 공백 한 글자를 붙인 다음 단계 확장 텍스트를 하나씩 반환
+        ex) "가" -> "가가", "가개", ..., "가 " ("4_small_with_space" 중 "가"로 시작하는 것과 동일)
+            "가나" -> "가나가", ..., "가나 " ("5_small_with_space" 중 "가나"로 시작하는 것과 동일)
+        '''
+        seen = set()
+        for c in self.complete_hanguls_small_set + [" "]:
+            text = normalize_spaces(prefix + c) # "가 " + " " -> "가 "
+            if text not in seen:
+                seen.add(text)
+                yield text
+
+    def iter_extension_texts_by_prefixes(self, prefixes : Iterable[str]) -> Iterator[str]:
+        '''
+        여러 prefix의 다음 단계 확장 텍스트를 중복 없이 하나씩 반환
+        전체 확장 텍스트(ex. "5_small_with_space" 약 1,800만개)를 만들지 않고 필요한 prefix의 확장 텍스트만 생성
+        '''
+        seen = set()
+        for prefix in prefixes:
+            if prefix in seen: # 같은 prefix는 한 번만 확장
+                continue
+            seen.add(prefix)
+            yield from self.iter_extension_texts_by_prefix(prefix)
+
     def suggest_extension_texts(self, 
                                 stratgy : str = "all",
                                 contain_none : bool = False) -> list:
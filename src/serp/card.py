@@ -1,49 +1,51 @@
 from typing import List, Union
 from datetime import datetime
+from functools import cached_property
 
 from serp.url import URL
 from serp.snippet import Snippet
+from utils.record import SerpFeature
 
 class Card:
-    def __init__(self, card : dict, lang : str):
-        if isinstance(card, dict):
+    def __init__(self, card : Union[dict, SerpFeature], lang : str):
+        if isinstance(card, dict): # 사용하는 필드만 남긴 record로 변환
+            card = SerpFeature.from_dict(card)
+        if isinstance(card, SerpFeature):
             self.lang = lang
-            if 'sequence' in card:
-                self.sequence = card['sequence']
+            if card.sequence != None:
+                self.sequence = card.sequence
             self.card = card
-            self._url : Union[URL, List[URL]] = self.extract_url()
-            self._title = self.extract_title()
-            self._snippet : Snippet = self.extract_sinppet()
         else:
-            raise TypeError("card must be dict type")
-            
-    @property
+            raise TypeError("card must be dict or SerpFeature type")
+    
+    # url, title, snippet은 처음 사용할 때 한 번만 추출
+    @cached_property
     def url(self) -> Union[URL, List[URL]]:
-        return self._url
+        return self.extract_url()
     
-    @property 
-    def snippet(self):
-        return self._snippet
+    @cached_property
+    def snippet(self) -> Snippet:
+        return self.extract_sinppet()
     
-    @property
-    def title(self):
-        return self._title
+    @cached_property
+    def title(self) -> Union[str, List[str]]:
+        return self.extract_title()
     
     def extract_title(self) -> Union[str, List[str]]:
         try:
             result = ''   
             # 1. title이 여러개 있는 피처 타입 -> List[str]
             ## video_results
-            if self.card.get('type') == 'video_results':
-                if "videos" in self.card:
-                    result = " ".join([video['title'] for video in self.card['videos'] if 'title' in video])
-                if "items" in self.card:
-                    result = " ".join([item['title'] for item in self.card['items'] if 'title' in item])
+            if self.card.type == 'video_results':
+                if self.card.videos:
+                    result = " ".join([video['title'] for video in self.card.videos if 'title' in video])
+                if self.card.items:
+                    result = " ".join([item['title'] for item in self.card.items if 'title' in item])
             
             ## top_stories
-            if self.card.get('type') == 'top_stories':
-                if "items" in self.card:
-                    for item in self.card['items']:
+            if self.card.type == 'top_stories':
+                if self.card.items:
+                    for item in self.card.items:
                         # multi carousels
                         if "carousels" in item:
                             result += " ".join([car['title'] for car in item['carousels'] if 'title' in car])
@@ -52,16 +54,16 @@ class Card:
                         else:
                             result += f" {item['title']}"
                 # single carousels
-                if "carousels" in self.card:
-                    result += " ".join([car['title'] for car in self.card['carousels'] if 'title' in car])
+                if self.card.carousels:
+                    result += " ".join([car['title'] for car in self.card.carousels if 'title' in car])
             
             # 2. 타이틀이 하나인 피처 타입 -> str
-            elif 'title' in self.card:
-                result = self.card['title']
+            elif self.card.title != None:
+                result = self.card.title
             
-            elif self.card.get('type') == "featured_snippet" and "results" in self.card:
-                if 'title' in self.card['results'][0]:
-                    result = self.card['results'][0]['title']
+            elif self.card.type == "featured_snippet" and self.card.results:
+                if 'title' in self.card.results[0]:
+                    result = self.card.results[0]['title']
             
             # 3. 타이틀이 없는 피처 타입 -> ''
             else:
@@ -75,21 +77,21 @@ class Card:
     def extract_url(self) -> Union[URL, List[URL]]:
         url = ''
         # 기본
-        if 'url' in self.card:
-            url = self.card['url']
+        if self.card.url != None:
+            url = self.card.url
         # 추천 스니펫
-        elif self.card['type'] == 'featured_snippet':
-            if 'results' in self.card:
-                if 'url' in self.card['results'][0]:
-                    url = self.card['results'][0]['url']
+        elif self.card.type == 'featured_snippet':
+            if self.card.results:
+                if 'url' in self.card.results[0]:
+                    url = self.card.results[0]['url']
         # # 아티클(뉴스)
-        if self.card['type'] == 'articles':
+        if self.card.type == 'articles':
             urls = []
-            if "cards" in self.card:
-                for card in self.card["cards"]:
+            if self.card.cards:
+                for card in self.card.cards:
                     urls.append(URL(card["url"]))
-            if "items" in self.card:
-                for card in self.card["items"]:
+            if self.card.items:
+                for card in self.card.items:
                     if "carousels" in card:
                         for carousel in card["carousels"]:
                             urls.append(URL(carousel['url']))
@@ -97,8 +99,8 @@ class Card:
         return URL(url)
     
     def extract_sinppet(self) -> Snippet:
-        if 'snippet' in self.card:
-            snippet_text = self.card['snippet']
+        if self.card.snippet != None:
+            snippet_text = self.card.snippet
         else:
             snippet_text = ""
         return Snippet(snippet_text, self.lang)
\ No newline at end of file
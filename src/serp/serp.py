@@ -1,102 +1,93 @@
 import re
-import tldextract
 from typing import List, Union
 
 from serp.card import Card
+from serp.url import extract as extract_url
+from utils.record import SerpRecord, SerpFeature
 
 class Serp:
-    def __init__(self, serp):
+    '''
+    서프 결과 (features는 처음 필요할 때 한 번만 순회해서 card, title, snippet, url, site_name을 같이 추출해둠)
+    '''
+    def __init__(self, serp : Union[dict, SerpRecord]):
+        if isinstance(serp, dict): # 사용하는 필드만 남긴 record로 변환
+            serp = SerpRecord.from_dict(serp)
         self.serp = serp
-        self.lang = serp['search_parameters']['hl']
-        self.keyword = serp['search_parameters']['q']
-        self.request_time = serp['search_parameters']['requested_time']
+        self.lang = serp.search_parameters.hl
+        self.keyword = serp.search_parameters.q
+        self.request_time = serp.search_parameters.requested_time
+        self._extracted = None
 
     @property
     def cards(self) -> List[Card]:
-        return self.extract_cards()
+        return list(self._extract()["cards"])
     
     def extract_cards(self):
-        cards = []
-        if 'features' in self.serp:
-            for feature in self.serp['features']:
-                cards.append(Card(feature, self.lang))
-                
-        return cards
+        return self.cards
+    
+    def _extract(self) -> dict:
+        '''
+        features를 한 번만 순회하면서 카드별 정보 추출 (결과는 저장해두고 복사본을 반환)
+        '''
+        if self._extracted == None:
+            extracted = {"cards": [], "feature_types": [], "titles": [], "snippets": [], "urls": [], "site_names": []}
+            for feature in self.serp.features:
+                card = Card(feature, self.lang)
+                extracted["cards"].append(card)
+                extracted["feature_types"].append(feature.type)
+                extracted["titles"].append(card.title)
+                extracted["snippets"].append(self.extract_snippet(feature))
+                extracted["urls"].append(self.extract_url(feature))
+                extracted["site_names"].append(feature.site_name if feature.site_name != None else "")
+            self._extracted = extracted
+        return self._extracted
     
     def feature_types(self) -> List[str]:
-        feature_types = []
-        if 'features' in self.serp:
-            for feature in self.serp['features']:
-                if 'type' in feature:
-                    feature_types.append(feature['type'])
-                else:
-                    feature_types.append("")
-        return feature_types
+        return list(self._extract()["feature_types"])
     
-    def extract_url(self, card) -> str:
+    def extract_url(self, card : SerpFeature) -> str:
         '''
         하나의 카드에서 url 추출
         '''
         result = ''
         # 기본
-        if 'url' in card:
-            result = card['url']
+        if card.url != None:
+            result = card.url
         # 추천 스니펫
-        elif card['type'] == 'featured_snippet':
-            if 'results' in card:
-                if 'url' in card['results'][0]:
-                    result = card['results'][0]['url']
+        elif card.type == 'featured_snippet':
+            if card.results:
+                if 'url' in card.results[0]:
+                    result = card.results[0]['url']
         return result
     
     ### title 관련 함수 ###
-    def extract_title(self, card) -> Union[str, List[str]]:
+    def extract_title(self, card : SerpFeature) -> Union[str, List[str]]:
         card = Card(card, self.lang)
         return card.title
     
-    def extract_snippet(self, card):
+    def extract_snippet(self, card : SerpFeature):
         snippet = ""
-        if 'snippet' in card:
-            snippet = card['snippet']
+        if card.snippet != None:
+            snippet = card.snippet
         return snippet
         
     def urls(self) -> List[str]:
-        urls = []
-        if 'features' in self.serp:
-            features = self.serp['features']
-            for feature in features:
-                urls.append(self.extract_url(feature))
-        return urls
+        return list(self._extract()["urls"])
 
     def domains(self) -> List[str]:
-        domains = [tldextract.extract(url).domain for url in self.urls()]
-        return domains
+        '''
+        url별 도메인 (serp.url.extract : 같은 호스트는 tldextract를 한 번만 호출)
+        '''
+        return [extract_url(url).domain for url in self.urls()]
     
     def site_names(self) -> List[str]:
-        site_names = []
-        if 'features' in self.serp:
-            features = self.serp['features']
-            for feature in features:
-                if 'site_name' in feature:
-                    site_names.append(feature['site_name'])
-                else:
-                    site_names.append("")
-        return site_names
+        return list(self._extract()["site_names"])
     
     def titles(self) -> List[str]:
-        titles = []
-        if 'features' in self.serp:
-            features = self.serp['features']
-            for feature in features:
-                titles.append(self.extract_title(feature))
-        return titles
+        return list(self._extract()["titles"])
     
     def snippets(self) -> List[str]:
-        snippets = []
-        if 'features' in self.serp:
-            features = self.serp['features']
-            for feature in features:
-                snippets.append(self.extract_snippet(feature))
-        return snippets
+        return list(self._extract()["snippets"])
     
 if __name__ == "__main__":
     from utils.file import JsonlFileHandler
@@ -1,10 +1,45 @@
 import re
-from abc import ABC, abstractmethod
+from abc import ABC
+from typing import Dict, List, Tuple, Union
 
 from serp.serp import Serp
 
+# 언어별 문자 codepoint 범위 (양 끝 포함)
+LANGUAGE_CHARACTER_RANGES = {
+    "ko": [(0xAC00, 0xD7A3), (0x3131, 0x314E), (0x314F, 0x3163)], # 가-힣, ㄱ-ㅎ, ㅏ-ㅣ
+    "ja": [(0x3040, 0x309F), (0x30A0, 0x30FF)], # 히라가나, 가타카나
+    "en": [(0x41, 0x5A), (0x61, 0x7A)], # A-Z, a-z
+}
+
+# str.translate로 언어별 문자는 표시 문자로, 나머지 문자는 \x00으로 바꾼 뒤 str.count로 개수 계산 (문자열을 한 번만 변환)
+# - translate table은 BMP(0x0000~0xFFFF) 전체를 index로 바로 찾는 문자열 (dict보다 빠름, 범위 밖 문자는 그대로 남음)
+_LANGUAGE_MARKERS = {"ko": "\x01", "ja": "\x02", "en": "\x03"}
+
+def _build_language_translate_table() -> str:
+    table = ["\x00"] * 0x10000
+    for lang, ranges in LANGUAGE_CHARACTER_RANGES.items():
+        for start, end in ranges:
+            for codepoint in range(start, end + 1):
+                table[codepoint] = _LANGUAGE_MARKERS[lang]
+    return "".join(table)
+
+_LANGUAGE_TRANSLATE_TABLE = _build_language_translate_table()
+
+def calculate_language_ratios(text : str) -> Dict[str, float]:
+    '''
+    text에서 한국어, 일본어(히라가나, 가타카나), 영어 문자의 비율을 한 번에 계산
+    '''
+    if not text:
+        return {lang: 0.0 for lang in _LANGUAGE_MARKERS}
+    translated = text.translate(_LANGUAGE_TRANSLATE_TABLE)
+    total = len(text)
+    return {lang: translated.count(marker) / total for lang, marker in _LANGUAGE_MARKERS.items()}
+
 class SerpChecker(ABC):
-    def __init__(self, serp:dict):
+    LANG : str = None
+    DEFAULT_RATIO_THRESHOLD : float = None
+
+    def __init__(self, serp:Union[dict, Serp]):
         """
         문자열에서 특정 국가(한국, 미국, 일본) 언어 문자의 비율을 계산하고 판단하는 클래스
 
@@ -14,13 +49,23 @@ class SerpChecker(ABC):
         self.serp = serp
         self.text = self._extract_text()
         self.total_characters = len(self.text)
+        self._ratios = None
 
     def _extract_text(self) -> str:
-        serp = Serp(self.serp)
+        serp = self.serp if isinstance(self.serp, Serp) else Serp(self.serp)
         all_text = " ".join(serp.titles()) + " ".join(serp.snippets()) # 타이틀, 스니펫 사용
         all_text = all_text.replace(' ', '') # 공백 제거
         return all_text
     
+    @property
+    def ratios(self) -> Dict[str, float]:
+        '''
+        한국어, 일본어, 영어 비율 (ex. {"ko": 0.4, "ja": 0.0, "en": 0.1})
+        '''
+        if self._ratios == None:
+            self._ratios = calculate_language_ratios(self.text)
+        return self._ratios
+    
     def _calculate_ratio(self, pattern):
         """
         특정 언어 패턴에 해당하는 문자의 비율을 계산합니다.
@@ -34,38 +79,52 @@ class SerpChecker(ABC):
         if not self.text:
             return 0.0
 
-        matched_characters = re.findall(pattern, self.text)
-        matched_count = len(matched_characters)
+        matched_count = sum(1 for _ in re.finditer(pattern, self.text))
 
         return matched_count / self.total_characters if self.total_characters > 0 else 0.0
     
-    @abstractmethod
-    def is_domestic(self, ratio_threshold:float, return_ratio:bool=False) -> bool:
-        ...
-        
-class SerpCheckerKo(SerpChecker):
-    def is_domestic(self, ratio_threshold = 0.05, return_ratio=False):
-        """한국어가 ratio_threshold 이상 포함되어 있는지 판단"""
-        ratio = self._calculate_ratio(r'[가-힣ㄱ-ㅎㅏ-ㅣ]')
+    def is_domestic(self, ratio_threshold:float=None, return_ratio:bool=False) -> bool:
+        """LANG 문자가 ratio_threshold 이상 포함되어 있는지 판단"""
+        if ratio_threshold == None:
+            ratio_threshold = self.DEFAULT_RATIO_THRESHOLD
+        ratio = self.ratios[self.LANG]
         if return_ratio:
             return ratio >= ratio_threshold, ratio
         return ratio >= ratio_threshold
 
+    @classmethod
+    def is_domestic_batch(cls, serps:List[dict], ratio_threshold:float=None) -> List[bool]:
+        '''
+        여러 서프의 is_domestic 결과
+        '''
+        return [cls(serp).is_domestic(ratio_threshold) for serp in serps]
+
+    @classmethod
+    def split_domestic(cls, serps:List[dict], ratio_threshold:float=None) -> Tuple[List[dict], List[dict]]:
+        '''
+        서프 목록을 (해당 국가 서프, 해당 국가가 아닌 서프)로 나눔
+        '''
+        domestic_serps = []
+        non_domestic_serps = []
+        for serp, is_domestic in zip(serps, cls.is_domestic_batch(serps, ratio_threshold)):
+            if is_domestic: domestic_serps.append(serp)
+            else: non_domestic_serps.append(serp)
+        return domestic_serps, non_domestic_serps
+        
+class SerpCheckerKo(SerpChecker):
+    """한국어가 ratio_threshold(0.05) 이상 포함되어 있는지 판단"""
+    LANG = "ko"
+    DEFAULT_RATIO_THRESHOLD = 0.05
+
 class SerpCheckerEn(SerpChecker):
-    def is_domestic(self, ratio_threshold = 0.2, return_ratio=False):
-        """영어가 ratio_threshold 이상 포함되어 있는지 판단"""
-        ratio = self._calculate_ratio(r'[A-Za-z]')
-        if return_ratio:
-            return ratio >= ratio_threshold, ratio
-        return ratio >= ratio_threshold
+    """영어가 ratio_threshold(0.2) 이상 포함되어 있는지 판단"""
+    LANG = "en"
+    DEFAULT_RATIO_THRESHOLD = 0.2
 
 class SerpCheckerJa(SerpChecker):
-    def is_domestic(self, ratio_threshold = 0.05, return_ratio=False):
-        """히라가나, 가타카나가 ratio_threshold 이상 포함되어 있는지 판단"""
-        ratio = self._calculate_ratio(r'[\u3040-\u309F\u30A0-\u30FF]')
-        if return_ratio:
-            return ratio >= ratio_threshold, ratio
-        return ratio >= ratio_threshold
+    """히라가나, 가타카나가 ratio_threshold(0.05) 이상 포함되어 있는지 판단"""
+    LANG = "ja"
+    DEFAULT_RATIO_THRESHOLD = 0.05
     
 if __name__ == "__main__":
     from utils.file import JsonlFileHandler
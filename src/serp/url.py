@@ -1,7 +1,27 @@
 import tldextract
+from functools import lru_cache
 from urllib.parse import urlparse
 
+TLD_EXTRACT_CACHE_SIZE = 100_000 # 호스트별 tldextract 결과 캐시 개수
+
+# 패키지에 포함된 public suffix list 사용 (시작할 때 suffix list를 받으러 네트워크 요청하지 않음)
+_tld_extractor = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+@lru_cache(maxsize=TLD_EXTRACT_CACHE_SIZE)
+def _extract_host(host : str):
+    return _tld_extractor(host)
+
+def extract(url : str):
+    '''
+    tldextract.extract와 같은 결과 (같은 호스트는 프로세스 안에서 한 번만 추출)
+    '''
+    host = urlparse(url).netloc if isinstance(url, str) else ''
+    if host == '': # 호스트를 못 찾으면 url 전체로 추출 (스킴 없는 url 등)
+        return _extract_host(url)
+    return _extract_host(host)
+
 class URL:
+    __slots__ = ("url", "_parsed_url", "_extracted")
     HOST_SPLITOR = '.'
     PATH_SPLITOR = '/'
     
@@ -9,18 +29,28 @@ class URL:
         self.url = url
         parsed_url = urlparse(url)
         self._parsed_url = parsed_url
+        self._extracted = None
+    
+    def _extract(self):
+        '''
+        subdomain, domain, top_level_domain에서 같이 사용 (인스턴스당 한 번만 추출)
+        '''
+        if self._extracted == None:
+            host = self._parsed_url.netloc
+            self._extracted = _extract_host(host) if host != '' else extract(self.url)
+        return self._extracted
     
     @property
     def subdomain(self):
-        return tldextract.extract(self.url).subdomain
+        return self._extract().subdomain
     
     @property
     def domain(self):
-        return tldextract.extract(self.url).domain
+        return self._extract().domain
     
     @property
     def top_level_domain(self):
-        return tldextract.extract(self.url).suffix
+        return self._extract().suffix
     
     @property
     def host(self):
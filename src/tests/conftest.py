@@ -0,0 +1,5 @@
+import os
+import sys
+
+# src 폴더 기준으로 import (jobs, utils, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
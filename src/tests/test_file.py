@@ -0,0 +1,30 @@
+import gzip
+import os
+
+import pytest
+
+from utils.file import GZipFileHandler
+
+def test_gzip_roundtrip_multi_block(tmp_path, monkeypatch):
+    monkeypatch.setattr(GZipFileHandler, "BLOCK_SIZE", 1024)
+    path = tmp_path / "a.jsonl"
+    data = b"".join(f'{{"n": {i}}}\n'.encode() for i in range(5000))
+    path.write_bytes(data)
+    gz_path = GZipFileHandler.gzip(str(path), threads=4)
+    assert gz_path == f"{path}.gz"
+    assert not path.exists()
+    with gzip.open(gz_path, "rb") as f:
+        assert f.read() == data
+
+def test_gzip_returns_existing_gz_on_rerun(tmp_path):
+    path = tmp_path / "a.jsonl"
+    path.write_bytes(b'{"n": 1}\n')
+    gz_path = GZipFileHandler.gzip(str(path))
+    assert GZipFileHandler.gzip(str(path)) == gz_path
+
+def test_gzip_missing_file(tmp_path):
+    path = str(tmp_path / "missing.jsonl")
+    with pytest.raises(FileNotFoundError):
+        GZipFileHandler.gzip(path)
+    assert GZipFileHandler.gzip(path, missing_ok=True) == path + ".gz"
+    assert not os.path.exists(path + ".gz")
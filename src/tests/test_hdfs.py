@@ -0,0 +1,141 @@
+import gzip
+import json
+import threading
+import contextlib
+
+import pytest
+
+pytest.importorskip("hdfs")
+
+from hdfs import HdfsError
+from utils.hdfs import HdfsFileHandler
+
+CHUNK = 16
+
+def jsonl(records) -> bytes:
+    return b"".join(json.dumps(r).encode() + b"\n" for r in records)
+
+def make_handler(files : dict):
+    '''
+    iter_bytes 대신 메모리의 파일을 CHUNK byte씩 주는 handler
+    closed[path] : 해당 파일을 읽던 producer가 끝났는지
+    '''
+    hdfs = HdfsFileHandler()
+    closed = {path: threading.Event() for path in files}
+    def iter_bytes(path, offset=0, chunk_size=None):
+        data = files[path]
+        try:
+            for i in range(offset, len(data), CHUNK):
+                yield data[i:i+CHUNK]
+        finally:
+            closed[path].set()
+    hdfs.iter_bytes = iter_bytes
+    return hdfs, closed
+
+def test_read_jsonl_files_generator_reads_in_order():
+    a = [{"n": i} for i in range(100)]
+    b = [{"s": "키워드"}] * 30
+    files = {"/a.jsonl": jsonl(a),
+             "/b.jsonl.gz": gzip.compress(jsonl(b[:10])) + gzip.compress(jsonl(b[10:]))} # gzip member 여러 개
+    hdfs, closed = make_handler(files)
+    result = list(hdfs.read_jsonl_files_generator(["/a.jsonl", "/b.jsonl.gz", "/a.jsonl"], prefetch=2, prefetch_chunks=2))
+    assert result == a + b + a
+    assert all(event.wait(5) for event in closed.values())
+
+def test_read_jsonl_files_generator_stops_producers_on_close():
+    # 첫 파일을 조금 읽다가 멈춤 : 다른 파일들은 queue가 가득 찬 채로 (끝 표시 None을 넣는 중) 기다리고 있음
+    files = {"/big.jsonl": jsonl([{"n": i} for i in range(1000)]),
+             "/small1.jsonl": b'{"a":1}\n',
+             "/small2.jsonl": b'{"a":2}\n'}
+    hdfs, closed = make_handler(files)
+    generator = hdfs.read_jsonl_files_generator(list(files), prefetch=3, prefetch_chunks=1)
+    assert next(generator) == {"n": 0}
+    generator.close()
+    for path, event in closed.items():
+        assert event.wait(5), path
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join(5)
+            assert not thread.is_alive(), thread.name
+
+def test_read_jsonl_files_generator_continues_after_decode_error():
+    files = {"/broken.jsonl": jsonl([{"n": i} for i in range(50)]) + b"{not json\n" + jsonl([{"n": 0}] * 200),
+             "/ok.jsonl": jsonl([{"ok": True}])}
+    hdfs, closed = make_handler(files)
+    result = list(hdfs.read_jsonl_files_generator(list(files), prefetch=2, prefetch_chunks=1))
+    assert result == [{"n": i} for i in range(50)] + [{"ok": True}]
+    assert closed["/broken.jsonl"].wait(5)
+
+def test_read_jsonl_generator_record_type():
+    from utils.record import SuggestResult
+    hdfs, _ = make_handler({"/s.jsonl.gz": gzip.compress(jsonl([{"keyword": "a", "suggestions": [{"text": "a b"}]}]))})
+    result = list(hdfs.read_jsonl_generator("/s.jsonl.gz", record_type=SuggestResult))
+    assert result[0].keyword == "a" and result[0].suggestions[0].text == "a b"
+
+class FakeClient:
+    '''
+    업로드한 파일을 메모리(files)에 저장하는 hdfs client (corrupt=True면 마지막 byte를 바꿔서 저장)
+    '''
+    def __init__(self, corrupt : bool = False):
+        self.files = {}
+        self.corrupt = corrupt
+
+    def list(self, path, status=False):
+        return []
+
+    def makedirs(self, path):
+        pass
+
+    def upload(self, hdfs_path, local_path, overwrite=False):
+        with open(local_path, "rb") as f:
+            data = f.read()
+        if self.corrupt:
+            data = data[:-1] + bytes([data[-1] ^ 1])
+        self.files[hdfs_path] = data
+
+    def write(self, path, data, encoding=None, append=False, overwrite=False):
+        self.files[path] = data.encode(encoding) if encoding else data
+
+    @contextlib.contextmanager
+    def read(self, path, encoding=None, offset=0, length=None, chunk_size=0):
+        if path not in self.files:
+            raise HdfsError(f"File does not exist: {path}")
+        data = self.files[path][offset:]
+        if chunk_size:
+            yield iter([data[i:i+chunk_size] for i in range(0, len(data), chunk_size)])
+        else:
+            yield _Reader(data, encoding)
+
+class _Reader:
+    def __init__(self, data, encoding):
+        self.data, self.encoding = data, encoding
+
+    def read(self):
+        return self.data.decode(self.encoding) if self.encoding else self.data
+
+def make_upload_handler(tmp_path, corrupt=False):
+    hdfs = HdfsFileHandler()
+    hdfs.client = FakeClient(corrupt)
+    hdfs.CHUNK_SIZE = CHUNK
+    files = []
+    for name, data in [("a.txt", b"a\n" * 100), ("b.jsonl.gz", gzip.compress(b"{}\n"))]:
+        (tmp_path / name).write_bytes(data)
+        files.append((str(tmp_path / name), f"/data/2024111201/{name}"))
+    return hdfs, files
+
+def test_upload_files_verifies_content_and_writes_job_manifest(tmp_path):
+    hdfs, files = make_upload_handler(tmp_path)
+    uploaded = hdfs.upload_files(files[:1], job_name="basic_suggest")
+    hdfs.upload_files(files[1:], job_name="basic_serp")
+    # job마다 다른 manifest에 기록 : 다른 job의 기록을 덮어쓰지 않음
+    suggest_manifest = hdfs.load_success_manifest("/data/2024111201", "basic_suggest")
+    serp_manifest = hdfs.load_success_manifest("/data/2024111201", "basic_serp")
+    assert suggest_manifest["files"] == {"a.txt": uploaded["/data/2024111201/a.txt"]}
+    assert list(serp_manifest["files"]) == ["b.jsonl.gz"]
+    assert hdfs.load_success_manifest("/data/2024111201", "target_suggest") == None
+
+def test_upload_files_rejects_corrupted_upload(tmp_path):
+    hdfs, files = make_upload_handler(tmp_path, corrupt=True)
+    with pytest.raises(IOError, match="내용이 다릅니다"):
+        hdfs.upload_files(files, job_name="basic_suggest")
+    assert hdfs.load_success_manifest("/data/2024111201", "basic_suggest") == None
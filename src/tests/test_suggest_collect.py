@@ -0,0 +1,46 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+# lang -> utils.db (pandas, sqlalchemy) 필요
+suggest_collect = pytest.importorskip("collector.suggest_collector.suggest_collect")
+
+def make_suggest(monkeypatch):
+    '''
+    api 대신 바로 응답하는 fetch_suggestions_async를 쓰는 Suggest
+    calls : 요청한 키워드 목록
+    '''
+    calls = []
+    async def fetch_suggestions_async(session, rate_limiter, suggest_api_params):
+        calls.append(suggest_api_params.query)
+        await asyncio.sleep(0)
+        return {"keyword": suggest_api_params.query}
+    monkeypatch.setattr(suggest_collect, "fetch_suggestions_async", fetch_suggestions_async)
+    suggest = suggest_collect.Suggest.__new__(suggest_collect.Suggest)
+    suggest.lang_dict = {"ko": SimpleNamespace(hl="ko", gl="KR")}
+    suggest.cache = None
+    return suggest, calls
+
+def test_requests_stream_returns_all_results(monkeypatch):
+    suggest, _ = make_suggest(monkeypatch)
+    targets = [f"키워드{i}" for i in range(50)]
+    result = suggest._requests_stream(targets, "ko", "google", max_concurrency=4, buffer_size=2)
+    assert sorted(res["keyword"] for res in result) == sorted(targets)
+
+@pytest.mark.parametrize("expand", [None, lambda res: [res["keyword"] + " a"]]) # 확장은 끝나지 않음
+def test_requests_stream_stops_when_closed(monkeypatch, expand):
+    suggest, calls = make_suggest(monkeypatch)
+    threads = set(threading.enumerate())
+    generator = suggest._requests_stream((f"키워드{i}" for i in range(100000)), "ko", "google",
+                                         max_concurrency=4, buffer_size=2, expand=expand)
+    for _ in range(3):
+        next(generator)
+    generator.close() # queue가 가득 찬 상태에서 중간에 닫음
+    # 수집 thread, queue에 넣는 thread 모두 종료되고 더 이상 요청하지 않음
+    assert set(threading.enumerate()) - threads == set()
+    request_count = len(calls)
+    time.sleep(0.2)
+    assert len(calls) == request_count < 100
@@ -0,0 +1,59 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from utils.record import Suggestion
+from validator import suggest_validator
+from validator.suggest_validator import SuggestValidator
+
+TYPES = [0, 46, 33, -1, 1, 19, 35, 143, 999] # 판별 대상(0, 46), unrelated(33), 그 외
+# 조건 함수들이 사용하는 subtype (SuggestValidator.RULE_SUBTYPES와 별도로 적어둠)
+RULE_SUBTYPES = [3, 5, 7, 8, 10, 13, 30, 333, 512, 546]
+UNKNOWN_SUBTYPES = [0, 1, 2, 4, 6, 9, 11, 12, 143, 362, 650, 9999]
+
+def expected(type, subtype) -> int:
+    flag = 0
+    if SuggestValidator._is_valid_suggest_by_rules(type, subtype):
+        flag |= SuggestValidator.VALID
+    if SuggestValidator.is_suffix_trend_suggest(type, subtype):
+        flag |= SuggestValidator.SUFFIX_TREND
+    return flag
+
+def assert_same(type, subtype):
+    assert SuggestValidator.classify(type, subtype) == expected(type, subtype), (type, subtype)
+    assert SuggestValidator.is_valid_suggest(type, subtype) == SuggestValidator._is_valid_suggest_by_rules(type, subtype), (type, subtype)
+
+@pytest.fixture(autouse=True)
+def clear_classify_cache():
+    suggest_validator._classify_cache.clear()
+    yield
+    suggest_validator._classify_cache.clear()
+
+@pytest.mark.parametrize("type", TYPES)
+def test_classify_all_rule_subtype_combinations(type):
+    for n in range(len(RULE_SUBTYPES) + 1):
+        for subtype in combinations(RULE_SUBTYPES, n):
+            assert_same(type, list(subtype))
+            assert_same(type, list(subtype) + [UNKNOWN_SUBTYPES[n]]) # 판별에 쓰이지 않는 subtype 추가
+
+def random_subtype(rng : random.Random) -> list:
+    pool = RULE_SUBTYPES + UNKNOWN_SUBTYPES
+    subtype = [rng.choice(pool) for _ in range(rng.randint(0, 6))]
+    if subtype and rng.random() < 0.2:
+        subtype.append(subtype[0]) # 중복 subtype
+    return subtype
+
+def test_classify_random(monkeypatch):
+    monkeypatch.setattr(SuggestValidator, "CLASSIFY_CACHE_SIZE", 50) # cache 비우는 경우도 확인
+    rng = random.Random(20241112)
+    for _ in range(20000):
+        type = rng.choice(TYPES + [rng.randint(-5, 1000)])
+        assert_same(type, random_subtype(rng))
+
+def test_classify_suggestions_matches_rules():
+    rng = random.Random(7)
+    suggestions = [Suggestion(f"s{i}", rng.choice(TYPES), random_subtype(rng)) for i in range(2000)]
+    flags = SuggestValidator.classify_suggestions(suggestions)
+    assert flags == [expected(s.suggest_type, s.suggest_subtypes) for s in suggestions]
+    assert SuggestValidator.is_valid_suggests(suggestions) == [SuggestValidator._is_valid_suggest_by_rules(s.suggest_type, s.suggest_subtypes) for s in suggestions]
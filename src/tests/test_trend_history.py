@@ -0,0 +1,48 @@
+from utils.trend_history import TrendKeywordHistoryLoader
+
+class FakeHdfs:
+    '''
+    dict(path -> 내용)로 폴더/파일을 흉내내는 hdfs
+    '''
+    def __init__(self, files : dict):
+        self.files = files
+
+    def exist(self, path : str) -> bool:
+        return any(p == path or p.startswith(path + "/") for p in self.files)
+
+    def list(self, path : str):
+        names = set()
+        for p in self.files:
+            if p.startswith(path + "/"):
+                names.add(p[len(path)+1:].split("/")[0])
+        return sorted(names)
+
+    def load(self, path : str) -> str:
+        return self.files[path]
+
+def make_files(loader, service, date, root_keywords, job_keywords):
+    folder = loader.date_folder_path(service, date)
+    return {f"{folder}/root_trend_keywords.txt": "\n".join(root_keywords),
+            f"{folder}/2024111201/a_trend_keywords.txt": "\n".join(job_keywords)}
+
+def test_snapshot_is_separated_by_file_selection(tmp_path):
+    basic = TrendKeywordHistoryLoader(None, "ko", services=("google",), snapshot_folder=str(tmp_path), fresh_days=0)
+    target = TrendKeywordHistoryLoader(None, "ko", services=("google",), snapshot_folder=str(tmp_path), fresh_days=0, include_root_files=True)
+    files = make_files(basic, "google", "20241111", ["루트"], ["잡"])
+    basic.hdfs = target.hdfs = FakeHdfs(files)
+
+    assert sorted(basic.load("20241112", 1)) == ["잡"]
+    assert sorted(target.load("20241112", 1)) == ["루트", "잡"] # basic 스냅샷을 재사용하지 않음
+    assert target.statistics["snapshot"] == 0
+
+    target.hdfs = FakeHdfs({}) # 이후에는 각자의 스냅샷에서 읽음
+    assert sorted(target.load("20241112", 1)) == ["루트", "잡"]
+    assert target.statistics["snapshot"] == 1
+
+def test_missing_or_empty_day_is_not_snapshotted(tmp_path):
+    loader = TrendKeywordHistoryLoader(FakeHdfs({}), "ko", services=("google",), snapshot_folder=str(tmp_path), fresh_days=0)
+    assert loader.load("20241112", 1) == []
+    assert loader.read_snapshot("google", "20241111") == None
+
+    loader.hdfs = FakeHdfs(make_files(loader, "google", "20241111", [], ["늦게 올라온 키워드"]))
+    assert loader.load("20241112", 1) == ["늦게 올라온 키워드"]
@@ -2,7 +2,7 @@ import json
 import pandas as pd
 import sqlalchemy
 from urllib.parse import quote
-from typing import List
+from typing import List, Tuple
 from datetime import timedelta
 
 from utils.converter import DateConverter
@@ -193,18 +193,7 @@ class QueryDatabaseKo:
     @staticmethod
     def get_hash_json_by_keywords(keywords:list) -> pd.DataFrame:
         engine, metadata = QueryDatabaseKo.get_connection()
-        batch_size = 100
-        result = pd.DataFrame(columns = ['keyword', 'hash', 'json'])
-        for i in range(0, len(keywords), batch_size):
-            if len(keywords[i : i+batch_size])>1:
-                query = f'''SELECT keyword, hash, json
-                            FROM {QueryDatabaseKo.schema}.serp_history WHERE keyword in {tuple(keywords[i : i+batch_size])};
-                         '''
-            elif len(keywords[i : i+batch_size])==1:
-                query = f'''SELECT keyword, hash, json
-                            FROM {QueryDatabaseKo.schema}.serp_history WHERE keyword = "{keywords[0]}";
-                         '''
-            result = pd.concat([result, pd.read_sql(query, con=engine)], axis=0).reset_index(drop=True)
+        result = select_serp_history(engine, QueryDatabaseKo.schema, keywords)
         engine.dispose()
         return result
     
@@ -216,17 +205,7 @@ class QueryDatabaseKo:
         collected_time 이후에 수집된 서프만 가져오기
         '''
         engine, metadata = QueryDatabaseKo.get_connection()
-        batch_size = 100
-        check_serp = pd.DataFrame(columns = ['keyword'])
-        for i in range(0, len(kws), batch_size):
-            batch_keywords = kws[i:i+batch_size]
-            if len(batch_keywords) == 1:
-                query = f"SELECT keyword, json, hash, collected_time FROM {QueryDatabaseKo.schema}.serp_history WHERE keyword ='{batch_keywords[0]}' and collected_time >= '{collected_time}';"
-            else:
-                query = f"SELECT keyword, json, hash, collected_time FROM {QueryDatabaseKo.schema}.serp_history WHERE keyword in {tuple(batch_keywords)} and collected_time >= '{collected_time}';"
-            tmp_serp = pd.read_sql(query, con = engine)
-            if len(tmp_serp) > 0:
-                check_serp = pd.concat([check_serp, tmp_serp], axis = 0).reset_index(drop=True)
+        check_serp = select_serp_history(engine, QueryDatabaseKo.schema, kws, collected_time)
         engine.dispose()
         return check_serp
         
@@ -738,13 +717,7 @@ class QueryDatabaseJa:
     @staticmethod
     def get_hash_json_by_keywords(keywords : list) -> pd.DataFrame:
         engine, metadata = QueryDatabaseJa.get_connection()
-        batch_size = 100
-        result = pd.DataFrame(columns = ['keyword', 'hash', 'json'])
-        for i in range(0, len(keywords), batch_size):
-            query = f'''SELECT keyword, hash, json
-                        FROM {QueryDatabaseJa.schema}.serp_history WHERE keyword in {tuple(keywords[i : i+batch_size])};
-                    '''
-            result = pd.concat([result, pd.read_sql(query, con=engine)], axis=0).reset_index(drop=True)
+        result = select_serp_history(engine, QueryDatabaseJa.schema, keywords)
         engine.dispose()
         return result
     
@@ -756,18 +729,7 @@ class QueryDatabaseJa:
         collected_time 이후에 수집된 서프만 가져오기
         '''
         engine, metadata = QueryDatabaseJa.get_connection()
-        batch_size = 100
-        check_serp = pd.DataFrame(columns = ['keyword'])
-        for i in range(0, len(kws), batch_size):
-            batch_keywords = kws[i:i+batch_size]
-            if len(batch_keywords) == 1:
-                query = f"SELECT keyword, json, hash, collected_time FROM {QueryDatabaseJa.schema}.serp_history WHERE keyword ='{batch_keywords[0]}' and collected_time >= '{collected_time}';"
-            else:
-                query = f"SELECT keyword, json, hash, collected_time FROM {QueryDatabaseJa.schema}.serp_history WHERE keyword in {tuple(batch_keywords)} and collected_time >= '{collected_time}';"
-            check_serp = pd.concat([check_serp, 
-                                   pd.read_sql(query, 
-                                               con = engine)
-                                  ], axis = 0).reset_index(drop=True)
+        check_serp = select_serp_history(engine, QueryDatabaseJa.schema, kws, collected_time)
         engine.dispose()
         return check_serp
     
@@ -1175,6 +1137,25 @@ class QueryDatabaseEn:
             result_proxy.close()
         engine.dispose()
         
+    @staticmethod
+    def get_hash_json_by_keywords(keywords:list) -> pd.DataFrame:
+        engine, metadata = QueryDatabaseEn.get_connection()
+        result = select_serp_history(engine, QueryDatabaseEn.schema, keywords)
+        engine.dispose()
+        return result
+    
+    @staticmethod
+    def get_hash_json_over_collected_time(kws:str, 
+                                          collected_time:str # "yyyy-mm-dd"
+                                         ):
+        '''
+        collected_time 이후에 수집된 서프만 가져오기
+        '''
+        engine, metadata = QueryDatabaseEn.get_connection()
+        check_serp = select_serp_history(engine, QueryDatabaseEn.schema, kws, collected_time)
+        engine.dispose()
+        return check_serp
+
     @staticmethod
     def get_google_suggest_trend_target_by_job_id_source(job_id, source) -> pd.DataFrame:
         '''
@@ -1220,3 +1201,37 @@ def check_length(string, max_length):
     return len(string) <= max_length
     
 
+def select_serp_history(engine, 
+                        schema : str, 
+                        keywords : List[str], 
+                        collected_time : str = None, # collected_time 이후에 수집된 서프만
+                        batch_size : int = 100) -> pd.DataFrame:
+    '''
+    serp_history 테이블에서 keywords의 hash, json 조회 (batch_size개씩 나눠서 조회)
+    '''
+    columns = ['keyword', 'hash', 'json'] + (['collected_time'] if collected_time != None else [])
+    results = [pd.DataFrame(columns = columns)]
+    for i in range(0, len(keywords), batch_size):
+        query, params = serp_history_query(schema, list(keywords[i : i+batch_size]), collected_time)
+        results.append(pd.read_sql(query, con=engine, params=params))
+    return pd.concat(results, axis=0).reset_index(drop=True)
+
+def serp_history_query(schema : str, 
+                       keywords : List[str], 
+                       collected_time : str = None) -> Tuple[str, tuple]:
+    '''
+    키워드 개수(1개 포함)만큼 placeholder를 만든 serp_history 조회 쿼리와 파라미터
+    - 키워드를 쿼리 문자열에 직접 넣지 않으므로 따옴표 등이 포함된 키워드도 그대로 조회됨
+    ex) serp_history_query("query_ko", ["a", "b"]) 
+        -> ("SELECT keyword, hash, json FROM query_ko.serp_history WHERE keyword IN (%s, %s);", ("a", "b"))
+    '''
+    if len(keywords) == 0:
+        raise ValueError("keywords가 비어있습니다.")
+    placeholders = ", ".join(["%s"] * len(keywords))
+    params = list(keywords)
+    if collected_time == None:
+        query = f"SELECT keyword, hash, json FROM {schema}.serp_history WHERE keyword IN ({placeholders});"
+    else:
+        query = f"SELECT keyword, hash, json, collected_time FROM {schema}.serp_history WHERE keyword IN ({placeholders}) AND collected_time >= %s;"
+        params.append(collected_time)
+    return query, tuple(params)
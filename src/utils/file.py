@@ -1,12 +1,17 @@
+import io
 import os
 import json
 import gzip
 import pickle
-import jsonlines
+import zlib
 import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union, List
 from datetime import datetime
 
+from utils import json_codec
+
 class PickleFileHandler:
     def __init__(self, path):
         self.path = path
@@ -41,34 +46,44 @@ class JsonFileHandler:
 class JsonlFileHandler:
     def __init__(self, path):
         self.path = path
+
+    def _iter_lines(self, record_type = None):
+        '''
+        한 줄씩 bytes로 읽어서 json_codec으로 바로 파싱 (.gz 파일은 압축 해제 없이 읽음)
+        record_type(utils.record)이 있으면 dict 대신 record로 디코딩
+        '''
+        decode = json_codec.loads if record_type == None else record_type.decode
+        with GZipFileHandler.open(self.path, "rb") as f:
+            for raw in f:
+                if raw.strip(): # 빈 줄은 건너뜀
+                    yield decode(raw)
     
     def read(self, line_len : int = None):
         data = []
         cnt = 0
         try:
-            with jsonlines.open(self.path) as f:
-                for line in f:
-                    cnt += 1
-                    data.append(line)
-                    if (line_len != None) & (line_len == cnt):
-                        break
+            for line in self._iter_lines():
+                cnt += 1
+                data.append(line)
+                if (line_len != None) & (line_len == cnt):
+                    break
         except Exception as e:
             print(self.path, str(e))
         finally:
             return data
         
-    def read_generator(self, line_len : int = None):
+    def read_generator(self, line_len : int = None, record_type = None):
         '''
         데이터를 한줄씩 읽어서 반환하는 제너레이터
+        record_type : utils.record의 record 클래스 (ex. SuggestResult, 사용하는 필드만 읽음)
         '''
         cnt = 0
         try:
-            with jsonlines.open(self.path) as f:
-                for line in f:
-                    cnt += 1
-                    yield line
-                    if (line_len != None) & (line_len == cnt):
-                        break
+            for line in self._iter_lines(record_type):
+                cnt += 1
+                yield line
+                if (line_len != None) & (line_len == cnt):
+                    break
         except Exception as e:
             print(self.path, str(e))
         
@@ -79,14 +94,11 @@ class JsonlFileHandler:
             if not os.path.exists(save_folder):
                 os.makedirs(save_folder)
             if type(data) == dict: # 하나의 데이터 입력
-                with open(self.path, "a", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False) # ensure_ascii로 한글이 깨지지 않게 저장
-                    f.write("\n") # json을 쓰는 것과 같지만, 여러 줄을 써주는 것이므로 "\n"을 붙여준다.
+                with open(self.path, "ab") as f:
+                    f.write(json_codec.dumps(data) + b"\n") # 한글은 escape 하지 않고 저장
             elif type(data) == list: # 여러 데이터 입력
-                with open(self.path, "a", encoding="utf-8") as f:
-                    for d in data:
-                        json.dump(d, f, ensure_ascii=False) # ensure_ascii로 한글이 깨지지 않게 저장
-                        f.write("\n") # json을 쓰는 것과 같지만, 여러 줄을 써주는 것이므로 "\n"을 붙여준다.
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(json_codec.dumps(d) + b"\n" for d in data)) # 한글은 escape 하지 않고 저장
             else:
                 print(f"[{datetime.now()} {self.path}에 {len(data)}개 데이터 저장 실패. 데이터 타입은 [dict, List[dict]]이어야 합니다. (input data 타입 : {type(data)})")
         except Exception as e:
@@ -95,32 +107,203 @@ class JsonlFileHandler:
     def count_line(self):
         cnt = 0
         try:
-            with jsonlines.open(self.path) as f:
-                for line in f:
-                    cnt += 1
+            for _ in self._iter_lines():
+                cnt += 1
         except Exception as e:
             print(f"error from count_line : {self.path}, {str(e)}")
             return None
         return cnt
 
+class JsonlWriter:
+    '''
+    파일을 한 번만 열어서 jsonl로 저장하는 writer (with 문으로 사용)
+    - json_codec으로 직렬화 (orjson/msgspec이 설치되어 있으면 사용, 없으면 json)
+    - path가 .gz로 끝나면 gzip으로 압축하면서 저장
+    - fsync_interval개 쓸 때마다 디스크에 기록 (중간에 종료되어도 그 전까지 쓴 데이터는 보존)
+    ex)
+        with JsonlWriter("./result.jsonl") as writer:
+            writer.write({"keyword": "a"})
+            writer.write([{"keyword": "b"}, {"keyword": "c"}])
+    '''
+    def __init__(self,
+                 path : str,
+                 mode : str = "a", # "a" : 이어쓰기, "w" : 덮어쓰기
+                 buffer_size : int = 1024 * 1024, # 쓰기 버퍼 크기 (byte)
+                 fsync_interval : int = 10000, # 몇 개 쓸 때마다 디스크에 기록할지 (None 이면 close 할 때만)
+                 compresslevel : int = 6):
+        self.path = path
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self.fsync_interval = fsync_interval
+        self.compresslevel = compresslevel
+        self.count = 0 # 지금까지 쓴 데이터 개수
+        self._raw = None
+        self._gzip = None
+        self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self) -> "JsonlWriter":
+        save_folder = os.path.dirname(self.path)
+        if save_folder and not os.path.exists(save_folder):
+            os.makedirs(save_folder)
+        self._raw = open(self.path, self.mode + "b")
+        if self.path.endswith(".gz"): # 이어쓰기(a)하면 gzip member가 추가되고 gzip으로 읽을 때 이어서 읽힘
+            self._gzip = gzip.GzipFile(fileobj=self._raw, mode=self.mode + "b", compresslevel=self.compresslevel)
+            self._file = io.BufferedWriter(self._gzip, buffer_size=self.buffer_size)
+        else:
+            self._file = io.BufferedWriter(self._raw, buffer_size=self.buffer_size)
+        return self
+
+    @staticmethod
+    def dumps(data) -> bytes:
+        return json_codec.dumps(data)
+
+    def write(self, data : Union[dict, List[dict]]):
+        if self._file == None:
+            raise ValueError(f"{self.path} 파일이 열려있지 않습니다. (with JsonlWriter(...) 로 사용)")
+        for d in (data if type(data) == list else [data]):
+            self._file.write(self.dumps(d) + b"\n")
+            self.count += 1
+            if self.fsync_interval != None and self.count % self.fsync_interval == 0:
+                self.flush(fsync=True)
+
+    def flush(self, fsync : bool = False):
+        '''
+        버퍼에 있는 데이터를 파일에 기록 (fsync=True 이면 디스크까지 기록)
+        '''
+        self._file.flush()
+        if self._gzip != None:
+            self._gzip.flush() # 여기까지 쓴 데이터는 압축 해제 가능한 상태로 기록
+        self._raw.flush()
+        if fsync:
+            os.fsync(self._raw.fileno())
+
+    def close(self):
+        if self._file == None:
+            return
+        self.flush(fsync=True)
+        self._file.close() # gzip이면 gzip trailer까지 기록
+        self._raw.close()
+        self._file = self._gzip = self._raw = None
+
+class KeywordIndexFileHandler:
+    '''
+    jsonl 결과 파일(jsonl_path)에 저장된 키워드 목록을 따로 저장하는 인덱스 파일 (한 줄에 키워드 하나, append only)
+    jsonl 파일 전체를 파싱하지 않고 이미 수집된 키워드를 바로 확인하기 위해 사용
+    '''
+    def __init__(self, path, jsonl_path, key : str = 'keyword'):
+        self.path = path
+        self.jsonl_path = jsonl_path
+        self.key = key
+        self._keywords = None # 한 번 읽은 뒤에는 메모리에서 관리
+
+    def append(self, keywords : List[str]):
+        self.read() # 인덱스 파일이 없으면 먼저 기존 jsonl로 생성
+        with open(self.path, "a", encoding="utf-8") as f:
+            for keyword in keywords:
+                f.write(keyword + "\n")
+        if self._keywords != None:
+            self._keywords.update(keywords)
+
+    def rebuild(self):
+        '''
+        jsonl 파일을 한 번 읽어서 인덱스 파일 생성 (인덱스 파일이 없던 이전 결과 파일인 경우)
+        '''
+        keywords = set()
+        if os.path.exists(self.jsonl_path):
+            for line in JsonlFileHandler(self.jsonl_path).read_generator():
+                keywords.add(line[self.key])
+        with open(self.path, "w", encoding="utf-8") as f:
+            for keyword in keywords:
+                f.write(keyword + "\n")
+        print(f"[{datetime.now()}] 인덱스 파일 생성 완료 : {self.path} ({len(keywords)}개)")
+        self._keywords = keywords
+
+    def read(self) -> set:
+        if self._keywords == None:
+            if not os.path.exists(self.path):
+                self.rebuild()
+            else:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._keywords = set(line.rstrip("\n") for line in f) # 키워드 끝의 공백은 유지
+        return self._keywords
+
 class GZipFileHandler:
+    BLOCK_SIZE = 4 * 1024 * 1024 # 병렬 압축 시 블록 크기 (블록마다 독립된 gzip member로 압축)
+
     @staticmethod
-    def gzip(file : str):
+    def open(file : str, mode : str = "rt"):
+        '''
+        .gz 파일은 압축을 풀지 않고 스트림으로, 그 외 파일은 그대로 open
+        '''
+        if file.endswith(".gz"):
+            return gzip.open(file, mode, encoding="utf-8") if "b" not in mode else gzip.open(file, mode)
+        return open(file, mode, encoding="utf-8") if "b" not in mode else open(file, mode)
+
+    @staticmethod
+    def _compress_block(block : bytes, compresslevel : int) -> bytes:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31) # wbits=31 : gzip 헤더/트레일러 포함
+        return compressor.compress(block) + compressor.flush()
+
+    @staticmethod
+    def gzip(file : str, threads : int = None, compresslevel : int = 6, missing_ok : bool = False) -> str:
+        '''
+        gzip 명령어와 같이 file.gz 생성 후 원본 삭제 (프로세스 내에서 압축)
+        - 블록 단위로 여러 thread에서 압축 (pigz 방식, zlib은 압축 중 GIL을 풀어줌)
+        - 블록별 gzip member를 순서대로 이어붙이므로 일반 gzip/zcat으로 그대로 읽을 수 있음
+        - 원본이 없고 file.gz가 이미 있으면(재실행) file.gz 반환
+        - 둘 다 없으면 FileNotFoundError (missing_ok=True면 file.gz 경로만 반환, 수집 결과가 없을 수 있는 경우)
+        - 압축에 실패하면 에러 (원본은 그대로 둠)
+        '''
+        gz_file = file + '.gz'
+        if not os.path.exists(file):
+            if os.path.exists(gz_file):
+                print(f"already gzip [{file}] file")
+                return gz_file
+            if missing_ok:
+                print(f"fail gzip [{file}] file : 파일이 존재하지 않습니다")
+                return gz_file
+            raise FileNotFoundError(f"gzip할 파일이 존재하지 않습니다 : {file}")
+        threads = threads or min(8, os.cpu_count() or 1)
+        tmp_file = gz_file + '.tmp'
         try:
-            cmd = f"gzip {file}"
-            os.system(cmd)
+            with open(file, "rb") as src, open(tmp_file, "wb") as dst:
+                if threads <= 1 or os.path.getsize(file) <= GZipFileHandler.BLOCK_SIZE:
+                    dst.write(GZipFileHandler._compress_block(src.read(), compresslevel))
+                else:
+                    with ThreadPoolExecutor(max_workers=threads) as executor:
+                        futures = deque()
+                        while True:
+                            block = src.read(GZipFileHandler.BLOCK_SIZE)
+                            if block:
+                                futures.append(executor.submit(GZipFileHandler._compress_block, block, compresslevel))
+                            # 메모리에 올라가는 블록 수 제한 (threads * 2)
+                            while futures and (len(futures) >= threads * 2 or not block):
+                                dst.write(futures.popleft().result())
+                            if not block:
+                                break
+            os.replace(tmp_file, gz_file)
+            os.remove(file)
         except Exception as e:
             print(f"fail gzip [{file}] file", e)
-            return None
-        else:
-            print(f"success gzip [{file}] file")
-            return file + '.gz'
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        print(f"success gzip [{file}] file")
+        return gz_file
+
     @staticmethod
     def ungzip(file : str):
         try:
             if file.endswith(".gz"):
-                cmd = f"gzip -d {file}"
-                os.system(cmd)
+                with gzip.open(file, "rb") as src, open(file[:-3], "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.remove(file)
             else:
                 print(f"not .gz file : {file}")
                 return None
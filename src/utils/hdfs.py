@@ -1,51 +1,176 @@
+import io
 import os
+import gzip
+import time
+import queue
+import hashlib
 import pickle
 import urllib
-from hdfs import InsecureClient
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from hdfs import InsecureClient, HdfsError
 from datetime import datetime
 
+from utils import json_codec
 from utils.file import has_file_extension
 
+class _ChunkReader(io.RawIOBase):
+    '''
+    bytes chunk iterator를 file object처럼 읽기 위한 adapter (gzip.GzipFile, 한 줄씩 읽기에 사용)
+    '''
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self.buffer) == 0:
+            chunk = next(self.chunks, None)
+            if chunk == None:
+                return 0
+            self.buffer = chunk
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+    def close(self):
+        if hasattr(self.chunks, "close"):
+            self.chunks.close()
+        super().close()
+
 class HdfsFileHandler:
+    '''
+    webhdfs client wrapper
+    - 요청마다 '/'를 조회해서 연결을 확인하지 않고, 마지막 성공 요청 이후 HEALTH_CHECK_INTERVAL초가 지났을 때만 확인
+    - 연결 에러(namenode 전환 중 StandbyException 포함)는 다른 namenode를 먼저 사용하도록 재연결 후 재시도
+    - 모든 요청은 하나의 requests.Session(connection pool)을 재사용
+    - statistics : 이 handler로 보낸 요청 수 (call: 메소드 호출, http_request: 실제 http 요청)
+    '''
+    HOSTS = ["http://master001.hadoop.prod.ascentlab.io:50070",
+             "http://master002.hadoop.prod.ascentlab.io:50070"]
+    USER = "ds"
+    HEALTH_CHECK_INTERVAL = 60 # 초
+    MAX_RETRIES = 3
+    RETRY_WAIT = 2 # 재시도 대기 시간(초), 재시도할 때마다 2배
+    CONNECT_TIMEOUT = 10 # 초 (응답을 기다리는 시간은 제한하지 않음)
+    POOL_SIZE = 16
+    CHUNK_SIZE = 1024 * 1024 # 스트림으로 읽을 때 한 번에 받는 크기 (1MB)
+    SUCCESS_FILE_NAME = "_SUCCESS" # upload_files로 업로드한 파일 목록 (폴더, job별 : _SUCCESS.{job_name})
+
     def __init__(self):
+        self.hosts = list(self.HOSTS)
+        self.statistics = {"call": 0, "http_request": 0, "health_check": 0, "retry": 0, "reconnect": 0, "failure": 0}
+        self._lock = threading.Lock()
+        self._last_success_time = None
+        self.session = self.create_session()
         self.connect_to_available_host()
 
+    def create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=len(self.hosts), pool_maxsize=self.POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.hooks["response"].append(self._count_http_request) # datanode로 redirect 되는 요청까지 집계
+        return session
+
     def connect_to_available_host(self):
-        self.host = "http://master001.hadoop.prod.ascentlab.io:50070;http://master002.hadoop.prod.ascentlab.io:50070"
-        self.user = "ds"
-        self.client = InsecureClient(self.host, user=self.user)
+        self.host = ";".join(self.hosts)
+        self.user = self.USER
+        self.client = InsecureClient(self.host, user=self.user, session=self.session, timeout=(self.CONNECT_TIMEOUT, None))
+
+    def reconnect(self):
+        with self._lock:
+            self.hosts = self.hosts[1:] + self.hosts[:1] # 다른 namenode부터 시도
+            self.connect_to_available_host()
+            self.statistics["reconnect"] += 1
+            self._last_success_time = None
 
-    def check_connection(self):
-        # print(f"[{datetime.now()}] Checking HDFS connection...")
-        # Check if the client is connected by trying a simple operation
+    def check_connection(self, force : bool = False):
+        '''
+        마지막 성공 요청 이후 HEALTH_CHECK_INTERVAL초 이내면 확인하지 않음
+        '''
+        if not force and self._last_success_time != None and time.monotonic() - self._last_success_time < self.HEALTH_CHECK_INTERVAL:
+            return
+        self._count("health_check")
         try:
             self.client.list('/')  # Test connection
+            self._last_success_time = time.monotonic()
         except Exception:
             print(f"[{datetime.now()}] Reconnecting to available HDFS host...")
-            self.connect_to_available_host()
+            self.reconnect()
 
-    def list(self, path):
+    def _count(self, key : str, n : int = 1):
+        with self._lock:
+            self.statistics[key] += n
+
+    def _count_http_request(self, response, *args, **kwargs):
+        self._count("http_request")
+
+    @staticmethod
+    def _is_retriable(e : Exception) -> bool:
+        if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)):
+            return True
+        return isinstance(e, HdfsError) and getattr(e, "exception", None) in ("StandbyException", "RetriableException")
+
+    def _request(self, func, retry : bool = True):
+        '''
+        func : self.client를 사용하는 함수 (재연결 후에는 새 client로 다시 호출)
+        retry : append 처럼 다시 실행하면 안 되는 요청은 False
+        '''
         self.check_connection()
-        return self.client.list(path)
+        self._count("call")
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                result = func()
+            except Exception as e:
+                if not self._is_retriable(e) or not retry or attempt == self.MAX_RETRIES:
+                    if self._is_retriable(e):
+                        self._count("failure")
+                    raise
+                self._count("retry")
+                print(f"[{datetime.now()}] HDFS 요청 실패, 재연결 후 다시 시도합니다. ({attempt+1}/{self.MAX_RETRIES}) (error msg : {e})")
+                time.sleep(self.RETRY_WAIT * 2**attempt)
+                self.reconnect()
+            else:
+                self._last_success_time = time.monotonic()
+                return result
+
+    def _read(self, path, encoding=None, offset=0, length=None):
+        def read():
+            with self.client.read(path, encoding=encoding, offset=offset, length=length) as f:
+                return f.read()
+        return self._request(read)
+
+    def list(self, path):
+        return self._request(lambda: self.client.list(path))
     
     def list_dir(self, path):
-        self.check_connection()
         path_url = urllib.parse.quote(path)
         try:
-            if self.client.status(path_url):
-                return [f"{path}/{p}" for p in self.client.list(path_url, status=False)]
+            if self._request(lambda: self.client.status(path_url)):
+                return [f"{path}/{p}" for p in self._request(lambda: self.client.list(path_url, status=False))]
         except Exception as e :
             print(f"[{datetime.now()}] hdfs에 '{path_url}' 경로 없음 (error msg : {e})")
             return []
     
     def load(self, path, encoding="utf-8"):
-        self.check_connection()
-        with self.client.read(path, encoding=encoding) as f:
-            contents = f.read()
-        return contents
+        return self._read(path, encoding=encoding)
+
+    def load_bytes(self, path, offset=0, length=None) -> bytes:
+        '''
+        offset(byte) 위치부터 length byte 읽기 (length=None이면 끝까지)
+        '''
+        return self._read(path, offset=offset, length=length)
 
     def load_line(self, path, encoding="utf-8"):
+        # 읽는 도중에는 재시도하지 않음
         self.check_connection()
+        self._count("call")
         with self.client.read(path, encoding=encoding) as f:
             while True:
                 contents = f.readline()
@@ -58,69 +183,138 @@ class HdfsFileHandler:
         :param: path    the path which has the prefix as user root hdfs path(/user/[HDFS_USER_NAME])
                         e.g., 'path' from /user/[HDFS_USER_NAME]/'path'
         """
-        self.check_connection()
-        with self.client.read(path, encoding="utf-8") as f:
-            contents = f.read()
-        return contents
+        return self._read(path, encoding="utf-8")
     
     def load_pickle(self, path):
-        self.check_connection()
-        with self.client.read(path) as reader:
-            bt_contents = reader.read()
-            contents = pickle.load(bt_contents)
-        return contents
+        def load():
+            with self.client.read(path) as reader:
+                bt_contents = reader.read()
+                return pickle.load(bt_contents)
+        return self._request(load)
 
     def loads_pickle(self, path):
-        self.check_connection()
-        with self.client.read(path) as f:
-            contents = f.read()
+        contents = self._read(path)
         pkl_obj = pickle.loads(contents)
         return pkl_obj
 
     def dumps_pickle(self, path, obj):
-        self.check_connection()
         contents = pickle.dumps(obj)
-        self.client.write(path, data=contents)
+        self._request(lambda: self.client.write(path, data=contents))
     
     def mkdirs(self, path):
-        self.check_connection()
-        self.client.makedirs(path)
+        self._request(lambda: self.client.makedirs(path))
 
-    def write(self, path, contents, encoding='utf-8', append=False):
-        self.check_connection()
-        self.client.write(path, data=contents, encoding=encoding, append=append)
+    def write(self, path, contents, encoding='utf-8', append=False, overwrite=False):
+        self._request(lambda: self.client.write(path, data=contents, encoding=encoding, append=append, overwrite=overwrite),
+                      retry=not append) # append는 중복으로 써질 수 있어서 재시도하지 않음
 
     def exist(self, path):        
-        self.check_connection()
-        return self.client.status(path, strict=False)
+        return self._request(lambda: self.client.status(path, strict=False))
 
     def upload(self, source, dest, overwrite=False):
-        self.check_connection()
         if os.path.exists(source):
             if not has_file_extension(dest, True): # 파일 확장자가 없을 경우 폴더 생성
                 if not self.exist(dest):
-                    self.client.makedirs(dest)
-            self.client.upload(hdfs_path=dest, local_path=source, overwrite=overwrite)
+                    self.mkdirs(dest)
+            self._request(lambda: self.client.upload(hdfs_path=dest, local_path=source, overwrite=overwrite))
             print(f'{source} -> {dest} Uploaded')
         else:
             print(f"Source Not Exist Error: {source}")
             raise FileNotFoundError
 
+    @staticmethod
+    def _sha256(path, block_size : int = 4 * 1024 * 1024) -> str:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def sha256(self, path) -> Tuple[int, str]:
+        '''
+        hdfs 파일을 스트림으로 읽으면서 계산한 (크기, sha256)
+        '''
+        size = 0
+        sha256 = hashlib.sha256()
+        for chunk in self.iter_bytes(path):
+            size += len(chunk)
+            sha256.update(chunk)
+        return size, sha256.hexdigest()
+
+    def upload_files(self,
+                     files : List[Tuple[str, str]],
+                     job_name : str = None,
+                     overwrite : bool = True,
+                     max_workers : int = 4) -> dict:
+        '''
+        여러 파일을 동시에 업로드
+        - files : [(local 파일 경로, hdfs 파일 경로), ...] (local에 없는 파일이 있으면 나머지를 업로드한 후 FileNotFoundError)
+        - 상위 폴더는 폴더마다 한 번만 생성
+        - 업로드 후 hdfs 파일을 다시 읽어서 크기와 sha256이 local 파일과 같은지 확인 (다르면 IOError)
+        - job_name이 있으면 폴더별 _SUCCESS.{job_name}에 확인한 파일 목록(크기, sha256)을 추가
+        return : {hdfs 파일 경로: {"size": .., "sha256": ..}}
+        '''
+        missing_files = [source for source, _ in files if not os.path.exists(source)]
+        files = [(source, dest) for source, dest in files if os.path.exists(source)]
+        folders = sorted(set(os.path.dirname(dest) for _, dest in files))
+        for folder in folders:
+            self.mkdirs(folder)
+
+        def upload(file):
+            source, dest = file
+            file_info = {"size": os.path.getsize(source), "sha256": self._sha256(source)}
+            self._request(lambda: self.client.upload(hdfs_path=dest, local_path=source, overwrite=overwrite))
+            size, sha256 = self.sha256(dest)
+            if size != file_info["size"] or sha256 != file_info["sha256"]:
+                raise IOError(f"업로드한 파일 내용이 다릅니다. (hdfs_path : {dest}, local : {file_info}, hdfs : {{'size': {size}, 'sha256': '{sha256}'}})")
+            print(f'{source} -> {dest} Uploaded')
+            return file_info
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            uploaded = dict(zip([dest for _, dest in files], executor.map(upload, files)))
+
+        if job_name != None:
+            for folder in folders:
+                self.update_success_manifest(folder, job_name, {os.path.basename(dest): file_info for dest, file_info in uploaded.items() if os.path.dirname(dest) == folder})
+        if len(missing_files) > 0: # 있는 파일은 모두 업로드한 후 에러
+            print(f"Source Not Exist Error: {missing_files}")
+            raise FileNotFoundError(missing_files)
+        return uploaded
+
+    def success_manifest_path(self, folder, job_name) -> str:
+        return f"{folder}/{self.SUCCESS_FILE_NAME}.{job_name}"
+
+    def load_success_manifest(self, folder, job_name) -> dict:
+        '''
+        upload_files로 기록한 {folder}/_SUCCESS.{job_name} (없으면 None)
+        {"files": {파일 이름: {"size": .., "sha256": ..}}, "updated_time": ..}
+        '''
+        try:
+            return json_codec.loads(self.load(self.success_manifest_path(folder, job_name)))
+        except (HdfsError, ValueError): # 파일이 없거나 내용이 손상됨
+            return None
+
+    def update_success_manifest(self, folder, job_name, files : dict):
+        '''
+        job마다 자기 manifest 파일만 덮어씀 (같은 폴더에 다른 job이 동시에 업로드해도 서로의 기록을 지우지 않음)
+        '''
+        manifest = self.load_success_manifest(folder, job_name) or {"files": {}}
+        manifest["files"].update(files)
+        manifest["updated_time"] = str(datetime.now())
+        self.write(self.success_manifest_path(folder, job_name), json_codec.dumps_str(manifest), overwrite=True)
+
     def download(self, source, dest, overwrite : bool = True):
-        self.check_connection()
         if self.exist(source):
             if not os.path.exists(dest):
                 os.mkdir(dest)
-            self.client.download(hdfs_path=source, local_path=dest, overwrite=overwrite)
+            self._request(lambda: self.client.download(hdfs_path=source, local_path=dest, overwrite=overwrite))
             print(f'{source} -> {dest} Downloaded')
         else:
             print(f"Source Not Exist Error: {source}")
             raise FileNotFoundError
         
     def last_modified_folder(self, folder_path):
-        self.check_connection()
         # 폴더 안의 모든 항목 가져오기
-        contents = self.client.list(folder_path)
+        contents = self.list(folder_path)
 
         # 최신 폴더 정보 초기화
         latest_folder = None
@@ -129,7 +323,7 @@ class HdfsFileHandler:
         # 각 항목에 대해 최신 수정 시간인지 확인
         for item in contents:
             item_path = os.path.join(folder_path, item)
-            item_stats = self.client.status(item_path)
+            item_stats = self._request(lambda: self.client.status(item_path))
 
             # 폴더인 경우에만 검사
             if item_stats['type'] == 'DIRECTORY':
@@ -145,39 +339,129 @@ class HdfsFileHandler:
         
         return latest_folder
     
+    def iter_bytes(self, path, offset : int = 0, chunk_size : int = None):
+        '''
+        offset(byte) 위치부터 chunk_size씩 읽는 제너레이터
+        읽는 도중 연결이 끊기면 재연결 후 마지막으로 받은 위치부터 다시 읽음
+        '''
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        self.check_connection()
+        self._count("call")
+        attempt = 0
+        while True:
+            try:
+                with self.client.read(path, offset=offset, chunk_size=chunk_size) as reader:
+                    for chunk in reader:
+                        offset += len(chunk)
+                        attempt = 0
+                        yield chunk
+                self._last_success_time = time.monotonic()
+                return
+            except Exception as e:
+                if not self._is_retriable(e) or attempt == self.MAX_RETRIES:
+                    if self._is_retriable(e):
+                        self._count("failure")
+                    raise
+                self._count("retry")
+                print(f"[{datetime.now()}] HDFS 파일 읽기 실패, {offset} byte부터 다시 읽습니다. ({attempt+1}/{self.MAX_RETRIES}) (error msg : {e})")
+                time.sleep(self.RETRY_WAIT * 2**attempt)
+                attempt += 1
+                self.reconnect()
+
+    @staticmethod
+    def _iter_jsonl(hdfs_file_path, chunks, record_type = None):
+        '''
+        chunk iterator를 한 줄씩 파싱 (.gz 파일은 메모리에서 압축 해제)
+        '''
+        decode = json_codec.loads if record_type == None else record_type.decode
+        f = io.BufferedReader(_ChunkReader(chunks), buffer_size=HdfsFileHandler.CHUNK_SIZE)
+        if hdfs_file_path.endswith(".gz"):
+            f = gzip.GzipFile(fileobj=f, mode="rb")
+        with f:
+            for raw in f:
+                if raw.strip(): # 빈 줄은 건너뜀
+                    yield decode(raw)
+
     def read_jsonl_generator(self, 
                              hdfs_file_path,
-                             local_download_folder_path):
+                             local_download_folder_path = None,
+                             record_type = None):
         '''
-        hdfs에 있는 파일을 로컬에 다운로드 받아서 한줄씩 읽는 제너레이터
-        다 읽은 후 해당 파일 로컬에서 삭제
+        hdfs에 있는 jsonl(.jsonl.gz) 파일을 로컬에 다운로드 하지 않고 스트림으로 한줄씩 읽는 제너레이터
+        local_download_folder_path : 이전 버전 호환용 (사용하지 않음)
+        record_type : utils.record의 record 타입으로 읽을 때
         '''
-        self.check_connection()
         try:
-            # 다운로드
-            local_file_path = None
-            if not os.path.exists(local_download_folder_path):
-                os.makedirs(local_download_folder_path)
-            self.download(source=hdfs_file_path, dest=local_download_folder_path)
-            local_file_path = os.path.join(local_download_folder_path, hdfs_file_path.split("/")[-1])
-            
-            # 압축 풀기
-            from utils.file import GZipFileHandler
-            if local_file_path.endswith(".gz"):
-                local_file_path = GZipFileHandler.ungzip(local_file_path)
-            
-            # 파일 읽기
-            from utils.file import JsonlFileHandler
-            if local_file_path.endswith(".jsonl"):
-                for line in JsonlFileHandler(local_file_path).read_generator():
+            if hdfs_file_path.endswith(".jsonl") or hdfs_file_path.endswith(".jsonl.gz"):
+                for line in self._iter_jsonl(hdfs_file_path, self.iter_bytes(hdfs_file_path), record_type):
                     yield line
         except Exception as e:
             print(f"error from read_jsonl_generator: {e}")
+
+    @staticmethod
+    def _put(chunk_queue : queue.Queue, item, stop : threading.Event) -> bool:
+        '''
+        queue가 가득 차 있으면 stop이 될 때까지 기다림 (읽는 쪽이 멈춰도 thread가 영원히 막히지 않도록)
+        '''
+        while not stop.is_set():
+            try:
+                chunk_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _prefetch(self, hdfs_file_path, chunk_queue : queue.Queue, stop : threading.Event):
+        chunks = self.iter_bytes(hdfs_file_path)
+        try:
+            for chunk in chunks:
+                if not self._put(chunk_queue, chunk, stop):
+                    return
+            self._put(chunk_queue, None, stop)
+        except Exception as e:
+            self._put(chunk_queue, e, stop)
+        finally:
+            chunks.close()
+
+    @staticmethod
+    def _iter_queue(chunk_queue : queue.Queue):
+        while True:
+            chunk = chunk_queue.get()
+            if chunk == None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def read_jsonl_files_generator(self,
+                                   hdfs_file_paths : List[str],
+                                   prefetch : int = 2,
+                                   prefetch_chunks : int = 16,
+                                   record_type = None):
+        '''
+        여러 jsonl(.jsonl.gz) 파일을 순서대로 한줄씩 읽는 제너레이터
+        지금 읽는 파일 다음 파일들도 미리 받아둠 (동시에 prefetch개 파일, 파일당 최대 prefetch_chunks * CHUNK_SIZE byte)
+        '''
+        executor = ThreadPoolExecutor(max_workers=prefetch)
+        stops = [threading.Event() for _ in hdfs_file_paths] # 다 읽었거나 읽다가 실패한 파일은 받기 중단
+        try:
+            chunk_queues = []
+            for hdfs_file_path, stop in zip(hdfs_file_paths, stops):
+                chunk_queue = queue.Queue(maxsize=prefetch_chunks)
+                executor.submit(self._prefetch, hdfs_file_path, chunk_queue, stop)
+                chunk_queues.append(chunk_queue)
+            for hdfs_file_path, chunk_queue, stop in zip(hdfs_file_paths, chunk_queues, stops):
+                try:
+                    for line in self._iter_jsonl(hdfs_file_path, self._iter_queue(chunk_queue), record_type):
+                        yield line
+                except Exception as e:
+                    print(f"error from read_jsonl_files_generator: {hdfs_file_path} ({e})")
+                finally:
+                    stop.set()
         finally:
-            from utils.file import remove_folder
-            if local_file_path != None:
-                if os.path.exists(local_file_path):
-                    remove_folder(local_file_path)
+            for stop in stops:
+                stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     hdfs = HdfsFileHandler()
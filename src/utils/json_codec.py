@@ -0,0 +1,50 @@
+'''
+jsonl 읽기/쓰기, api 응답 파싱에 사용하는 json 인코더/디코더
+- orjson > msgspec > json(표준 라이브러리) 순서로 설치된 것을 사용
+- 응답 bytes를 바로 파싱하고(문자열로 한 번 더 디코딩하지 않음), bytes로 인코딩
+- 한글은 escape 하지 않음 (json.dumps(..., ensure_ascii=False)와 동일)
+'''
+import json
+from typing import Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson != None:
+    BACKEND = "orjson"
+elif msgspec != None:
+    BACKEND = "msgspec"
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+else:
+    BACKEND = "json"
+
+def loads(data : Union[bytes, bytearray, memoryview, str]):
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if BACKEND == "msgspec":
+        return _msgspec_decoder.decode(data)
+    return json.loads(data) # bytes도 utf-8로 디코딩해서 파싱
+
+def dumps(data) -> bytes:
+    if BACKEND == "orjson":
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError: # orjson이 지원하지 않는 타입은 json으로
+            pass
+    elif BACKEND == "msgspec":
+        try:
+            return _msgspec_encoder.encode(data)
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+def dumps_str(data) -> str:
+    return dumps(data).decode("utf-8")
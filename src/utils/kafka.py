@@ -1,16 +1,103 @@
 import json
+import threading
+from datetime import datetime
+from typing import Iterable, List
 from kafka import KafkaProducer
 
+from utils import json_codec
+
+KAFKA_BOOTSTRAP_SERVERS = "10.10.30.51, 10.10.30.52, 10.10.30.53"
+SERP_DOWNLOAD_TOPIC = 'DS_SERP_DOWNLOAD'
+
+def make_serp_download_value(keyword : str) -> dict:
+    return {"keyword":keyword , "usage_id":"intent", "domain":"issue_keyword", "purpose": "adhoc"}
+
+class SerpDownloadProducer:
+    '''
+    서프 수집 요청용 카프카 producer
+    - 한 번 만든 producer(커넥션, 메타데이터)를 계속 재사용 (get_instance)
+    - 메시지는 linger_ms 동안 모아서 batch_size 단위로 압축해서 전송
+    - 전송 결과는 callback으로 받아서 실패한 키워드만 모아서 반환
+    '''
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self,
+                 bootstrap_servers : str = KAFKA_BOOTSTRAP_SERVERS,
+                 topic : str = SERP_DOWNLOAD_TOPIC,
+                 linger_ms : int = 50, # 메시지를 모으는 최대 시간
+                 batch_size : int = 64 * 1024, # 파티션별 batch 최대 크기 (byte)
+                 compression_type : str = "gzip",
+                 retries : int = 3):
+        self.bootstrap_servers = bootstrap_servers
+        self.topic = topic
+        self.producer = KafkaProducer(bootstrap_servers=bootstrap_servers,
+                                      value_serializer=json_codec.dumps,
+                                      linger_ms=linger_ms,
+                                      batch_size=batch_size,
+                                      compression_type=compression_type,
+                                      retries=retries,
+                                      acks=1)
+        self.statistics = {"sent": 0, "success": 0, "failure": 0}
+        self.lock = threading.Lock() # callback은 producer의 전송 thread에서 호출됨
+
+    @classmethod
+    def get_instance(cls,
+                     bootstrap_servers : str = KAFKA_BOOTSTRAP_SERVERS,
+                     topic : str = SERP_DOWNLOAD_TOPIC) -> "SerpDownloadProducer":
+        '''
+        (bootstrap_servers, topic)별로 하나의 producer를 만들어서 재사용
+        '''
+        with cls._instances_lock:
+            key = (bootstrap_servers, topic)
+            if key not in cls._instances:
+                cls._instances[key] = cls(bootstrap_servers=bootstrap_servers, topic=topic)
+            return cls._instances[key]
+
+    def _on_success(self, keyword : str, record_metadata):
+        with self.lock:
+            self.statistics["success"] += 1
+
+    def _on_error(self, failed_keywords : List[str], keyword : str, exception : Exception):
+        with self.lock:
+            self.statistics["failure"] += 1
+            failed_keywords.append(keyword)
+        print(f"[{datetime.now()}] 카프카 전송 실패 : {keyword} ({exception})")
+
+    def send_keywords(self,
+                      keywords : Iterable[str],
+                      timeout : float = None # flush 최대 대기 시간 (초)
+                      ) -> List[str]: # 전송 실패한 키워드 반환
+        '''
+        키워드들의 서프 수집 요청을 비동기로 전송하고 모두 전송될 때까지 대기
+        '''
+        failed_keywords = []
+        for keyword in keywords:
+            try:
+                future = self.producer.send(self.topic, value=make_serp_download_value(keyword))
+            except Exception as e: # 버퍼가 가득 찬 경우 등
+                self._on_error(failed_keywords, keyword, e)
+                continue
+            future.add_callback(self._on_success, keyword)
+            future.add_errback(self._on_error, failed_keywords, keyword)
+            self.statistics["sent"] += 1
+        self.producer.flush(timeout=timeout)
+        return failed_keywords
+
+    def close(self):
+        self.producer.close()
+        with SerpDownloadProducer._instances_lock:
+            SerpDownloadProducer._instances.pop((self.bootstrap_servers, self.topic), None)
+
 def request_collect_serp_to_kafka(keyword,
                                   print_log : bool = False):
+    '''
+    키워드 하나 서프 수집 요청 (여러 키워드는 SerpDownloadProducer.send_keywords 사용)
+    '''
     try:
-        producer = KafkaProducer(bootstrap_servers="10.10.30.51, 10.10.30.52, 10.10.30.53", 
-                                 value_serializer=lambda x: json.dumps(x, ensure_ascii=False).encode('utf-8'))
-        topic = 'DS_SERP_DOWNLOAD'
-        value = {"keyword":keyword , "usage_id":"intent", "domain":"issue_keyword", "purpose": "adhoc"}
-        producer.send(topic, value=value)
-        producer.flush()
-        producer.close()
+        failed_keywords = SerpDownloadProducer.get_instance().send_keywords([keyword])
+        if len(failed_keywords) > 0:
+            raise Exception(f"kafka send failed : {keyword}")
     except Exception as e:
         print(e)
     else:
@@ -29,7 +116,7 @@ class KafkaManager:
 
 		for value in values:
 			producer.send(topic, value=value)
-			producer.flush()
+		producer.flush() # 메시지마다 flush 하지 않고 모두 보낸 뒤 한 번만
 
 		producer.close()
         
\ No newline at end of file
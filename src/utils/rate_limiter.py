@@ -0,0 +1,118 @@
+import time
+import asyncio
+from typing import Dict
+from urllib.parse import urlparse
+
+class TokenBucket:
+    '''
+    초당 rate개의 토큰이 채워지는 토큰 버킷 (최대 capacity개까지 모아둘 수 있음)
+    '''
+    def __init__(self, rate:float, capacity:float=None):
+        self.rate = rate
+        self.capacity = capacity if capacity != None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock: # 대기 순서 보장
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+class AdaptiveConcurrency:
+    '''
+    AIMD 방식으로 동시 요청 개수를 조절
+    - 성공 : limit개 성공할 때마다 limit + 1 (additive increase)
+    - 실패(200 아닌 응답, 에러) 혹은 응답 시간 급증 : limit * decrease_factor (multiplicative decrease)
+    '''
+    def __init__(self,
+                 max_limit:int,
+                 min_limit:int=1,
+                 initial_limit:int=None,
+                 decrease_factor:float=0.5,
+                 latency_spike_factor:float=3.0,
+                 min_spike_latency:float=1.0): # 이 시간(초)보다 짧은 응답은 급증으로 보지 않음
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.limit = float(initial_limit if initial_limit != None else min(max_limit, 10))
+        self.decrease_factor = decrease_factor
+        self.latency_spike_factor = latency_spike_factor
+        self.min_spike_latency = min_spike_latency
+        self.in_flight = 0
+        self.avg_latency = None # 응답 시간 이동 평균 (EWMA)
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+        self.statistics = {"success": 0, "failure": 0, "decrease": 0}
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, success:bool, latency:float):
+        async with self.condition:
+            self.in_flight -= 1
+            if success:
+                self.statistics["success"] += 1
+                is_spike = (self.avg_latency != None and
+                            latency > max(self.avg_latency * self.latency_spike_factor, self.min_spike_latency))
+                self.avg_latency = latency if self.avg_latency == None else 0.9 * self.avg_latency + 0.1 * latency
+            else:
+                self.statistics["failure"] += 1
+                is_spike = False
+            if not success or is_spike:
+                # 같은 시점에 몰린 실패로 여러 번 줄어들지 않도록 평균 응답 시간 동안은 한 번만 감소
+                cooldown = self.avg_latency if self.avg_latency != None else 1.0
+                if time.monotonic() - self.last_decrease >= cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.last_decrease = time.monotonic()
+                    self.statistics["decrease"] += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+class RateLimiter:
+    '''
+    API 호스트별 토큰 버킷(qps 제한) + 동시 요청 개수 조절
+    하나의 event loop 안에서만 사용 (asyncio.run 할 때마다 새로 생성)
+    '''
+    def __init__(self,
+                 qps:float=None, # None 이면 qps 제한 없음
+                 max_concurrency:int=30,
+                 min_concurrency:int=1):
+        self.qps = qps
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.buckets : Dict[str, TokenBucket] = {}
+        self.concurrencies : Dict[str, AdaptiveConcurrency] = {}
+
+    def _host(self, url:str) -> str:
+        return urlparse(url).netloc
+
+    def concurrency(self, url:str) -> AdaptiveConcurrency:
+        host = self._host(url)
+        if host not in self.concurrencies:
+            self.concurrencies[host] = AdaptiveConcurrency(self.max_concurrency, self.min_concurrency)
+        return self.concurrencies[host]
+
+    async def acquire(self, url:str):
+        host = self._host(url)
+        if self.qps != None:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.qps)
+            await self.buckets[host].acquire()
+        await self.concurrency(url).acquire()
+
+    async def release(self, url:str, success:bool, latency:float):
+        await self.concurrency(url).release(success, latency)
+
+    def summary(self) -> dict:
+        return {host: {"limit": int(c.limit), **c.statistics} for host, c in self.concurrencies.items()}
@@ -0,0 +1,95 @@
+'''
+서제스트 결과, 서프 결과에서 실제로 사용하는 필드만 담는 record (slots dataclass)
+- dict 대신 사용해서 record당 메모리, 필드 접근 비용을 줄임
+- decode(bytes) : json 한 줄을 바로 record로 변환 (사용하지 않는 필드는 버림)
+  msgspec이 설치되어 있으면 msgspec이 dataclass로 바로 디코딩, 없으면 json_codec.loads 후 from_dict
+- 수집 결과 파일에는 기존과 같이 api 응답(dict) 전체를 저장하고, 후처리할 때만 record 사용
+'''
+from dataclasses import dataclass, field
+from typing import List, Any
+
+from utils import json_codec
+
+def _from_dict(cls, data : dict):
+    return cls(**{key: data[key] for key in cls.__slots__ if key in data})
+
+def _set_decoder(cls):
+    if json_codec.msgspec != None:
+        decoder = json_codec.msgspec.json.Decoder(cls)
+        def decode(data):
+            try:
+                return decoder.decode(data)
+            except json_codec.msgspec.ValidationError: # 타입이 다른 필드(null 등)가 있으면 from_dict로 (from_dict와 같은 결과)
+                return cls.from_dict(json_codec.loads(data))
+        cls.decode = staticmethod(decode)
+    else:
+        cls.decode = staticmethod(lambda data: cls.from_dict(json_codec.loads(data)))
+    return cls
+
+@_set_decoder
+@dataclass(slots=True)
+class Suggestion:
+    text : str = ""
+    suggest_type : int = -1
+    suggest_subtypes : List[int] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data : dict) -> "Suggestion":
+        # 서제스트는 개수가 많아서 _from_dict 대신 필드를 직접 꺼냄
+        return cls(data.get('text', ""), data.get('suggest_type', -1), data.get('suggest_subtypes') or [])
+
+@_set_decoder
+@dataclass(slots=True)
+class SuggestResult:
+    keyword : str = ""
+    suggestions : List[Suggestion] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data : dict) -> "SuggestResult":
+        from_dict = Suggestion.from_dict
+        return cls(data.get('keyword', ""), [from_dict(suggestion) for suggestion in data.get('suggestions') or []])
+
+@_set_decoder
+@dataclass(slots=True)
+class SerpFeature:
+    '''
+    서프의 카드(feature) 하나 (Card에서 사용하는 필드만)
+    '''
+    type : str = ""
+    sequence : Any = None
+    url : Any = None
+    title : Any = None
+    snippet : Any = None
+    site_name : Any = None
+    # 여러 개의 title/url이 있는 카드 (video_results, top_stories, featured_snippet, articles)
+    results : Any = None
+    videos : Any = None
+    items : Any = None
+    carousels : Any = None
+    cards : Any = None
+
+    @classmethod
+    def from_dict(cls, data : dict) -> "SerpFeature":
+        return _from_dict(cls, data)
+
+@_set_decoder
+@dataclass(slots=True)
+class SerpSearchParameters:
+    q : str = ""
+    hl : str = ""
+    requested_time : Any = None
+
+    @classmethod
+    def from_dict(cls, data : dict) -> "SerpSearchParameters":
+        return _from_dict(cls, data)
+
+@_set_decoder
+@dataclass(slots=True)
+class SerpRecord:
+    search_parameters : SerpSearchParameters = field(default_factory=SerpSearchParameters)
+    features : List[SerpFeature] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data : dict) -> "SerpRecord":
+        return cls(SerpSearchParameters.from_dict(data.get('search_parameters') or {}),
+                   [SerpFeature.from_dict(feature) for feature in data.get('features') or []])
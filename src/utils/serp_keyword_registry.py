@@ -0,0 +1,103 @@
+import time
+from datetime import datetime
+from typing import List, Set, Tuple
+
+class SerpKeywordRegistry:
+    '''
+    오늘 서프를 수집한 키워드 목록 (hdfs의 serp_keywords_{suggest_type}.txt, 같은 날짜의 서프 job들이 함께 사용)
+    - refresh : 각 파일에서 이전에 읽은 위치(byte offset) 이후에 추가된 부분만 읽어서 메모리의 set에 추가
+    - add : 이 job에서 수집한 키워드는 메모리에 모아두었다가 flush_size개 이상 쌓이거나 flush_interval초가 지나면 한 번에 append
+    - job이 끝날 때 flush()를 호출해서 남은 키워드 저장
+    ex)
+        registry = SerpKeywordRegistry(HdfsFileHandler(), "ko", "2024111200", "google", "basic")
+        keywords = set(keywords) - registry.refresh()
+        registry.add(success_keywords)
+        registry.flush()
+    '''
+    def __init__(self,
+                 hdfs,
+                 lang : str,
+                 date : str, # yyyymmdd(hh)
+                 service : str, # 이 job의 서비스 (저장할 파일)
+                 suggest_type : str, # 이 job의 서제스트 타입 (저장할 파일)
+                 services : Tuple[str] = ('google', 'youtube'),
+                 suggest_types : Tuple[str] = ('basic', 'target'),
+                 flush_size : int = 1000,
+                 flush_interval : int = 300): # 초
+        self.hdfs = hdfs
+        self.lang = lang
+        self.date = date
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.file_path = self.serp_keywords_file_path(service, suggest_type)
+        self.file_paths = [self.serp_keywords_file_path(s, t) for s in services for t in suggest_types]
+        self.offsets = {file_path: 0 for file_path in self.file_paths} # 파일별로 읽은 위치 (마지막 줄바꿈 다음)
+        self.keywords = set()
+        self.pending = [] # 아직 hdfs에 저장하지 않은 키워드
+        self.last_flush_time = time.monotonic()
+
+    def serp_keywords_file_path(self, service : str, suggest_type : str) -> str:
+        date = self.date
+        return f"/user/ds/wordpopcorn/{self.lang}/daily/{service}_suggest_for_llm_entity_topic/{date[:4]}/{date[:6]}/{date[:8]}/serp_keywords_{suggest_type}.txt"
+
+    def refresh(self) -> Set[str]:
+        '''
+        각 파일에서 새로 추가된 부분만 읽고, 지금까지 수집된 키워드 전체 반환
+        '''
+        for file_path in self.file_paths:
+            try:
+                self._refresh_file(file_path)
+            except Exception as e:
+                print(f"[{datetime.now()}] error from refresh : {file_path} ({e})")
+        if self._flush_due():
+            self.flush()
+        return self.keywords
+
+    def _refresh_file(self, file_path : str):
+        status = self.hdfs.exist(file_path)
+        if not status:
+            return
+        offset = self.offsets[file_path]
+        length = status['length']
+        if length < offset: # 파일이 다시 만들어짐
+            print(f"[{datetime.now()}] 파일 크기가 줄어들어 처음부터 다시 읽습니다. ({file_path})")
+            offset = 0
+        if length == offset:
+            return
+        contents = self.hdfs.load_bytes(file_path, offset=offset, length=length-offset)
+        end = contents.rfind(b'\n') + 1 # 쓰는 중인 마지막 줄은 다음에 읽음
+        if end == 0:
+            return
+        self.keywords.update(line.strip() for line in contents[:end].decode("utf-8").splitlines() if line.strip())
+        self.offsets[file_path] = offset + end
+
+    def add(self, keywords : List[str]):
+        self.keywords.update(keywords)
+        self.pending.extend(keywords)
+        if self._flush_due():
+            self.flush()
+
+    def _flush_due(self) -> bool:
+        if len(self.pending) == 0:
+            return False
+        return len(self.pending) >= self.flush_size or time.monotonic() - self.last_flush_time >= self.flush_interval
+
+    def flush(self, log : bool = True):
+        '''
+        모아둔 키워드를 hdfs 파일에 한 번에 추가 (실패하면 다음 flush에서 다시 시도)
+        '''
+        if len(self.pending) == 0:
+            return
+        keyword_data = '\n'.join(self.pending) + '\n'
+        try:
+            if not self.hdfs.exist(self.file_path):
+                self.hdfs.write(self.file_path, keyword_data, encoding='utf-8')
+            else:
+                self.hdfs.write(self.file_path, keyword_data, encoding='utf-8', append=True)
+        except Exception as e:
+            print(f"[{datetime.now()}] error from flush : {e} (keywords : {len(self.pending)}개는 다음에 다시 저장)")
+            return
+        if log:
+            print(f"[{datetime.now()}] hdfs에 키워드 추가 완료 (keywords : {len(self.pending)}개 키워드, hdfs_path : {self.file_path})")
+        self.pending = []
+        self.last_flush_time = time.monotonic()
@@ -0,0 +1,180 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Set, Tuple
+
+from utils.file import has_file_extension
+
+class TrendKeywordHistoryLoader:
+    '''
+    이전 N일 동안 나온 트렌드 키워드(hdfs의 *_trend_keywords.txt)를 가져오는 loader
+    - 날짜/서비스별 폴더 목록 조회, 파일 읽기를 여러 thread에서 동시에 수행
+    - 지난 날짜(fresh_days일 이전)는 다시 바뀌지 않으므로 로컬 스냅샷으로 저장해두고 재사용
+      스냅샷 : {snapshot_folder}/objects/{sha256}.txt (키워드 내용 기준으로 저장, 같은 내용은 한 번만 저장)
+               {snapshot_folder}/{lang}/{service}/{selection}/{date}.json (해당 날짜의 키워드 파일 sha256)
+      selection : 파일 선택 옵션(include_root_files, target_file_suffix)별 폴더
+                  basic/target job이 같은 snapshot_folder를 써도 서로 다른 파일 목록의 스냅샷을 재사용하지 않음
+    ex)
+        loader = TrendKeywordHistoryLoader(HdfsFileHandler(), "ko")
+        past_trend_keywords = loader.load("20241112", 28)
+    '''
+    def __init__(self,
+                 hdfs,
+                 lang : str,
+                 services : Tuple[str] = ('google', 'youtube'),
+                 snapshot_folder : str = "./data/cache/trend_keyword_history",
+                 max_workers : int = 8,
+                 fresh_days : int = 1, # 최근 며칠(어제 ~ fresh_days일 전)은 스냅샷 사용하지 않고 항상 hdfs에서 읽음
+                 include_root_files : bool = False, # 날짜 폴더 바로 아래 있는 파일도 포함할지 (target job)
+                 target_file_suffix : str = "_trend_keywords.txt"):
+        self.hdfs = hdfs
+        self.lang = lang
+        self.services = services
+        self.snapshot_folder = snapshot_folder
+        self.max_workers = max_workers
+        self.fresh_days = fresh_days
+        self.include_root_files = include_root_files
+        self.target_file_suffix = target_file_suffix
+        self.statistics = {"snapshot": 0, "hdfs": 0, "files": 0}
+        self._lock = threading.Lock()
+
+    def date_folder_path(self, service : str, date : str) -> str:
+        return f"/user/ds/wordpopcorn/{self.lang}/daily/{service}_suggest_for_llm_entity_topic/{date[:4]}/{date[:6]}/{date[:8]}"
+
+    def load(self, today : str, days : int) -> List[str]:
+        '''
+        today 기준 이전 days일(어제 ~ days일 전) 트렌드 키워드 (중복 제거)
+        '''
+        start_time = datetime.now()
+        print(f"[{datetime.now()}] {today} 기준 이전 {days}일 트렌드 키워드 목록 가져오기")
+        today_datetime = datetime.strptime(today, "%Y%m%d")
+        targets = []
+        for i in range(1, days+1, 1):
+            date = (today_datetime - timedelta(days=i)).strftime("%Y%m%d")
+            for service in self.services:
+                targets.append((service, date, i > self.fresh_days))
+
+        past_trend_keywords = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for keywords in executor.map(lambda target: self.load_day(*target), targets):
+                past_trend_keywords.update(keywords)
+        print(f"[{datetime.now()}] 키워드 개수 : {len(past_trend_keywords)} (스냅샷 {self.statistics['snapshot']}일, hdfs {self.statistics['hdfs']}일, 파일 {self.statistics['files']}개) | Process Time : {datetime.now()-start_time}")
+        return list(past_trend_keywords)
+
+    def load_day(self, service : str, date : str, use_snapshot : bool) -> Set[str]:
+        if use_snapshot:
+            keywords = self.read_snapshot(service, date)
+            if keywords != None:
+                self._count("snapshot")
+                return keywords
+        keywords, complete = self.fetch_day(service, date)
+        self._count("hdfs")
+        if use_snapshot and complete: # 모든 파일을 읽었을 때만 스냅샷 저장
+            self.write_snapshot(service, date, keywords)
+        return keywords
+
+    def _count(self, key : str, n : int = 1):
+        with self._lock:
+            self.statistics[key] += n
+
+    def list_txt_files(self, date_folder_path : str) -> List[str]:
+        '''
+        date_folder_path 하위 job_id 폴더들의 트렌드 키워드 파일 목록
+        '''
+        if not self.hdfs.exist(date_folder_path):
+            return []
+        all_txt_files = []
+        job_id_dirs = []
+        for name in self.hdfs.list(date_folder_path):
+            if not has_file_extension(name): # 디렉토리
+                job_id_dirs.append(f"{date_folder_path}/{name}")
+            elif self.include_root_files and name.endswith(self.target_file_suffix):
+                all_txt_files.append(f"{date_folder_path}/{name}")
+        for job_id_path in job_id_dirs:
+            for name in self.hdfs.list(job_id_path):
+                if name.endswith(self.target_file_suffix):
+                    all_txt_files.append(f"{job_id_path}/{name}")
+        return all_txt_files
+
+    def read_keywords(self, file_path : str) -> Set[str]:
+        contents = self.hdfs.load(file_path)
+        return set([line.strip() for line in contents.splitlines() if line.strip()])
+
+    def fetch_day(self, service : str, date : str) -> Tuple[Set[str], bool]:
+        '''
+        hdfs에서 하루치 트렌드 키워드 읽기
+        (폴더가 없거나 비어 있거나, 읽지 못한 파일이 있으면 complete=False -> 스냅샷 저장하지 않음)
+        '''
+        keywords = set()
+        txt_files = self.list_txt_files(self.date_folder_path(service, date))
+        self._count("files", len(txt_files))
+        complete = len(txt_files) > 0 # 아직 업로드 전일 수 있으므로 빈 날짜는 확정하지 않음
+        for file_path in txt_files:
+            try:
+                keywords.update(self.read_keywords(file_path))
+            except Exception as e:
+                print(f"[{datetime.now()}] HDFS에서 파일을 불러올 수 없습니다: {file_path} ({e})")
+                complete = False
+        return keywords, complete
+
+    ### 스냅샷 ###
+    @property
+    def selection(self) -> str:
+        '''
+        파일 선택 옵션을 나타내는 폴더 이름
+        ex) include_root_files=True, target_file_suffix="_trend_keywords.txt" -> "root+jobs__trend_keywords.txt"
+        '''
+        scope = "root+jobs" if self.include_root_files else "jobs"
+        suffix = self.target_file_suffix.replace("/", "_").lstrip("_")
+        return f"{scope}__{suffix}"
+
+    def _manifest_path(self, service : str, date : str) -> str:
+        return f"{self.snapshot_folder}/{self.lang}/{service}/{self.selection}/{date}.json"
+
+    def _object_path(self, digest : str) -> str:
+        return f"{self.snapshot_folder}/objects/{digest}.txt"
+
+    def read_snapshot(self, service : str, date : str) -> Set[str]:
+        '''
+        저장된 스냅샷이 없거나 내용이 손상되었으면 None
+        '''
+        try:
+            manifest_path = self._manifest_path(service, date)
+            if not os.path.exists(manifest_path):
+                return None
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                digest = json.load(f)["sha256"]
+            with open(self._object_path(digest), "rb") as f:
+                contents = f.read()
+            if hashlib.sha256(contents).hexdigest() != digest:
+                print(f"[{datetime.now()}] 스냅샷 내용이 손상되어 hdfs에서 다시 읽습니다. ({manifest_path})")
+                return None
+            return set(contents.decode("utf-8").splitlines())
+        except Exception as e:
+            print(f"[{datetime.now()}] error from read_snapshot : {e}")
+            return None
+
+    def write_snapshot(self, service : str, date : str, keywords : Set[str]):
+        try:
+            contents = "\n".join(sorted(keywords)).encode("utf-8")
+            digest = hashlib.sha256(contents).hexdigest()
+            object_path = self._object_path(digest)
+            if not os.path.exists(object_path):
+                self._atomic_write(object_path, contents)
+            manifest = {"sha256": digest, "count": len(keywords), "selection": self.selection, "created_time": str(datetime.now())}
+            self._atomic_write(self._manifest_path(service, date), json.dumps(manifest).encode("utf-8"))
+        except Exception as e:
+            print(f"[{datetime.now()}] error from write_snapshot : {e}")
+
+    @staticmethod
+    def _atomic_write(path : str, contents : bytes):
+        save_folder = os.path.dirname(path)
+        if save_folder and not os.path.exists(save_folder):
+            os.makedirs(save_folder, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(contents)
+        os.replace(tmp_path, path) # 여러 job이 동시에 써도 완성된 파일만 보임
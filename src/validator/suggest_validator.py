@@ -1,4 +1,20 @@
+from typing import TYPE_CHECKING, List, Dict, Tuple
+from itertools import combinations
+
+if TYPE_CHECKING:
+    from utils.record import Suggestion
+
 class SuggestValidator:
+    # classify_suggestions 결과 bitmask
+    VALID = 1 # is_valid_suggest
+    SUFFIX_TREND = 2 # is_suffix_trend_suggest
+    # 판별 대상 type, 트렌드 키워드 subtype
+    CLASSIFIABLE_TYPES = frozenset([0, 46])
+    SUFFIX_TREND_SUBTYPE = 3
+    # 판별 조건에 사용되는 subtype (이외의 subtype은 결과에 영향 없음)
+    RULE_SUBTYPES = frozenset([3, 5, 7, 8, 10, 13, 30, 333, 512, 546])
+    CLASSIFY_CACHE_SIZE = 100_000
+
     @staticmethod
     def contain_all_characters(search_query,suggestion) -> bool:
         ## 검색어의 모든 문자가 세제스트에 있는지 체크
@@ -60,6 +76,11 @@ class SuggestValidator:
     
     @staticmethod
     def is_valid_suggest(type: int, subtype: list) -> bool:
+        ## _is_valid_suggest_by_rules 결과를 미리 계산해둔 lookup table에서 조회
+        return SuggestValidator.classify(type, subtype) & SuggestValidator.VALID != 0
+
+    @staticmethod
+    def _is_valid_suggest_by_rules(type: int, subtype: list) -> bool:
         is_valid = False
         if (SuggestValidator.is_prefix_suggest(type, subtype) or \
             SuggestValidator.is_infix_suggest(type, subtype) or \
@@ -73,4 +94,64 @@ class SuggestValidator:
             SuggestValidator.is_spelled_out_suggest_3(type, subtype) or \
             SuggestValidator.is_typo_correction_suggest(type, subtype):
             is_valid = False
-        return is_valid
\ No newline at end of file
+        return is_valid
+
+    @staticmethod
+    def _classify_by_rules(type: int, subtype) -> int:
+        ## is_valid_suggest, is_suffix_trend_suggest 결과를 bitmask로 반환 (조건 함수들로 직접 판별)
+        flag = 0
+        if SuggestValidator._is_valid_suggest_by_rules(type, subtype):
+            flag |= SuggestValidator.VALID
+        if SuggestValidator.is_suffix_trend_suggest(type, subtype):
+            flag |= SuggestValidator.SUFFIX_TREND
+        return flag
+
+    @staticmethod
+    def _lookup_key(type: int, subtype) -> Tuple[int, frozenset]:
+        ## 판별 결과에 영향을 주는 type 구분(0/46, 33, 그 외)과 subtype만 남긴 key
+        if type in SuggestValidator.CLASSIFIABLE_TYPES:
+            type_group = 0
+        elif type == 33:
+            type_group = 33
+        else:
+            type_group = -1
+        return type_group, frozenset(subtype) & SuggestValidator.RULE_SUBTYPES
+
+    @staticmethod
+    def classify(type: int, subtype: list) -> int:
+        ## is_valid_suggest, is_suffix_trend_suggest 결과를 bitmask로 반환
+        ## 처음 나온 (type, subtype) 조합은 lookup table에서 찾아서 저장해두고 재사용
+        key = (type, tuple(subtype))
+        flag = _classify_cache.get(key)
+        if flag == None:
+            if len(_classify_cache) >= SuggestValidator.CLASSIFY_CACHE_SIZE:
+                _classify_cache.clear()
+            flag = _classify_cache[key] = _lookup_table[SuggestValidator._lookup_key(type, subtype)]
+        return flag
+
+    @staticmethod
+    def classify_suggestions(suggestions: List["Suggestion"]) -> List[int]:
+        ## 서제스트 목록(utils.record.Suggestion)의 bitmask 반환
+        classify = SuggestValidator.classify
+        return [classify(suggestion.suggest_type, suggestion.suggest_subtypes) for suggestion in suggestions]
+
+    @staticmethod
+    def is_valid_suggests(suggestions: List["Suggestion"]) -> List[bool]:
+        ## 서제스트 목록의 is_valid_suggest 결과 반환
+        return [flag & SuggestValidator.VALID != 0 for flag in SuggestValidator.classify_suggestions(suggestions)]
+
+def _build_lookup_table() -> Dict[Tuple[int, frozenset], int]:
+    '''
+    판별 결과에 영향을 주는 (type 구분, subtype 조합) 전체에 대해 bitmask를 미리 계산
+    (type 구분 3개 * subtype 조합 2^10개)
+    '''
+    table = {}
+    rule_subtypes = sorted(SuggestValidator.RULE_SUBTYPES)
+    for type_group in [0, 33, -1]:
+        for n in range(len(rule_subtypes) + 1):
+            for subtype in combinations(rule_subtypes, n):
+                table[(type_group, frozenset(subtype))] = SuggestValidator._classify_by_rules(type_group, subtype)
+    return table
+
+_lookup_table = _build_lookup_table()
+_classify_cache : Dict[Tuple[int, tuple], int] = {} # 실제로 나온 (type, subtype) -> bitmask
@@ -1,8 +1,9 @@
 from typing import List, Tuple, Union
 from datetime import datetime
 from validator.suggest_validator import SuggestValidator
+from utils.record import Suggestion, SuggestResult
 
-def cnt_valid_suggest(suggestions:List[dict], # 서제스트 결과
+def cnt_valid_suggest(suggestions:List[Suggestion], # 서제스트 결과
                       input_text:str, # 실제 입력한 키워드
                       log:bool=False,
                       return_result:bool=False) -> Union[int, Tuple[int, List[str]]]:
@@ -11,12 +12,13 @@ def cnt_valid_suggest(suggestions:List[dict], # 서제스트 결과
     '''
     try:
         valid_suggests = []
-        for suggestion in suggestions:
-            if SuggestValidator.is_valid_suggest(suggestion['suggest_type'], suggestion['suggest_subtypes']):
-                if suggestion['text'].replace(' ', '').startswith(input_text.replace(' ', '')): # 입력한 키워드로 시작하는 서제스트일 경우만 추출
-                    valid_suggests.append(suggestion['text'])
+        flags = SuggestValidator.classify_suggestions(suggestions)
+        for suggestion, flag in zip(suggestions, flags):
+            if flag & SuggestValidator.VALID:
+                if suggestion.text.replace(' ', '').startswith(input_text.replace(' ', '')): # 입력한 키워드로 시작하는 서제스트일 경우만 추출
+                    valid_suggests.append(suggestion.text)
                     if log:
-                        print(suggestion['text'], suggestion['suggest_type'], suggestion['suggest_subtypes'])
+                        print(suggestion.text, suggestion.suggest_type, suggestion.suggest_subtypes)
         if return_result:
             return len(valid_suggests), valid_suggests
         return len(valid_suggests)
@@ -37,4 +39,18 @@ def is_trend_keyword(text : str,
                 return True
         else:
             return True
-    return False
\ No newline at end of file
+    return False
+
+def extract_trend_keywords(suggest_results : List[SuggestResult], # 서제스트 수집 결과 (각 결과의 suggestions 사용)
+                           target_kw : str = None) -> List[str]:
+    '''
+    여러 서제스트 결과에서 트렌드 키워드를 한 번에 추출 (is_trend_keyword와 동일한 조건)
+    '''
+    # SuggestValidator.is_suffix_trend_suggest 조건을 함수 호출 없이 바로 확인
+    types = SuggestValidator.CLASSIFIABLE_TYPES
+    subtype = SuggestValidator.SUFFIX_TREND_SUBTYPE
+    trend_keywords = [suggestion.text for res in suggest_results for suggestion in res.suggestions \
+                      if suggestion.suggest_type in types and subtype in suggestion.suggest_subtypes]
+    if target_kw != None: # <타겟 키워드 + " "> 로 시작하는 경우만 추출
+        trend_keywords = [text for text in trend_keywords if text.startswith(target_kw + " ")]
+    return trend_keywords